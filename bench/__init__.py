@@ -0,0 +1,18 @@
+"""Бенчмарки бэкенда, работают офлайн на одной машине.
+
+    python -m bench.seed --scale 100k --db bench/data/bench_100k.db   # синтетические данные
+    python -m bench.load --db bench/data/bench_100k.db --mix default  # нагрузка, отчет в bench/results/
+    python -m bench.compare bench/results/old.json bench/results/new.json
+    python -m bench.login_storm --url http://127.0.0.1:5000           # шторм логинов против gunicorn
+"""
+import os
+import sys
+
+
+def import_app(db_file):
+    """Импортирует main с DATABASE_URL на файл бенчмарка (до импорта - конфиг читается при нем)."""
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.abspath(db_file)
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false") # Нагрузка идет с одного IP; лимитер меряет bench.ratelimit
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import main
+    return main
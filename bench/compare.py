@@ -0,0 +1,55 @@
+"""Сравнение двух отчетов bench.load: python -m bench.compare old.json new.json [--threshold 10]
+
+Код выхода 1, если на каком-то эндпоинте p95 вырос или RPS упал больше чем на --threshold
+процентов, либо число SQL-запросов на запрос выросло больше чем на SQL_TOLERANCE.
+Эндпоинты с малой выборкой (< MIN_REQUESTS) только печатаются.
+"""
+import argparse
+import json
+
+MIN_REQUESTS = 30
+SQL_TOLERANCE = 0.5 # Среднее плавает из-за попаданий в кеш лент
+
+
+def change(old, new):
+    if not old or new is None: return None
+    return round((new - old) / old * 100, 1)
+
+def compare(old, new, threshold):
+    rows, regressions = [], []
+    for endpoint in sorted(set(old["endpoints"]) | set(new["endpoints"])):
+        a, b = old["endpoints"].get(endpoint), new["endpoints"].get(endpoint)
+        if not a or not b:
+            rows.append((endpoint, "только в " + ("новом" if b else "старом"), "", "")); continue
+        rps, p95 = change(a["rps"], b["rps"]), change(a["p95_ms"], b["p95_ms"])
+        sql = (a["sql_per_request"], b["sql_per_request"])
+        rows.append((endpoint, f"rps {a['rps']} -> {b['rps']} ({rps:+}%)" if rps is not None else "rps ?",
+                     f"p95 {a['p95_ms']} -> {b['p95_ms']} ms ({p95:+}%)" if p95 is not None else "p95 ?",
+                     f"sql {sql[0]} -> {sql[1]}"))
+        if min(a["requests"], b["requests"]) < MIN_REQUESTS: continue
+        if rps is not None and rps < -threshold: regressions.append(f"{endpoint}: RPS {rps:+}%")
+        if p95 is not None and p95 > threshold: regressions.append(f"{endpoint}: p95 {p95:+}%")
+        if None not in sql and sql[1] - sql[0] > SQL_TOLERANCE: regressions.append(f"{endpoint}: SQL/запрос {sql[0]} -> {sql[1]}")
+    return rows, regressions
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=10, help="допустимое ухудшение, %%")
+    args = parser.parse_args()
+    with open(args.old, encoding="utf-8") as f: old = json.load(f)
+    with open(args.new, encoding="utf-8") as f: new = json.load(f)
+    if (old["meta"]["mix"], old["meta"]["mode"]) != (new["meta"]["mix"], new["meta"]["mode"]):
+        print("Внимание: разные mix/mode, сравнение условное")
+
+    rows, regressions = compare(old, new, args.threshold)
+    for row in rows: print("  ".join(f"{cell:34}" for cell in row).rstrip())
+    if regressions:
+        print("\nРегрессии:"); print("\n".join(f"  {r}" for r in regressions))
+        raise SystemExit(1)
+    print("\nРегрессий нет")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,83 @@
+"""Сжатие ответов: CPU на запрос против сэкономленных байт (gzip по уровням, brotli - если установлен).
+
+    python -m bench.compression --db bench/data/bench_100k.db [--limit 50] [--repeat 20]
+
+Тела берутся настоящими запросами к лентам (аноним, страница ?limit=). Для каждого
+кодека печатает размер, долю от исходного и CPU-время сжатия одного тела; затем - время
+запроса к закешированной ленте с Accept-Encoding: первый запрос сжимает, следующие отдают
+готовый вариант из кеша (cached_public_feed).
+"""
+import argparse
+import contextlib
+import gzip
+import io
+import json
+import time
+
+from bench import import_app
+
+FEEDS = ("/startups", "/vacancies", "/meetups")
+GZIP_LEVELS = (1, 6, 9)
+BROTLI_QUALITIES = (1, 5, 11)
+
+
+def cpu_ms(fn, repeat):
+    """Лучшее из repeat CPU-время вызова fn (process_time), мс, и его результат."""
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.process_time()
+        result = fn()
+        elapsed = time.process_time() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best * 1000, 3), result
+
+def codecs(main):
+    items = [(f"gzip-{level}", lambda body, level=level: gzip.compress(body, compresslevel=level, mtime=0)) for level in GZIP_LEVELS]
+    if main.brotli:
+        items += [(f"br-{q}", lambda body, q=q: main.brotli.compress(body, quality=q)) for q in BROTLI_QUALITIES]
+    return items
+
+def request_ms(client, path, headers, repeat):
+    """Время первого запроса (промах кеша сжатых вариантов) и лучшее из повторных, мс."""
+    timings = []
+    for _ in range(repeat + 1):
+        started = time.perf_counter()
+        client.get(path, headers=headers).get_data()
+        timings.append(time.perf_counter() - started)
+    return round(timings[0] * 1000, 3), round(min(timings[1:]) * 1000, 3)
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", required=True)
+    parser.add_argument("--limit", type=int, default=50, help="строк на странице ленты")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    main = import_app(args.db)
+    with contextlib.redirect_stdout(io.StringIO()), main.app.app_context(): main.upgrade_database()
+    client = main.app.test_client()
+    report = {"brotli": bool(main.brotli), "limit": args.limit, "feeds": {}}
+    if not main.brotli: print("brotli не установлен (pip install brotli) - только gzip")
+    for feed in FEEDS:
+        path = f"{feed}?limit={args.limit}"
+        body = client.get(path).get_data()
+        rows = {"raw_bytes": len(body), "codecs": {}}
+        print(f"\n{path}: {len(body)} B")
+        for name, compress in codecs(main):
+            ms, compressed = cpu_ms(lambda: compress(body), args.repeat)
+            saved_kb = (len(body) - len(compressed)) / 1024
+            rows["codecs"][name] = {"bytes": len(compressed), "ratio": round(len(compressed) / len(body), 4), "cpu_ms": ms,
+                                    "cpu_us_per_saved_kb": round(ms * 1000 / saved_kb, 2) if saved_kb > 0 else None}
+            print(f"  {name:8} {len(compressed):>9} B  {len(compressed) / len(body):6.1%}  {ms:>8} ms CPU  "
+                  f"{rows['codecs'][name]['cpu_us_per_saved_kb']} us/KB сэкономлено")
+        for encoding in ("gzip", "br") if main.brotli else ("gzip",):
+            client.get(f"{feed}?limit={args.limit}&_bench={encoding}") # Свежая запись кеша ленты под этот путь
+            first, cached = request_ms(client, f"{path}&_bench={encoding}", {"Accept-Encoding": encoding}, args.repeat)
+            rows[f"request_{encoding}_ms"] = {"first": first, "cached": cached}
+            print(f"  запрос {encoding:5} первый {first} ms, из кеша вариантов {cached} ms")
+        report["feeds"][feed] = rows
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,247 @@
+"""Нагрузочный драйвер: смесь анонимного чтения лент, логинов, откликов и модерации.
+
+    python -m bench.load --db bench/data/bench_100k.db [--mix default] [--threads 8] [--duration 30]
+    python -m bench.load --url http://127.0.0.1:5000 --db bench/data/bench_100k.db [--server-pid <pid gunicorn>]
+
+Без --url приложение поднимается в этом же процессе (Flask test client); тогда в отчете
+есть число SQL-запросов на запрос и пиковый RSS по эндпоинтам. --db нужен в обоих режимах:
+из него берутся id для запросов (сидер - bench.seed). Отчет - JSON в bench/results/.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import threading
+import time
+from datetime import datetime
+
+from bench.seed import BENCH_PASSWORD
+
+# Вес операции в смеси
+MIXES = {
+    "default": {"feed_startups": 30, "feed_vacancies": 25, "feed_meetups": 15, "login": 5, "apply": 15, "moderate": 10},
+    "read": {"feed_startups": 40, "feed_vacancies": 35, "feed_meetups": 25},
+    "write": {"login": 10, "apply": 60, "moderate": 30},
+}
+TOKEN_POOL_SIZE = 50 # Столько пользователей логинится до старта замера
+PAGE_SIZE = 50
+
+
+def percentile(values, p):
+    if not values: return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * p / 100))] * 1000, 2)
+
+def rss_mb(pid="self"):
+    """RSS процесса (и для gunicorn - его воркеров) из /proc, МБ."""
+    pids = [str(pid)]
+    with contextlib.suppress(OSError):
+        with open(f"/proc/{pid}/task/{pid}/children") as f: pids += f.read().split()
+    total = 0
+    for p in pids:
+        with contextlib.suppress(OSError):
+            with open(f"/proc/{p}/statm") as f: total += int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    return round(total / 1024 / 1024, 1)
+
+
+class Dataset:
+    """id из БД бенчмарка, к которым обращаются операции."""
+
+    def __init__(self, db_file):
+        conn = sqlite3.connect(db_file)
+        self.usernames = [r[0] for r in conn.execute("SELECT username FROM users WHERE username LIKE 'bench_user_%' ORDER BY id")]
+        self.approved_vacancies = [r[0] for r in conn.execute(
+            "SELECT v.id FROM vacancies v JOIN startups s ON s.id = v.startup_id "
+            "WHERE v.status = 'approved' AND s.status = 'approved' AND s.is_held = 0")]
+        self.pending = {table: [r[0] for r in conn.execute(f"SELECT id FROM {table} WHERE status = 'pending' ORDER BY id")]
+                        for table in ("startups", "meetups")}
+        conn.close()
+        if not self.usernames: raise SystemExit("В БД нет bench_user_* - сначала python -m bench.seed")
+        self.lock = threading.Lock()
+
+    def take_pending(self, rng):
+        """Каждую pending-запись модерируем один раз; кончились - None."""
+        with self.lock:
+            tables = [t for t, ids in self.pending.items() if ids]
+            if not tables: return None
+            table = rng.choice(tables)
+            return table, self.pending[table].pop()
+
+
+class InProcessClient:
+    def __init__(self, main):
+        self.client = main.app.test_client()
+
+    def request(self, method, path, token=None, json_body=None):
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        response = self.client.open(path, method=method, headers=headers, json=json_body)
+        return response.status_code, response.get_json(silent=True)
+
+
+class HttpClient:
+    def __init__(self, base_url):
+        import requests
+        self.base_url, self.session = base_url.rstrip("/"), requests.Session()
+
+    def request(self, method, path, token=None, json_body=None):
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        response = self.session.request(method, self.base_url + path, headers=headers, json=json_body, timeout=60)
+        try: body = response.json()
+        except ValueError: body = None
+        return response.status_code, body
+
+
+def login(client, username, password):
+    status, body = client.request("POST", "/login", json_body={"username": username, "password": password})
+    if status != 200: raise SystemExit(f"Логин {username} не удался: {status} {body}")
+    return body["access_token"]
+
+def make_operations(dataset, tokens, admin_token):
+    """name -> fn(client, rng) -> (endpoint, status). endpoint - ключ отчета."""
+    def feed(path):
+        def op(client, rng):
+            return f"GET {path}", client.request("GET", f"{path}?limit={PAGE_SIZE}")[0]
+        return op
+
+    def do_login(client, rng):
+        username = rng.choice(dataset.usernames)
+        return "POST /login", client.request("POST", "/login", json_body={"username": username, "password": BENCH_PASSWORD})[0]
+
+    def apply(client, rng):
+        if not dataset.approved_vacancies: return None
+        vacancy_id = rng.choice(dataset.approved_vacancies)
+        return "POST /vacancies/<id>/apply", client.request("POST", f"/vacancies/{vacancy_id}/apply", token=rng.choice(tokens))[0]
+
+    def moderate(client, rng):
+        item = dataset.take_pending(rng)
+        if not item: return None
+        table, item_id = item
+        if rng.random() < 0.8:
+            return f"PUT /{table}/<id>/approve", client.request("PUT", f"/{table}/{item_id}/approve", token=admin_token)[0]
+        return f"PUT /{table}/<id>/reject", client.request("PUT", f"/{table}/{item_id}/reject", token=admin_token,
+                                                           json_body={"reason": "bench"})[0]
+
+    return {"feed_startups": feed("/startups"), "feed_vacancies": feed("/vacancies"), "feed_meetups": feed("/meetups"),
+            "login": do_login, "apply": apply, "moderate": moderate}
+
+
+class SqlCounter:
+    """Счетчик SQL-запросов текущего потока (только в режиме in-process)."""
+
+    def __init__(self, main):
+        self.local = threading.local()
+        with main.app.app_context(): engine = main.db.engine
+        main.event.listen(engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        self.local.count = getattr(self.local, "count", 0) + 1
+
+    def reset(self): self.local.count = 0
+    def value(self): return getattr(self.local, "count", 0)
+
+
+def run(client_factory, operations, mix, threads, duration, seed_value, sql_counter=None, server_pid=None):
+    names, weights = zip(*[(name, weight) for name, weight in mix.items() if weight])
+    samples = {} # endpoint -> {"latencies": [], "statuses": {}, "sql": [], "rss": 0}
+    lock = threading.Lock()
+    peak_server_rss = [0]
+    stop = time.monotonic() + duration
+
+    def worker(index):
+        rng, client = random.Random(seed_value * 1000 + index), client_factory()
+        while time.monotonic() < stop:
+            operation = operations[rng.choices(names, weights)[0]]
+            if sql_counter: sql_counter.reset()
+            started = time.monotonic()
+            result = operation(client, rng)
+            elapsed = time.monotonic() - started
+            if result is None: continue
+            endpoint, status = result
+            with lock:
+                sample = samples.setdefault(endpoint, {"latencies": [], "statuses": {}, "sql": [], "rss": 0})
+                sample["latencies"].append(elapsed)
+                sample["statuses"][str(status)] = sample["statuses"].get(str(status), 0) + 1
+                if sql_counter:
+                    sample["sql"].append(sql_counter.value())
+                    sample["rss"] = max(sample["rss"], rss_mb())
+
+    def watch_server():
+        while time.monotonic() < stop:
+            peak_server_rss[0] = max(peak_server_rss[0], rss_mb(server_pid)); time.sleep(0.2)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    if server_pid: workers.append(threading.Thread(target=watch_server))
+    started = time.monotonic()
+    for t in workers: t.start()
+    for t in workers: t.join()
+    elapsed = time.monotonic() - started
+
+    endpoints = {}
+    for endpoint, sample in sorted(samples.items()):
+        latencies = sample["latencies"]
+        endpoints[endpoint] = {
+            "requests": len(latencies), "rps": round(len(latencies) / elapsed, 1), "statuses": sample["statuses"],
+            "p50_ms": percentile(latencies, 50), "p95_ms": percentile(latencies, 95), "p99_ms": percentile(latencies, 99),
+            "sql_per_request": round(sum(sample["sql"]) / len(sample["sql"]), 2) if sample["sql"] else None,
+            "peak_rss_mb": sample["rss"] or None}
+    total = sum(e["requests"] for e in endpoints.values())
+    return {"endpoints": endpoints, "total": {"requests": total, "rps": round(total / elapsed, 1), "seconds": round(elapsed, 1),
+                                              "peak_server_rss_mb": peak_server_rss[0] or None}}
+
+def git_revision():
+    with contextlib.suppress(Exception):
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", required=True, help="БД бенчмарка (python -m bench.seed)")
+    parser.add_argument("--url", help="бить по HTTP вместо in-process")
+    parser.add_argument("--mix", choices=sorted(MIXES), default="default")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--server-pid", type=int, help="pid мастера gunicorn - для пикового RSS сервера")
+    parser.add_argument("--out", help="файл отчета (по умолчанию bench/results/<время>-<mix>.json)")
+    parser.add_argument("--verbose", action="store_true", help="не глушить print() приложения")
+    args = parser.parse_args()
+
+    dataset = Dataset(args.db)
+    sql_counter = None
+    if args.url:
+        client_factory = lambda: HttpClient(args.url)
+    else:
+        from bench import import_app
+        main = import_app(args.db)
+        with main.app.app_context(): main.upgrade_database()
+        sql_counter = SqlCounter(main)
+        client_factory = lambda: InProcessClient(main)
+
+    with contextlib.ExitStack() as stack:
+        if not args.url and not args.verbose: stack.enter_context(contextlib.redirect_stdout(open(os.devnull, "w")))
+        setup = client_factory()
+        admin_token = login(setup, "admin", os.environ.get("ADMIN_PASSWORD", "verysecretadminpassword"))
+        tokens = [login(setup, username, BENCH_PASSWORD) for username in dataset.usernames[:TOKEN_POOL_SIZE]]
+        result = run(client_factory, make_operations(dataset, tokens, admin_token), MIXES[args.mix], args.threads,
+                     args.duration, args.seed, sql_counter, args.server_pid)
+
+    report = {"meta": {"started": datetime.now().isoformat(timespec="seconds"), "git": git_revision(),
+                       "mode": "http" if args.url else "inprocess", "mix": args.mix, "weights": MIXES[args.mix],
+                       "threads": args.threads, "duration": args.duration, "seed": args.seed,
+                       "db": os.path.basename(args.db), "python": platform.python_version(), "cpus": os.cpu_count()},
+              **result}
+    out = args.out or os.path.join("bench", "results", f"{datetime.now():%Y%m%d-%H%M%S}-{args.mix}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f: json.dump(report, f, ensure_ascii=False, indent=2)
+    print(json.dumps(result["total"], ensure_ascii=False))
+    for endpoint, stats in result["endpoints"].items():
+        print(f"{endpoint:32} {stats['rps']:>8} rps  p50 {stats['p50_ms']} ms  p99 {stats['p99_ms']} ms  "
+              f"sql {stats['sql_per_request']}  {stats['statuses']}")
+    print(f"Report: {out}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,90 @@
+"""Шторм логинов: пропускная способность /login и p99 остальных эндпоинтов во время шторма.
+
+Запускается против поднятого бэкенда с выключенным лимитером (иначе меряется 429):
+    RATE_LIMIT_ENABLED=false gunicorn -c gunicorn.conf.py main:app
+    python -m bench.login_storm --url http://127.0.0.1:5000 --duration 20 --out login_storm.json
+
+Две фазы одинаковой длины: только читатели (база для сравнения), затем читатели + логины.
+"""
+import argparse
+import json
+import threading
+import time
+
+import requests
+
+
+def percentile(values, p):
+    if not values: return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * p / 100))] * 1000, 2)
+
+def summarize(samples, duration):
+    """samples: [(status, seconds)] -> сводка в миллисекундах."""
+    latencies = [t for _, t in samples]
+    statuses = {}
+    for status, _ in samples: statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {"requests": len(samples), "rps": round(len(samples) / duration, 1), "statuses": statuses,
+            "p50_ms": percentile(latencies, 50), "p95_ms": percentile(latencies, 95), "p99_ms": percentile(latencies, 99)}
+
+def run_phase(base_url, token, users, duration, reader_threads, login_threads):
+    stop = time.monotonic() + duration
+    samples = {"GET /startups": [], "GET /profile": [], "POST /login": []}
+    lock = threading.Lock()
+
+    def record(name, status, started):
+        elapsed = time.monotonic() - started
+        with lock: samples[name].append((status, elapsed))
+
+    def reader():
+        session = requests.Session()
+        headers = {"Authorization": f"Bearer {token}"} # С токеном - мимо кеша ленты, честный поход в БД
+        while time.monotonic() < stop:
+            for name, path in (("GET /startups", "/startups?limit=20"), ("GET /profile", "/profile")):
+                started = time.monotonic()
+                try: status = session.get(base_url + path, headers=headers, timeout=30).status_code
+                except requests.RequestException: status = "error"
+                record(name, status, started)
+
+    def login(index):
+        session = requests.Session()
+        username, password = users[index % len(users)]
+        while time.monotonic() < stop:
+            started = time.monotonic()
+            try: status = session.post(base_url + "/login", json={"username": username, "password": password}, timeout=30).status_code
+            except requests.RequestException: status = "error"
+            record("POST /login", status, started)
+
+    threads = [threading.Thread(target=reader) for _ in range(reader_threads)]
+    threads += [threading.Thread(target=login, args=(i,)) for i in range(login_threads)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    return {name: summarize(s, duration) for name, s in samples.items() if s}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--duration", type=float, default=15, help="секунд на каждую фазу")
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--logins", type=int, default=16, help="параллельных клиентов /login")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--out", help="куда сохранить JSON (иначе stdout)")
+    args = parser.parse_args()
+    base_url = args.url.rstrip("/")
+
+    users = [(f"bench_login_{i}", f"bench-pass-{i}") for i in range(args.users)]
+    for username, password in users: # 409 "Имя занято" на повторном запуске - нормально
+        requests.post(base_url + "/register", json={"username": username, "password": password}, timeout=60)
+    token = requests.post(base_url + "/login", json={"username": users[0][0], "password": users[0][1]}, timeout=60).json()["access_token"]
+
+    report = {"config": vars(args),
+              "baseline": run_phase(base_url, token, users, args.duration, args.readers, 0),
+              "storm": run_phase(base_url, token, users, args.duration, args.readers, args.logins)}
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f: f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
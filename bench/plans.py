@@ -0,0 +1,137 @@
+"""Проверка планов запросов списков: EXPLAIN QUERY PLAN для каждого SELECT эндпоинта.
+
+    python -m bench.plans                                  # временная БД, засеянная bench.seed
+    python -m bench.plans --db bench/data/bench_100k.db    # существующая БД (миграции применяются)
+
+Запросы снимаются с настоящих обработчиков (Flask test client) для анонима, пользователя
+и админа, с курсором и без. Код выхода 1, если в плане есть полный проход таблицы (SCAN)
+или сортировка во временном B-дереве (USE TEMP B-TREE). Админские списки без фильтра
+читают таблицу целиком по порядку (SCAN по id / индексу даты) - для них SCAN допустим,
+как и для сводки /stats (startup_stats - десятки строк).
+"""
+import argparse
+import contextlib
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime
+
+from bench import import_app
+
+DEEP_ID = 10 ** 9 # Курсор "глубже последней строки" - план тот же, что на любой странице
+DEEP_DATE = datetime(2100, 1, 1)
+# (название, путь, кто: anon | user | admin, допустим ли SCAN)
+CASES = [
+    ("startups anon", "/startups?limit=20", "anon", False),
+    ("startups user", "/startups?limit=20", "user", False),
+    ("startups own", "/startups?limit=20&filter_by_creator=true", "user", False),
+    ("startups admin", "/startups?limit=20", "admin", True),
+    ("startups milestone", "/startups?limit=20&milestone_stage=mvp&milestone_from=2025-01-01&milestone_to=2025-07-01", "anon", False),
+    ("startups milestone user", "/startups?limit=20&milestone_stage=mvp&milestone_from=2025-01-01", "user", False),
+    ("startups milestone dates", "/startups?limit=20&milestone_from=2025-01-01&milestone_to=2025-02-01", "admin", False),
+    ("vacancies anon", "/vacancies?limit=20", "anon", False),
+    ("vacancies user", "/vacancies?limit=20", "user", False),
+    ("vacancies own", "/vacancies?limit=20&filter_by_creator=true", "user", False),
+    ("vacancies admin", "/vacancies?limit=20", "admin", True),
+    ("meetups anon", "/meetups?limit=20", "anon", False),
+    ("meetups user", "/meetups?limit=20", "user", False),
+    ("meetups admin", "/meetups?limit=20", "admin", True),
+    ("notifications", "/profile/notifications?limit=20", "user", False),
+    ("unread count", "/profile/notifications/unread_count", "user", False),
+    ("applicants", "/vacancies/{vacancy_id}/applicants?limit=20", "admin", False),
+    ("vacancies summary", "/vacancies?limit=20&view=summary&fields=id,title,description", "user", False),
+    ("vacancy detail", "/vacancies/{vacancy_id}", "user", False),
+    ("startup detail", "/startups/{startup_id}", "anon", False),
+    ("sync anon", "/sync?since={sync_token}", "anon", False),
+    ("sync user", "/sync?since={sync_token}", "user", False),
+    ("sync admin", "/sync?since={sync_token}", "admin", False),
+    ("stats anon", "/stats", "anon", True), # Сводка startup_stats - десятки строк, читается целиком
+    ("stats admin", "/stats", "admin", True),
+    ("stats startup", "/stats?startup_id={startup_id}", "user", False),
+]
+CURSORS = { # Префикс пути -> значения ключей сортировки для второй страницы
+    "/startups?": [DEEP_ID], "/vacancies?": [DEEP_ID], "/meetups?": [DEEP_DATE, DEEP_ID],
+    "/profile/notifications?": [DEEP_DATE, DEEP_ID], "/vacancies/{vacancy_id}/applicants": [DEEP_ID],
+}
+
+
+def plan_problems(plan, allow_scan):
+    return [line for line in plan
+            if "TEMP B-TREE" in line or (not allow_scan and line.startswith("SCAN "))]
+
+def expand_cases(main):
+    """Каждый список - еще раз со второй страницы (курсор меняет WHERE, а значит и план)."""
+    for name, path, who, allow_scan in CASES:
+        yield name, path, who, allow_scan
+        prefix = next((p for p in CURSORS if path.startswith(p)), None)
+        if prefix: yield f"{name} +cursor", f"{path}&cursor={main.encode_cursor(CURSORS[prefix])}", who, allow_scan
+
+def endpoint_plans(main, app, db_file):
+    """-> (название, проблемы, планы) для каждого эндпоинта из CASES на БД app (тот же файл db_file)."""
+    with app.app_context():
+        admin = main.User.query.filter_by(role="admin").first()
+        user = (main.User.query.join(main.Startup, main.Startup.creator_user_id == main.User.id)
+                .filter(main.User.role == "user").first() or main.User.query.filter_by(role="user").first())
+        if not user: raise SystemExit("В БД нет обычного пользователя (python -m bench.seed)")
+        vacancy_id = main.db.session.query(main.func.min(main.Vacancy.id)).scalar() or 1
+        startup_id = main.db.session.query(main.func.max(main.Startup.id)).filter(main.visible_startups_condition(None)).scalar() or 1
+        sync_token = main.encode_cursor([0]) # С самого начала - самый длинный диапазон по change_seq
+        headers = {who: {"Authorization": "Bearer " + main.create_access_token(
+                       identity=str(u.id), additional_claims={"role": u.role, "tv": u.token_version})}
+                   for who, u in (("user", user), ("admin", admin))}
+        headers["anon"] = {}
+        statements = []
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith(("SELECT", "WITH")): statements.append((statement, parameters))
+        engine = main.db.engine
+        main.event.listen(engine, "before_cursor_execute", capture)
+
+    client, explain = app.test_client(), sqlite3.connect(db_file)
+    try:
+        for name, path, who, allow_scan in expand_cases(main):
+            statements.clear()
+            with contextlib.redirect_stdout(io.StringIO()):
+                response = client.get(path.format(vacancy_id=vacancy_id, startup_id=startup_id, sync_token=sync_token), headers=headers[who])
+            plans = [[row[3] for row in explain.execute("EXPLAIN QUERY PLAN " + s, p)] for s, p in statements]
+            problems = [line for plan in plans for line in plan_problems(plan, allow_scan)]
+            if response.status_code != 200: problems.append(f"HTTP {response.status_code}")
+            if not plans: problems.append("нет SQL-запросов")
+            yield name, problems, plans
+    finally:
+        main.event.remove(engine, "before_cursor_execute", capture)
+        explain.close()
+
+def check(main, db_file, verbose=False):
+    """-> число эндпоинтов с плохим планом."""
+    failed = 0
+    for name, problems, plans in endpoint_plans(main, main.app, db_file):
+        failed += bool(problems)
+        print(f"{'FAIL' if problems else 'ok':4}  {name:28} {'; '.join(problems)}")
+        if verbose or problems:
+            for plan in plans: print("        " + " | ".join(plan))
+    return failed
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", help="БД для проверки (по умолчанию - временная, bench.seed --scale 300)")
+    parser.add_argument("--verbose", action="store_true", help="печатать планы и для прошедших проверку")
+    args = parser.parse_args()
+
+    db_file = args.db or os.path.join(tempfile.mkdtemp(prefix="bench-plans-"), "plans.db")
+    main = import_app(db_file)
+    with contextlib.redirect_stdout(io.StringIO()):
+        if args.db:
+            with main.app.app_context(): main.upgrade_database()
+        else:
+            from bench.seed import seed
+            main.init_database()
+            with main.app.app_context(): seed(main, 300)
+    failed = check(main, db_file, args.verbose)
+    print(f"\n{failed} эндпоинт(ов) с полным проходом таблицы или сортировкой" if failed else "\nПланы в порядке")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,104 @@
+"""Цена ограничителя частоты (раздел 8.8 main.py) при высокой частоте проверок.
+
+    python -m bench.ratelimit [--processes 1,4] [--threads 1] [--seconds 3]
+
+Проверки идут прямо в rate_limit_hit (общий файл SQLite, как у воркеров gunicorn) из
+нескольких процессов по несколько потоков: "allow" - каждый раз новый ключ (путь UPSERT),
+"reject" - один горячий ключ сверх лимита (UPSERT + SELECT). Печатает проверок в секунду на
+все процессы и p50/p99 одной проверки, затем время POST /login, отклоненного лимитером,
+против пустого обработчика - сколько стоит 429 целиком.
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+
+from bench import import_app
+
+
+def percentile_us(values, p):
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * p / 100))] * 1e6, 1) if values else None
+
+def worker(main, mode, threads, seconds, results):
+    """Процесс: threads потоков проверяют лимит seconds секунд, задержки - в results."""
+    latencies, lock = [], threading.Lock()
+    stop = time.monotonic() + seconds
+    def run(index):
+        own, counter = [], 0
+        with main.app.app_context():
+            while time.monotonic() < stop:
+                key = f"{os.getpid()}-{index}-{counter}" if mode == "allow" else "hot"
+                counter += 1
+                started = time.perf_counter()
+                main.rate_limit_hit("bench", key)
+                own.append(time.perf_counter() - started)
+        with lock: latencies.extend(own)
+    pool = [threading.Thread(target=run, args=(i,)) for i in range(threads)]
+    for t in pool: t.start()
+    for t in pool: t.join()
+    results.put(latencies)
+
+def measure(main, mode, processes, threads, seconds):
+    results = multiprocessing.get_context("fork").Queue()
+    procs = [multiprocessing.get_context("fork").Process(target=worker, args=(main, mode, threads, seconds, results))
+             for _ in range(processes)]
+    for p in procs: p.start()
+    latencies = [value for _ in procs for value in results.get()]
+    for p in procs: p.join()
+    return {"checks_per_second": round(len(latencies) / seconds), "p50_us": percentile_us(latencies, 50),
+            "p99_us": percentile_us(latencies, 99)}
+
+def rejected_request_us(main, repeat=2000):
+    """Лучшее время POST /login: отклоненного лимитером и без лимитера на пустом теле (400 до хеша)."""
+    client = main.app.test_client()
+    def timed(body):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            client.post("/login", json=body)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return round(best * 1e6, 1)
+    main.app.config["RATE_LIMIT_ENABLED"] = False
+    baseline = timed({})
+    main.app.config["RATE_LIMIT_ENABLED"] = True
+    main.app.config["RATE_LIMITS"]["login_username"] = (1, 3600)
+    client.post("/login", json={"username": "bench-limited", "password": "x"}) # Съедаем единственный запрос
+    rejected = timed({"username": "bench-limited", "password": "x"})
+    return {"login_400_without_limiter_us": baseline, "login_429_us": rejected}
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processes", default="1,4", help="числа процессов через запятую")
+    parser.add_argument("--threads", type=int, default=1, help="потоков на процесс (больше, чем ядер, - хвост p99 от планировщика ОС)")
+    parser.add_argument("--seconds", type=float, default=3)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="bench-ratelimit-")
+    os.environ["RATE_LIMIT_DB"] = os.path.join(directory, "ratelimit.db")
+    main = import_app(os.path.join(directory, "app.db"))
+    with contextlib.redirect_stdout(io.StringIO()): main.init_database()
+    main.app.config["RATE_LIMITS"]["bench"] = (10, 1) # "reject": горячий ключ почти всегда сверх лимита
+    main.app.config["RATE_LIMIT_ENABLED"] = True
+
+    report = {"cpus": os.cpu_count(), "threads_per_process": args.threads, "seconds": args.seconds, "checks": {}}
+    for processes in [int(p) for p in args.processes.split(",")]:
+        for mode in ("allow", "reject"):
+            stats = measure(main, mode, processes, args.threads, args.seconds)
+            report["checks"][f"{mode} x{processes}"] = stats
+            print(f"{mode:6} процессов {processes:>2}: {stats['checks_per_second']:>8} проверок/с  "
+                  f"p50 {stats['p50_us']} us  p99 {stats['p99_us']} us")
+    with contextlib.redirect_stdout(io.StringIO()): report["request"] = rejected_request_us(main)
+    print(f"POST /login: 400 без лимитера {report['request']['login_400_without_limiter_us']} us, "
+          f"429 лимитера {report['request']['login_429_us']} us")
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main_cli()
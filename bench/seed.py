@@ -0,0 +1,154 @@
+"""Детерминированный сидер: одинаковые --scale и --seed дают одинаковые данные.
+
+    python -m bench.seed --scale 1k|100k|1m|<число> --db bench/data/bench_1k.db [--force]
+
+--scale - число пользователей, остальные таблицы пропорциональны (см. TABLE_RATIOS).
+Все пользователи bench_user_<i> с паролем BENCH_PASSWORD; админ - как в init_database.
+"""
+import argparse
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam
+
+from bench import import_app
+
+BENCH_PASSWORD = "bench-pass"
+BASE_TIME = datetime(2024, 1, 1)
+CHUNK_SIZE = 5000
+# Строк на одного пользователя
+TABLE_RATIOS = {"startups": 0.1, "vacancies": 0.3, "applications": 1.0, "meetups": 0.05, "notifications": 2.0}
+STATUS_WEIGHTS = (("approved", 70), ("pending", 20), ("rejected", 10))
+WORDS = ("платформа", "сервис", "данные", "доставка", "финтех", "образование", "здоровье", "игры", "блокчейн",
+         "маркетплейс", "аналитика", "облако", "команда", "python", "react", "ai", "mobile", "b2b", "crm", "логистика")
+
+
+def parse_scale(value):
+    value = value.lower()
+    multiplier = {"k": 1000, "m": 1000000}.get(value[-1], 1)
+    return int(float(value.rstrip("km")) * multiplier)
+
+def text(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+def status(rng):
+    return rng.choices([s for s, _ in STATUS_WEIGHTS], [w for _, w in STATUS_WEIGHTS])[0]
+
+def timeline(rng, stages, stage):
+    """Плановые даты этапов после stage по возрастанию (как PUT /startups/<id>/timeline), часть - не назначена."""
+    day, result = 0, {}
+    for s in stages[stages.index(stage) + 1:]:
+        day += rng.randint(60, 365)
+        result[s] = (BASE_TIME + timedelta(days=day)).date().isoformat() if rng.random() < 0.8 else None
+    return result
+
+def insert_chunks(main, model, rows):
+    """Core executemany пачками; rows - генератор, чтобы 1M строк не держать в памяти."""
+    table, chunk, total = model.__table__, [], 0
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= CHUNK_SIZE:
+            main.db.session.execute(table.insert(), chunk); main.db.session.commit()
+            total += len(chunk); chunk = []
+    if chunk: main.db.session.execute(table.insert(), chunk); main.db.session.commit(); total += len(chunk)
+    return total
+
+def seed(main, users, seed_value=42):
+    rng = random.Random(seed_value)
+    counts = {name: max(1, int(users * ratio)) for name, ratio in TABLE_RATIOS.items()}
+    admin_id = main.User.query.filter_by(role="admin").first().id
+    password_hash = main.generate_password_hash(BENCH_PASSWORD, main.current_app.config["PASSWORD_HASH_METHOD"]) # Один на всех
+    first_user = admin_id + 1
+    user_ids = range(first_user, first_user + users)
+    result = {}
+
+    result["users"] = insert_chunks(main, main.User, (
+        {"id": first_user + i, "username": f"bench_user_{i}", "password_hash": password_hash, "role": "user",
+         "full_name": f"Bench User {i}", "telegram": f"@bench_user_{i}", "resume_link": f"https://example.com/cv/{i}",
+         "token_version": 0, "created_at": BASE_TIME + timedelta(seconds=i)} for i in range(users)))
+
+    startups = []
+    def startup_rows():
+        for i in range(counts["startups"]):
+            stage = rng.choice(main.ALLOWED_STAGES)
+            row = {"id": i + 1, "name": f"Startup {i} {text(rng, 2)}", "description": text(rng, 30),
+                   "funds_raised": {"ETH": float(rng.randint(0, 500))}, # Как пишет PUT /startups/<id>/funds
+                   "opensea_link": None, "status": status(rng),
+                   "rejection_reason": None, "creator_user_id": rng.choice(user_ids), "current_stage": stage,
+                   "stage_timeline": timeline(rng, main.ALLOWED_STAGES, stage),
+                   "is_held": rng.random() < 0.05, "created_at": BASE_TIME + timedelta(minutes=i)}
+            if row["status"] == "rejected": row["rejection_reason"] = "bench"
+            startups.append((row["id"], row["creator_user_id"], row["name"], row["status"] == "approved" and not row["is_held"]))
+            yield row
+    result["startups"] = insert_chunks(main, main.Startup, startup_rows())
+
+    approved_vacancies = []
+    def vacancy_rows():
+        for i in range(counts["vacancies"]):
+            startup_id, creator_id, startup_name, startup_visible = rng.choice(startups)
+            row = {"id": i + 1, "startup_id": startup_id, "title": f"Vacancy {i} {text(rng, 2)}", "description": text(rng, 25),
+                   "salary": f"{rng.randint(50, 400)}k", "requirements": text(rng, 12), "applicant_count": 0,
+                   "status": status(rng), "rejection_reason": None, "creator_user_id": creator_id,
+                   "startup_name": startup_name, "startup_creator_id": creator_id,
+                   "created_at": BASE_TIME + timedelta(minutes=i)}
+            row["publicly_visible"] = startup_visible and row["status"] == "approved"
+            if row["status"] == "approved": approved_vacancies.append(row["id"])
+            yield row
+    result["vacancies"] = insert_chunks(main, main.Vacancy, vacancy_rows())
+
+    applicant_counts = {}
+    def application_rows():
+        seen = set()
+        for i in range(counts["applications"] if approved_vacancies else 0):
+            pair = (rng.choice(approved_vacancies), rng.choice(user_ids))
+            if pair in seen: continue
+            seen.add(pair)
+            applicant_counts[pair[0]] = applicant_counts.get(pair[0], 0) + 1
+            user_index = pair[1] - first_user
+            yield {"vacancy_id": pair[0], "user_id": pair[1], "telegram": f"@bench_user_{user_index}",
+                   "resume_link": f"https://example.com/cv/{user_index}", "created_at": BASE_TIME + timedelta(seconds=i)}
+    result["applications"] = insert_chunks(main, main.VacancyApplication, application_rows())
+    main.db.session.execute(main.Vacancy.__table__.update().where(main.Vacancy.id == bindparam("vid"))
+                                                 .values(applicant_count=bindparam("cnt")),
+                            [{"vid": v, "cnt": c} for v, c in applicant_counts.items()])
+    main.db.session.commit()
+
+    result["meetups"] = insert_chunks(main, main.Meetup, (
+        {"id": i + 1, "title": f"Meetup {i} {text(rng, 2)}", "date": BASE_TIME + timedelta(days=rng.randint(0, 730), hours=18),
+         "description": text(rng, 20), "link": f"https://example.com/meetup/{i}", "status": status(rng),
+         "rejection_reason": None, "creator_user_id": rng.choice(user_ids), "created_at": BASE_TIME + timedelta(hours=i)}
+        for i in range(counts["meetups"])))
+
+    result["notifications"] = insert_chunks(main, main.Notification, (
+        {"user_id": rng.choice(user_ids), "admin_id": admin_id, "message": text(rng, 8),
+         "timestamp": BASE_TIME + timedelta(seconds=i), "is_read": rng.random() < 0.5}
+        for i in range(counts["notifications"])))
+    return result
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", default="1k")
+    parser.add_argument("--db", help="файл SQLite (по умолчанию bench/data/bench_<scale>.db)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--force", action="store_true", help="пересоздать существующий файл")
+    args = parser.parse_args()
+    db_file = args.db or os.path.join("bench", "data", f"bench_{args.scale}.db")
+    if os.path.exists(db_file):
+        if not args.force: raise SystemExit(f"{db_file} уже существует (--force чтобы пересоздать)")
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(db_file + suffix): os.remove(db_file + suffix)
+    os.makedirs(os.path.dirname(os.path.abspath(db_file)), exist_ok=True)
+
+    main = import_app(db_file)
+    main.init_database()
+    started = time.monotonic()
+    with main.app.app_context(): counts = seed(main, parse_scale(args.scale), args.seed)
+    print(json.dumps({"db": db_file, "scale": args.scale, "seed": args.seed, "rows": counts,
+                      "seconds": round(time.monotonic() - started, 1)}, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,89 @@
+"""Сериализация списков: ORM-объекты + DefaultJSONProvider против строк Core + RawJSON + FastJSONProvider.
+
+    python -m bench.serialize --db bench/data/bench_100k.db [--rows 5000] [--repeat 5]
+
+Для каждой ленты печатает время на строку (выборка + сериализация) и пик памяти на строку
+(tracemalloc), а также проверяет, что оба пути дают побайтно одинаковый JSON.
+"""
+import argparse
+import contextlib
+import io
+import json
+import time
+import tracemalloc
+
+from bench import import_app
+
+
+def legacy_paths(main):
+    """Списки до перехода на чтение колонками: объекты ORM с eager-загрузкой связей."""
+    db, desc = main.db, main.desc
+    return {
+        "startups": lambda n: [main.serialize_startup(s) for s in main.Startup.query.options(main.joinedload(main.Startup.creator))
+                               .order_by(desc(main.Startup.id)).limit(n)],
+        "vacancies": lambda n: [main.serialize_vacancy(v) for v in main.Vacancy.query.join(main.Startup, main.Vacancy.startup_id == main.Startup.id)
+                                .options(main.contains_eager(main.Vacancy.startup)).order_by(desc(main.Vacancy.id)).limit(n)],
+        "meetups": lambda n: [main.serialize_meetup(m) for m in main.Meetup.query.options(main.joinedload(main.Meetup.creator))
+                              .order_by(desc(main.Meetup.date), desc(main.Meetup.id)).limit(n)],
+        "notifications": lambda n: [main.serialize_notification(x) for x in main.Notification.query
+                                    .order_by(desc(main.Notification.timestamp), desc(main.Notification.id)).limit(n)],
+    }
+
+def fast_paths(main):
+    db, desc, User = main.db, main.desc, main.User
+    return {
+        "startups": lambda n: [main.serialize_startup_row(r) for r in db.session.query(*main.STARTUP_LIST_COLUMNS)
+                               .outerjoin(User, User.id == main.Startup.creator_user_id).order_by(desc(main.Startup.id)).limit(n)],
+        "vacancies": lambda n: [main.serialize_vacancy_row(r) for r in db.session.query(*main.VACANCY_LIST_COLUMNS)
+                                .join(main.Startup, main.Vacancy.startup_id == main.Startup.id).order_by(desc(main.Vacancy.id)).limit(n)],
+        "meetups": lambda n: [main.serialize_meetup_row(r) for r in db.session.query(*main.MEETUP_LIST_COLUMNS)
+                              .outerjoin(User, User.id == main.Meetup.creator_user_id)
+                              .order_by(desc(main.Meetup.date), desc(main.Meetup.id)).limit(n)],
+        "notifications": lambda n: [main.serialize_notification_row(r) for r in db.session.query(*main.NOTIFICATION_LIST_COLUMNS)
+                                    .order_by(desc(main.Notification.timestamp), desc(main.Notification.id)).limit(n)],
+    }
+
+def measure(main, build, provider, rows, repeat):
+    """-> (лучшее время на строку в мкс, пик памяти на строку в байтах, тело ответа)."""
+    best, body = None, None
+    for _ in range(repeat):
+        main.db.session.remove() # Пустая identity map, как в новом запросе
+        started = time.perf_counter()
+        items = build(rows)
+        body = provider.dumps(items, separators=(",", ":"))
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    main.db.session.remove()
+    tracemalloc.start()
+    provider.dumps(build(rows), separators=(",", ":"))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    count = max(1, len(json.loads(body)))
+    return round(best / count * 1e6, 2), round(peak / count), body
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", required=True)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    main = import_app(args.db)
+    with contextlib.redirect_stdout(io.StringIO()), main.app.app_context(): main.upgrade_database()
+    default_provider = main.DefaultJSONProvider(main.app)
+    report = {}
+    with main.app.test_request_context():
+        legacy, fast = legacy_paths(main), fast_paths(main)
+        for feed in legacy:
+            old_us, old_bytes, old_body = measure(main, legacy[feed], default_provider, args.rows, args.repeat)
+            new_us, new_bytes, new_body = measure(main, fast[feed], main.app.json, args.rows, args.repeat)
+            report[feed] = {"rows": len(json.loads(new_body)), "identical": old_body == new_body,
+                            "legacy_us_per_row": old_us, "fast_us_per_row": new_us,
+                            "legacy_peak_bytes_per_row": old_bytes, "fast_peak_bytes_per_row": new_bytes}
+            print(f"{feed:14} {old_us:>8} -> {new_us:>8} us/row   {old_bytes:>6} -> {new_bytes:>6} B/row   "
+                  f"identical={old_body == new_body}")
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,92 @@
+"""Холодный старт воркера: прогрев в мастере (main.warm_up, gunicorn preload_app) против без него.
+
+    python -m bench.startup --db bench/data/bench_100k.db [--workers 4]
+
+Каждый режим - в свежем интерпретаторе: импорт main (как мастер gunicorn), затем при "warm" -
+warm_up, затем fork воркеров. Воркер делает dispose_after_fork и по два запроса к лентам:
+печатает время импорта и прогрева, время первого и повторного запроса в воркере (медиана по
+воркерам) и Private/Shared память воркера из /proc (что досталось копией при записи).
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import statistics
+import time
+
+from bench import import_app
+
+PATHS = ("/startups?limit=20", "/vacancies?limit=20", "/meetups?limit=20", "/vacancies?limit=20&view=summary")
+
+
+def memory_kb():
+    """Private и Shared память процесса, КБ (Linux; иначе None)."""
+    try:
+        with open("/proc/self/smaps_rollup") as f: rows = dict(line.split(":", 1) for line in f if ":" in line)
+    except OSError: return None
+    kb = lambda *names: sum(int(rows[name].split()[0]) for name in names if name in rows)
+    return {"private_kb": kb("Private_Clean", "Private_Dirty"), "shared_kb": kb("Shared_Clean", "Shared_Dirty")}
+
+def worker(main, results):
+    """Воркер после fork: свой пул соединений, первый (холодный) и повторный запрос каждой ленты."""
+    started = time.perf_counter()
+    main.dispose_after_fork(main.app)
+    client, timings = main.app.test_client(), {}
+    for path in PATHS:
+        first = time.perf_counter()
+        client.get(path).get_data()
+        second = time.perf_counter()
+        client.get(path).get_data()
+        timings[path] = ((second - first) * 1000, (time.perf_counter() - second) * 1000)
+    results.put({"ready_ms": (time.perf_counter() - started) * 1000, "timings": timings, "memory": memory_kb()})
+
+def measure(db_file, warm, workers, results):
+    """Один режим в свежем процессе: импорт, (прогрев), fork воркеров."""
+    started = time.perf_counter()
+    main = import_app(db_file)
+    import_ms = (time.perf_counter() - started) * 1000
+    with contextlib.redirect_stdout(io.StringIO()), main.app.app_context(): main.upgrade_database()
+    warm_up_ms = main.warm_up(main.app) * 1000 if warm else None
+    if not warm:
+        with main.app.app_context(): main.db.engine.dispose()
+    fork = multiprocessing.get_context("fork")
+    queue = fork.Queue()
+    procs = [fork.Process(target=worker, args=(main, queue)) for _ in range(workers)]
+    for p in procs: p.start()
+    reports = [queue.get() for _ in procs]
+    for p in procs: p.join()
+    median = lambda values: round(statistics.median(values), 2)
+    memory = [r["memory"] for r in reports if r["memory"]]
+    results.put({
+        "import_ms": round(import_ms, 1), "warm_up_ms": round(warm_up_ms, 1) if warm else None,
+        "worker_ready_ms": median([r["ready_ms"] for r in reports]),
+        "first_request_ms": {path: median([r["timings"][path][0] for r in reports]) for path in PATHS},
+        "repeat_request_ms": {path: median([r["timings"][path][1] for r in reports]) for path in PATHS},
+        "worker_private_kb": median([m["private_kb"] for m in memory]) if memory else None,
+        "worker_shared_kb": median([m["shared_kb"] for m in memory]) if memory else None,
+    })
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", required=True)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    spawn, report = multiprocessing.get_context("spawn"), {"workers": args.workers}
+    for mode in ("cold", "warm"):
+        results = spawn.Queue()
+        process = spawn.Process(target=measure, args=(args.db, mode == "warm", args.workers, results))
+        process.start()
+        report[mode] = stats = results.get()
+        process.join()
+        print(f"\n{mode}: импорт {stats['import_ms']} ms, прогрев {stats['warm_up_ms']} ms, "
+              f"воркер готов за {stats['worker_ready_ms']} ms, Private {stats['worker_private_kb']} KB / "
+              f"Shared {stats['worker_shared_kb']} KB")
+        for path in PATHS:
+            print(f"  {path:36} первый {stats['first_request_ms'][path]:>8} ms  повторный {stats['repeat_request_ms'][path]:>8} ms")
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main_cli()
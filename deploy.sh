@@ -38,11 +38,12 @@ fi
 echo "Копируем файлы на сервер..."
 echo "Раскомментируйте следующие строки и укажите данные вашего сервера:"
 # scp -r build user@your-server-ip:/var/www/yourfuture/
-# scp -r main.py requirements.txt .env user@your-server-ip:/var/www/yourfuture/
+# scp -r main.py gunicorn.conf.py ecosystem.config.js requirements.txt .env user@your-server-ip:/var/www/yourfuture/
 
 echo "======== Деплой завершен ========"
 echo "Для завершения настройки на сервере выполните:"
 echo "1. sudo ln -s /etc/nginx/sites-available/yourfuture.conf /etc/nginx/sites-enabled/"
 echo "2. sudo systemctl restart nginx"
 echo "3. sudo certbot --nginx -d yourfuture.example.com"
-echo "4. cd /var/www/yourfuture && pm2 start main.py --interpreter python3 --name yourfuture-backend"
\ No newline at end of file
+echo "4. cd /var/www/yourfuture && flask --app main init-db && pm2 start ecosystem.config.js"
+echo "Обновление кода: flask --app main init-db && pm2 reload yourfuture-backend"
\ No newline at end of file
@@ -2,15 +2,28 @@ module.exports = {
   apps: [
     {
       name: 'yourfuture-backend',
-      script: 'main.py',
-      interpreter: 'python3',
+      // gunicorn сам держит несколько воркеров (см. gunicorn.conf.py), pm2 - только один мастер
+      script: 'gunicorn',
+      args: '-c gunicorn.conf.py main:app',
+      interpreter: 'none',
       instances: 1,
       autorestart: true,
       watch: false,
       max_memory_restart: '1G',
+      // TERM - плавная остановка gunicorn (SIGINT, который pm2 шлет по умолчанию, рвет запросы);
+      // kill_timeout больше GUNICORN_GRACEFUL_TIMEOUT, иначе pm2 добьет мастер через 1.6 с.
+      // Перед первым запуском и после обновления кода: flask --app main init-db, затем pm2 reload
+      kill_signal: 'SIGTERM',
+      kill_timeout: 15000,
       env: {
         NODE_ENV: 'production',
-        DATABASE_URL: 'sqlite:///yourfuture_app.db'
+        DATABASE_URL: 'sqlite:///yourfuture_app.db',
+        GUNICORN_WORKERS: '4',
+        // gevent: открытые потоки уведомлений (SSE) ждут в гринлетах и не занимают потоки воркеров
+        GUNICORN_WORKER_CLASS: 'gevent',
+        GUNICORN_WORKER_CONNECTIONS: '2000',
+        GUNICORN_GRACEFUL_TIMEOUT: '10',
+        PROXY_COUNT: '1' // За nginx: IP клиента для лимитов частоты - из X-Forwarded-For
       }
     },
     {
@@ -0,0 +1,89 @@
+# gunicorn.conf.py - продакшен-запуск бэкенда:
+#   flask --app main init-db            # схема и админ - отдельный шаг до запуска (идемпотентный)
+#   gunicorn -c gunicorn.conf.py main:app
+# Число воркеров/потоков задается переменными окружения (см. ecosystem.config.js).
+
+import multiprocessing
+import os
+import re
+import time
+
+from gunicorn.glogging import Logger
+
+_config_loaded = time.perf_counter() # Отсюда считаем, сколько мастер импортировал и прогревал приложение
+
+bind = os.environ.get("GUNICORN_BIND", "127.0.0.1:5000")
+workers = int(os.environ.get("GUNICORN_WORKERS", min(multiprocessing.cpu_count() * 2 + 1, 8)))
+threads = int(os.environ.get("GUNICORN_THREADS", 4)) # Для gthread; пул соединений (DB_POOL_SIZE) - не меньше
+# gevent - гринлет на запрос: открытый SSE-поток (/profile/notifications/stream) ждет в гринлете и
+# не занимает поток воркера. gthread - по потоку на запрос, каждая открытая вкладка держит один
+# из workers * threads потоков, и несколько десятков вкладок останавливают весь API.
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gevent")
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", 2000)) # Для gevent
+timeout = 30
+# SSE-потоки сами не заканчиваются: старый воркер при перезапуске всегда ждет graceful_timeout целиком,
+# поэтому он короткий (клиент переподключается с Last-Event-ID). kill_timeout в pm2 - больше него
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 10))
+keepalive = 5
+accesslog = "-"
+errorlog = "-"
+
+_token_in_query = re.compile(r"(^|[?&])jwt=[^&\s]+")
+
+class TokenMaskingLogger(Logger):
+    """Access-лог без токенов: EventSource передает токен в ?jwt=, а строка запроса попадает в лог."""
+    def atoms(self, resp, req, environ, request_time):
+        atoms = super().atoms(resp, req, environ, request_time)
+        for key in ("r", "q"):
+            if atoms.get(key): atoms[key] = _token_in_query.sub(r"\1jwt=***", atoms[key])
+        return atoms
+
+logger_class = TokenMaskingLogger
+
+# Приложение импортирует и прогревает мастер (main.warm_up), воркеры получают его после fork
+# копией при записи. HUP пересоздает воркеров из уже загруженного мастера за миллисекунды, но
+# без нового кода: новый код - только перезапуском мастера (pm2 reload yourfuture-backend).
+preload_app = os.environ.get("GUNICORN_PRELOAD", "true").lower() == "true"
+
+if preload_app and worker_class == "gevent":
+    # Модуль импортируется в мастере: патчим до импорта, иначе Lock/Event/сокеты, созданные при
+    # импорте, останутся блокирующими и в воркере (gevent-воркер патчит уже после fork)
+    from gevent import monkey
+    monkey.patch_all()
+
+
+def on_starting(server):
+    """В мастере до запуска воркеров: проверка схемы, сброс метрик, прогрев приложения."""
+    import main
+    with main.app.app_context():
+        if not main.schema_is_current():
+            raise SystemExit("Схема БД не создана или устарела: выполните flask --app main init-db")
+        main.reset_metrics_dir() # Счетчики /metrics начинаются с нуля при каждом запуске сервера
+        if preload_app:
+            warm_up_seconds = main.warm_up(main.app)
+            server.log.info("App preloaded in %.0f ms (warm-up %.0f ms)",
+                            (time.perf_counter() - _config_loaded) * 1000, warm_up_seconds * 1000)
+        main.db.engine.dispose() # Соединения мастера не должны достаться воркерам после fork
+
+
+def pre_fork(server, worker):
+    worker.fork_started = time.perf_counter() # Объект воркера переходит в дочерний процесс вместе с полем
+
+
+def post_fork(server, worker):
+    """Первым делом в воркере: свой пул соединений (SQLite-соединение нельзя делить между процессами)."""
+    if preload_app:
+        import main
+        main.dispose_after_fork(main.app)
+
+
+def post_worker_init(worker):
+    """Воркер загрузил приложение и готов принимать запросы: холодный старт - в лог и /metrics."""
+    import main
+    boot_seconds = time.perf_counter() - worker.fork_started
+    worker.log.info("Worker %s ready in %.1f ms after fork (preload_app=%s)", worker.pid, boot_seconds * 1000, preload_app)
+    with main.app.app_context():
+        main.observe_metric("worker_boot_seconds", boot_seconds)
+        main.start_metrics_flusher()
+        main.start_broadcast_watchdog() # Рассылки, прерванные перезапуском прошлых воркеров
+        main.start_sync_pruner() # Надгробия /sync старше SYNC_TOMBSTONE_RETENTION_DAYS
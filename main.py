@@ -1,39 +1,522 @@
 # main.py (ПОЛНЫЙ КОД - SQLAlchemy + SQLite - ОТФОРМАТИРОВАНО и ИСПРАВЛЕНО)
 
+import base64
+import contextvars
+import csv
+import gzip
+import io
+import hashlib
+import html
+import json
+import math
 import os
+import queue
 import re
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+import atexit
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timezone, timedelta, date
-from functools import wraps # Добавил для @admin_required
+from functools import lru_cache, partial, wraps # Добавил для @admin_required
+from urllib.parse import urlencode
 
-from flask import Flask, jsonify, request
+import click
+from flask import Blueprint, Flask, Response, current_app, g, has_request_context, jsonify, make_response, request, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
-from flask_jwt_extended import (JWTManager, create_access_token,
+from flask_jwt_extended import (JWTManager, create_access_token, get_jwt,
                                 get_jwt_identity, jwt_required,
                                 verify_jwt_in_request)
-from werkzeug.security import check_password_hash, generate_password_hash
+from werkzeug.middleware.proxy_fix import ProxyFix
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy import or_, desc # Добавил desc для сортировки
-
-# 1. Инициализация Flask App
-app = Flask(__name__)
-
-# 2. CORS
-CORS(app, supports_credentials=True) # Добавил supports_credentials на всякий случай
-
-# 3. Конфигурация
+from sqlalchemy import and_, case, or_, desc, event, exists, false, func, literal_column, null, true, type_coerce, union_all, update # Добавил desc для сортировки
+from sqlalchemy import column as sql_column, inspect as sql_inspect, table as sql_table
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import configure_mappers, contains_eager, joinedload
+from sqlalchemy.pool import QueuePool
+try: import brotli # Необязательная зависимость (pip install brotli): без нее отдаем только gzip
+except ImportError: brotli = None
+
+# 1. Конфигурация
+# Значения по умолчанию - из переменных окружения (см. ecosystem.config.js); create_app(config)
+# накладывает поверх них свой словарь (тесты, бенчмарки, второй экземпляр приложения).
 basedir = os.path.abspath(os.path.dirname(__file__))
-db_path = os.path.join(basedir, 'yourfuture_app.db') # Имя файла БД
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + db_path
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config["JWT_SECRET_KEY"] = os.environ.get(
-    "JWT_SECRET_KEY", "change-this-super-secret-key-please-v3" # ОБЯЗАТЕЛЬНО СМЕНИ!
-)
-app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(hours=1) # Время жизни токена
 
-# 4. Инициализация Расширений
-db = SQLAlchemy(app)
-jwt = JWTManager(app)
+def load_config():
+    """Конфигурация из окружения. Читается при каждом create_app, а не при импорте модуля."""
+    return {
+        # DATABASE_URL; относительный путь SQLite считаем от папки проекта (см. configure_database)
+        'SQLALCHEMY_DATABASE_URI': os.environ.get("DATABASE_URL", "sqlite:///yourfuture_app.db"),
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        # Профиль SQLite (применяется к каждому новому соединению, см. _configure_sqlite_connection)
+        "SQLITE_BUSY_TIMEOUT_MS": int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 5000)), # Писатель ждет лок, а не падает
+        "SQLITE_CACHE_SIZE_KB": int(os.environ.get("SQLITE_CACHE_SIZE_KB", 20000)), # Кеш страниц на соединение
+        "SQLITE_MMAP_SIZE": int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+        "DB_POOL_SIZE": int(os.environ.get("DB_POOL_SIZE", 8)), # gthread: не меньше числа потоков; gevent: лишние гринлеты ждут соединение
+        "DB_MAX_OVERFLOW": int(os.environ.get("DB_MAX_OVERFLOW", 4)),
+        "JWT_SECRET_KEY": os.environ.get("JWT_SECRET_KEY", "change-this-super-secret-key-please-v3"), # ОБЯЗАТЕЛЬНО СМЕНИ!
+        "JWT_ACCESS_TOKEN_EXPIRES": timedelta(hours=1), # Время жизни токена
+        # Доверять role/id из claims токена вместо чтения users на каждый запрос
+        "JWT_ROLE_CLAIMS": os.environ.get("JWT_ROLE_CLAIMS", "false").lower() == "true",
+        # Сколько секунд воркер помнит token_version пользователя в режиме JWT_ROLE_CLAIMS: столько же
+        # после смены роли или отзыва токенов другие воркеры еще принимают старый токен
+        "JWT_TOKEN_VERSION_TTL": int(os.environ.get("JWT_TOKEN_VERSION_TTL", 30)),
+        # Сколько дней /sync помнит удаления; клиент с более старым token получает 410 и грузит списки заново
+        "SYNC_TOMBSTONE_RETENTION_DAYS": float(os.environ.get("SYNC_TOMBSTONE_RETENTION_DAYS", 30)),
+        # Как часто воркер проверяет новые уведомления для SSE-потоков (в т.ч. записанные другими воркерами)
+        "NOTIFICATION_POLL_SECONDS": float(os.environ.get("NOTIFICATION_POLL_SECONDS", 1.0)),
+        # Хеширование паролей: метод werkzeug ("pbkdf2:sha256:<итерации>") и размер пула на воркер.
+        # gthread: WORKERS + QUEUE держи меньше GUNICORN_THREADS, иначе шторм логинов займет все потоки воркера
+        "PASSWORD_HASH_METHOD": os.environ.get("PASSWORD_HASH_METHOD", f"pbkdf2:sha256:{DEFAULT_PBKDF2_ITERATIONS}"),
+        "PASSWORD_HASH_WORKERS": int(os.environ.get("PASSWORD_HASH_WORKERS", 1)),
+        "PASSWORD_HASH_QUEUE": int(os.environ.get("PASSWORD_HASH_QUEUE", 2)), # Сверх этого - сразу 503
+        # Админ, которого создает init-db (если в БД еще нет ни одного админа)
+        "ADMIN_USERNAME": os.environ.get("ADMIN_USERNAME", "admin"),
+        "ADMIN_PASSWORD": os.environ.get("ADMIN_PASSWORD", "verysecretadminpassword"), # ВАЖНО: задайте свой!
+
+        # Метрики: Server-Timing в каждом ответе и /metrics в формате Prometheus (см. раздел 4.2)
+        "METRICS_ENABLED": os.environ.get("METRICS_ENABLED", "true").lower() == "true",
+        # Сюда каждый воркер сбрасывает свои счетчики; /metrics суммирует файлы всех воркеров
+        "METRICS_DIR": os.environ.get("METRICS_DIR", os.path.join(basedir, ".metrics")),
+        "METRICS_FLUSH_SECONDS": float(os.environ.get("METRICS_FLUSH_SECONDS", 2)),
+        "METRICS_TOKEN": os.environ.get("METRICS_TOKEN"), # Если задан - /metrics требует Bearer <токен>
+        "SLOW_QUERY_MS": float(os.environ.get("SLOW_QUERY_MS", 200)), # Порог лога медленных запросов
+
+        # Сжатие ответов по Accept-Encoding (см. раздел 4.3); тела меньше порога уходят как есть
+        "COMPRESS_ENABLED": os.environ.get("COMPRESS_ENABLED", "true").lower() == "true",
+        "COMPRESS_MIN_BYTES": int(os.environ.get("COMPRESS_MIN_BYTES", 1024)),
+        "COMPRESS_GZIP_LEVEL": int(os.environ.get("COMPRESS_GZIP_LEVEL", 6)), # 1-9
+        "COMPRESS_BROTLI_QUALITY": int(os.environ.get("COMPRESS_BROTLI_QUALITY", 5)), # 0-11
+        # Тела больше этого gevent-воркер сжимает в нативном threadpool, не останавливая остальные гринлеты
+        "COMPRESS_OFFLOAD_BYTES": int(os.environ.get("COMPRESS_OFFLOAD_BYTES", 256 * 1024)),
+
+        # Ограничение частоты запросов (см. раздел 8.8): общий для всех воркеров файл SQLite и политики
+        # {"имя": [запросов, секунд]} поверх RATE_LIMIT_POLICIES
+        "RATE_LIMIT_ENABLED": os.environ.get("RATE_LIMIT_ENABLED", "true").lower() == "true",
+        "RATE_LIMIT_DB": os.environ.get("RATE_LIMIT_DB", os.path.join(basedir, ".ratelimit.db")),
+        "RATE_LIMITS": json.loads(os.environ.get("RATE_LIMITS", "{}")),
+        # Сколько прокси перед приложением (nginx - 1): тогда IP клиента берется из X-Forwarded-For
+        "PROXY_COUNT": int(os.environ.get("PROXY_COUNT", 0)),
+    }
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool, замеряющий ожидание соединения (и открытие нового) - метрика db_pool_checkout_seconds."""
+    def _do_get(self):
+        started = time.perf_counter()
+        try: return super()._do_get()
+        finally: observe_metric("db_pool_checkout_seconds", time.perf_counter() - started)
+
+# JSON-колонки пишутся ровно так, как их выводит jsonify (ASCII, ключи по алфавиту, без пробелов),
+# поэтому списки отдают их текст из БД как есть (RawJSON), без json.loads/json.dumps
+canonical_json_dumps = partial(json.dumps, ensure_ascii=True, sort_keys=True, separators=(",", ":"))
+
+def configure_database(config):
+    """Путь SQLite - абсолютный (от папки проекта), пул и профиль соединений - для файла SQLite."""
+    database_url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    is_sqlite_file = database_url.get_backend_name() == 'sqlite' and database_url.database not in (None, '', ':memory:')
+    if is_sqlite_file and not os.path.isabs(database_url.database):
+        database_url = database_url.set(database=os.path.join(basedir, database_url.database))
+    config['SQLALCHEMY_DATABASE_URI'] = database_url.render_as_string(hide_password=False)
+    options = {"json_serializer": canonical_json_dumps}
+    if is_sqlite_file:
+        options |= {
+            "poolclass": InstrumentedQueuePool,
+            "pool_size": config["DB_POOL_SIZE"],
+            "max_overflow": config["DB_MAX_OVERFLOW"],
+            "pool_timeout": 30,
+            "connect_args": {"timeout": config["SQLITE_BUSY_TIMEOUT_MS"] / 1000, "check_same_thread": False},
+        }
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = options | config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+
+# 2. Расширения и blueprint. Маршруты, хуки и CLI-команды модуля регистрируются на api,
+# а к приложению их (и db/jwt) привязывает create_app
+db = SQLAlchemy()
+jwt = JWTManager()
+api = Blueprint('api', __name__, cli_group=None) # cli_group=None: команды - прямо в flask --app main ...
+
+# 3. Фабрика приложения
+def create_app(config=None):
+    """Собирает приложение: конфиг из окружения + config, CORS, расширения, маршруты.
+
+    Схему БД не трогает - ее создает и мигрирует flask --app main init-db (см. bootstrap_database)."""
+    app = Flask(__name__)
+    app.config.from_mapping(load_config())
+    if config: app.config.from_mapping(config)
+    configure_database(app.config)
+    CORS(app, supports_credentials=True) # Добавил supports_credentials на всякий случай
+    if app.config["PROXY_COUNT"]: app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config["PROXY_COUNT"])
+    app.json = TimedJSONProvider(app)
+    db.init_app(app)
+    jwt.init_app(app)
+    app.register_blueprint(api)
+    return app
+
+# 4. Инициализация Расширений (события SQLAlchemy - общие для всех приложений процесса)
+@event.listens_for(Engine, "connect")
+def _configure_sqlite_connection(dbapi_connection, connection_record):
+    """WAL: читатели не блокируются писателем; synchronous=NORMAL достаточно надежен в WAL
+    и не делает fsync на каждый коммит; busy_timeout ставит писателей в очередь."""
+    if not isinstance(dbapi_connection, sqlite3.Connection): return
+    dbapi_connection.isolation_level = None # BEGIN выдаем сами в _begin_sqlite_transaction
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={current_app.config['SQLITE_BUSY_TIMEOUT_MS']}")
+    cursor.execute(f"PRAGMA cache_size=-{current_app.config['SQLITE_CACHE_SIZE_KB']}")
+    cursor.execute(f"PRAGMA mmap_size={current_app.config['SQLITE_MMAP_SIZE']}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
+_write_transaction = contextvars.ContextVar('write_transaction', default=None) # None - решает метод запроса
+
+@contextmanager
+def write_transaction(enabled=True):
+    """Транзакции, начатые внутри блока, - BEGIN IMMEDIATE и вне запроса: фоновые задачи и
+    команды CLI, которые сначала читают, а потом пишут. Работает и как декоратор.
+
+    write_transaction(False) на обработчике - обычный BEGIN для изменяющего запроса, который
+    читает до записи без транзакции записи (вход, регистрация): он не встает в очередь за писателями."""
+    token = _write_transaction.set(enabled)
+    try: yield
+    finally: _write_transaction.reset(token)
+
+@event.listens_for(Engine, "begin")
+def _begin_sqlite_transaction(conn):
+    """Изменяющие запросы (кроме помеченных write_transaction(False)) и блоки write_transaction()
+    сразу берут RESERVED-лок (BEGIN IMMEDIATE).
+
+    Иначе транзакция, начавшаяся с чтения, при попытке записи после чужого
+    коммита получает SQLITE_BUSY сразу, минуя busy_timeout ("database is locked").
+    """
+    if conn.dialect.name != 'sqlite': return
+    is_write = _write_transaction.get()
+    if is_write is None: is_write = has_request_context() and request.method not in ('GET', 'HEAD', 'OPTIONS')
+    conn.exec_driver_sql("BEGIN IMMEDIATE" if is_write else "BEGIN")
+
+
+# 4.1 JSON-ответы
+class RawJSON:
+    """Готовый JSON-текст (например, JSON-колонка из БД): FastJSONProvider вставляет его в ответ как есть."""
+    __slots__ = ('text',)
+    def __init__(self, text): self.text = text
+
+EMPTY_JSON_OBJECT = RawJSON('{}')
+_RAW_JSON_MARK = "\x00raw-json\x00" # Заглушка, которую C-энкодер json выводит вместо RawJSON
+_RAW_JSON_MARK_ENCODED = json.dumps(_RAW_JSON_MARK) # В выводе это "\u0000raw-json\u0000" при любом ensure_ascii
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Вывод тот же, что у DefaultJSONProvider (C-энкодер json, ASCII, сортировка ключей), плюс RawJSON.
+
+    Энкодер не умеет вставлять готовый текст, поэтому RawJSON кодируется заглушкой, а потом
+    заглушки заменяются фрагментами одним проходом по строке.
+    """
+    def dumps(self, obj, **kwargs):
+        kwargs.setdefault("ensure_ascii", self.ensure_ascii)
+        kwargs.setdefault("sort_keys", self.sort_keys)
+        if kwargs.get("indent") is not None: # debug-режим: фрагменты тоже должны быть с отступами
+            return json.dumps(obj, default=self._decode_raw_json, **kwargs)
+        fragments = []
+        def default(o):
+            if isinstance(o, RawJSON): fragments.append(o.text); return _RAW_JSON_MARK
+            return self.default(o)
+        text = json.dumps(obj, default=default, **kwargs)
+        if not fragments: return text
+        parts = text.split(_RAW_JSON_MARK_ENCODED)
+        if len(parts) != len(fragments) + 1: # Та же строка пришла в данных - честно разбираем фрагменты
+            return json.dumps(obj, default=self._decode_raw_json, **kwargs)
+        chunks = [parts[0]]
+        for fragment, part in zip(fragments, parts[1:]): chunks += (fragment, part)
+        return "".join(chunks)
+
+    def _decode_raw_json(self, o):
+        return json.loads(o.text) if isinstance(o, RawJSON) else self.default(o)
+
+
+# 4.2 Метрики запросов
+# На запрос в g копятся число SQL-запросов и время в БД (события движка) и время
+# сериализации JSON (TimedJSONProvider); в after_request это уходит в Server-Timing и
+# в счетчики процесса. Счетчики каждого воркера периодически пишутся в METRICS_DIR/<pid>.json,
+# /metrics складывает все файлы - так сумма верна при любом числе воркеров gunicorn
+# (файлы завершившихся воркеров остаются: счетчики не должны уменьшаться).
+METRIC_BUCKETS = {
+    "http_request_duration_seconds": (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    "http_request_sql_statements": (1, 2, 3, 5, 8, 13, 21, 34, 55, 100),
+    "db_pool_checkout_seconds": (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5),
+    "sqlite_lock_wait_seconds": (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5),
+    "worker_boot_seconds": (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+}
+METRIC_HELP = {
+    "http_requests_total": ("counter", "Запросы по маршруту, методу и статусу"),
+    "http_request_duration_seconds": ("histogram", "Время обработки запроса"),
+    "http_request_sql_statements": ("histogram", "SQL-запросов на HTTP-запрос"),
+    "db_pool_checkout_seconds": ("histogram", "Ожидание соединения из пула"),
+    "sqlite_lock_wait_seconds": ("histogram", "Ожидание лока записи SQLite (BEGIN IMMEDIATE, busy_timeout)"),
+    "sqlite_busy_errors_total": ("counter", "Ошибки database is locked/busy после busy_timeout"),
+    "db_slow_queries_total": ("counter", "SQL-запросы дольше SLOW_QUERY_MS"),
+    "http_compressed_bytes_total": ("counter", "Байты сжатых ответов до (stage=raw) и после (stage=sent) сжатия"),
+    "rate_limited_total": ("counter", "Запросы, отклоненные ограничителем частоты (429), по политике"),
+    "rate_limit_errors_total": ("counter", "Ошибки хранилища ограничителя (запрос пропущен)"),
+    "worker_boot_seconds": ("histogram", "Холодный старт воркера gunicorn: от fork до готовности принимать запросы"),
+}
+_metrics = {} # pid -> {pid, lock, counters, histograms, flusher}; см. _metrics_state
+
+def _metrics_state():
+    """Счетчики процесса. Ключ - pid: после fork (preload) унаследованные от мастера не в счет."""
+    pid = os.getpid()
+    state = _metrics.get(pid)
+    if state: return state
+    return _metrics.setdefault(pid, {'pid': pid, 'lock': threading.Lock(), 'counters': {}, 'histograms': {}, 'changes': 0,
+                                     'flusher': None, 'app': current_app._get_current_object()}) # app - для сброса вне запроса
+
+def _flush_metrics_periodically(state):
+    flushed_changes = 0
+    with state['app'].app_context():
+        while True:
+            time.sleep(current_app.config["METRICS_FLUSH_SECONDS"])
+            if state['changes'] != flushed_changes: flushed_changes = state['changes']; flush_metrics() # Простой не пишем
+
+def start_metrics_flusher():
+    """Фоновый сброс счетчиков воркера - чтобы /metrics на другом воркере видел их, даже если этот простаивает."""
+    state = _metrics_state()
+    if state['flusher']: return
+    with state['lock']:
+        if state['flusher']: return
+        state['flusher'] = threading.Thread(target=_flush_metrics_periodically, args=(state,), name='metrics-flusher', daemon=True)
+    state['flusher'].start()
+
+@lru_cache(maxsize=4096)
+def _metric_key(name, labels):
+    """Ключ счетчика "имя|метки"; labels - кортеж пар. Кешируется: набор маршрутов конечен."""
+    escape = lambda value: str(value).replace('\\', '\\\\').replace('"', '\\"')
+    return name + "|" + ",".join(f'{k}="{escape(v)}"' for k, v in labels)
+
+def inc_metric(name, value=1, **labels):
+    if not current_app.config["METRICS_ENABLED"]: return
+    state = _metrics_state()
+    key = _metric_key(name, tuple(labels.items()))
+    with state['lock']:
+        state['counters'][key] = state['counters'].get(key, 0) + value
+        state['changes'] += 1
+
+def observe_metric(name, value, **labels):
+    """Гистограмма: [счетчики корзин..., +Inf, сумма]."""
+    if not current_app.config["METRICS_ENABLED"]: return
+    state, buckets = _metrics_state(), METRIC_BUCKETS[name]
+    key = _metric_key(name, tuple(labels.items()))
+    index = next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))
+    with state['lock']:
+        histogram = state['histograms'].get(key) or state['histograms'].setdefault(key, [0] * (len(buckets) + 2))
+        histogram[index] += 1
+        histogram[-1] += value
+        state['changes'] += 1
+
+def flush_metrics():
+    """Пишет счетчики процесса в METRICS_DIR/<pid>.json (атомарно через rename)."""
+    state = _metrics_state()
+    with state['lock']:
+        snapshot = {'counters': dict(state['counters']), 'histograms': {k: list(v) for k, v in state['histograms'].items()}}
+    try:
+        os.makedirs(current_app.config["METRICS_DIR"], exist_ok=True)
+        path = os.path.join(current_app.config["METRICS_DIR"], f"{state['pid']}.json")
+        with open(path + ".tmp", "w") as f: json.dump(snapshot, f)
+        os.replace(path + ".tmp", path)
+    except OSError as e: print(f"Metrics flush failed: {e}")
+
+def reset_metrics_dir():
+    """Чистит METRICS_DIR при старте сервера (gunicorn on_starting / dev-сервер)."""
+    directory = current_app.config["METRICS_DIR"]
+    if not os.path.isdir(directory): return
+    for name in os.listdir(directory):
+        if name.endswith(".json") or name.endswith(".tmp"): os.remove(os.path.join(directory, name))
+
+def render_metrics():
+    """Сумма по файлам всех воркеров в текстовом формате Prometheus."""
+    flush_metrics()
+    counters, histograms = {}, {}
+    directory = current_app.config["METRICS_DIR"]
+    for name in (os.listdir(directory) if os.path.isdir(directory) else []):
+        if not name.endswith(".json"): continue
+        try:
+            with open(os.path.join(directory, name)) as f: snapshot = json.load(f)
+        except (OSError, ValueError): continue # Файл удалили/перезаписали между listdir и open
+        for key, value in snapshot['counters'].items(): counters[key] = counters.get(key, 0) + value
+        for key, values in snapshot['histograms'].items():
+            total = histograms.setdefault(key, [0] * len(values))
+            for i, value in enumerate(values): total[i] += value
+
+    lines, described = [], set()
+    def describe(name):
+        if name in described: return
+        described.add(name)
+        kind, text = METRIC_HELP[name]
+        lines.extend([f"# HELP {name} {text}", f"# TYPE {name} {kind}"])
+    for key in sorted(counters):
+        name, labels = key.split("|", 1)
+        describe(name)
+        lines.append(f"{name}{{{labels}}} {counters[key]}" if labels else f"{name} {counters[key]}")
+    for key in sorted(histograms):
+        name, labels = key.split("|", 1)
+        describe(name)
+        values, cumulative, prefix = histograms[key], 0, labels + "," if labels else ""
+        for bound, count in zip(METRIC_BUCKETS[name] + ("+Inf",), values[:-1]):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {round(values[-1], 6)}")
+        lines.append(f"{name}_count{suffix} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+def _current_route():
+    return request.url_rule.rule if request.url_rule else "unmatched"
+
+
+class TimedJSONProvider(FastJSONProvider):
+    """JSON-провайдер Flask, который копит время сериализации запроса (serialize в Server-Timing)."""
+    def dumps(self, obj, **kwargs):
+        started = time.perf_counter()
+        try: return super().dumps(obj, **kwargs)
+        finally:
+            if has_request_context(): g._serialize_time = g.get('_serialize_time', 0) + time.perf_counter() - started
+
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    in_request = has_request_context()
+    if in_request:
+        g._sql_count = g.get('_sql_count', 0) + 1
+        g._db_time = g.get('_db_time', 0) + elapsed
+    if statement == "BEGIN IMMEDIATE": observe_metric("sqlite_lock_wait_seconds", elapsed) # Ждали лок писателя
+    if elapsed * 1000 >= current_app.config["SLOW_QUERY_MS"]:
+        route = _current_route() if in_request else "background"
+        inc_metric("db_slow_queries_total", route=route)
+        print(f"SLOW QUERY {elapsed * 1000:.1f} ms [{route}]: {' '.join(statement.split())[:500]}")
+
+@event.listens_for(Engine, "handle_error")
+def _count_sqlite_busy(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get('query_started'): conn.info['query_started'].pop() # after_cursor_execute не будет
+    message = str(exception_context.original_exception)
+    if "database is locked" in message or "database is busy" in message: inc_metric("sqlite_busy_errors_total")
+
+@api.before_app_request
+def _start_request_timer():
+    g._request_started = time.perf_counter()
+
+@api.after_app_request
+def _record_request_metrics(response):
+    if not current_app.config["METRICS_ENABLED"] or '_request_started' not in g: return response
+    total = time.perf_counter() - g._request_started
+    sql_count, db_time, serialize_time = g.get('_sql_count', 0), g.get('_db_time', 0), g.get('_serialize_time', 0)
+    compress = f", compress;dur={g._compress_time * 1000:.2f}" if '_compress_time' in g else ""
+    response.headers["Server-Timing"] = (f'db;desc="{sql_count} queries";dur={db_time * 1000:.2f}, '
+                                         f'serialize;dur={serialize_time * 1000:.2f}{compress}, total;dur={total * 1000:.2f}')
+    route = _current_route()
+    inc_metric("http_requests_total", route=route, method=request.method, status=response.status_code)
+    observe_metric("http_request_duration_seconds", total, route=route)
+    observe_metric("http_request_sql_statements", sql_count, route=route)
+    start_metrics_flusher() # Первый запрос воркера (не мастер gunicorn до fork)
+    return response
+
+@atexit.register
+def _flush_metrics_on_exit():
+    state = _metrics.get(os.getpid())
+    if state:
+        with state['app'].app_context(): flush_metrics()
+
+@api.route("/metrics", methods=["GET"])
+def metrics():
+    """Счетчики всех воркеров в формате Prometheus (данные других воркеров - с задержкой до METRICS_FLUSH_SECONDS)."""
+    token = current_app.config["METRICS_TOKEN"]
+    if token and request.headers.get("Authorization") != f"Bearer {token}": return jsonify({"error": "Forbidden"}), 403
+    if not current_app.config["METRICS_ENABLED"]: return jsonify({"error": "Метрики выключены"}), 404
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+
+# 4.3 Сжатие ответов (gzip/brotli по Accept-Encoding)
+# Обычный ответ сжимается целиком в after_request, потоковый (выгрузки) - по кускам, по мере
+# генерации. Закешированные ленты (cached_public_feed) хранят сжатые варианты рядом с телом:
+# каждый вариант сжимается один раз на версию ленты. nginx для /api сжатие не включает.
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/x-ndjson', 'text/csv', 'text/plain')
+
+def negotiate_encoding():
+    """'br' | 'gzip' | None по Accept-Encoding (с учетом q=); br - только если установлен brotli."""
+    if not current_app.config["COMPRESS_ENABLED"]: return None
+    return request.accept_encodings.best_match(['br', 'gzip'] if brotli else ['gzip'])
+
+def gevent_hub_threadpool():
+    """Нативный threadpool хаба в gevent-воркере (threading пропатчен), иначе None.
+    gevent не импортируем: пропатченный воркер уже загрузил gevent.monkey."""
+    monkey = sys.modules.get('gevent.monkey')
+    if not monkey or not monkey.is_module_patched('threading'): return None
+    from gevent import get_hub
+    return get_hub().threadpool
+
+def _compress(body, encoding):
+    if encoding == 'br': return brotli.compress(body, quality=current_app.config["COMPRESS_BROTLI_QUALITY"])
+    return gzip.compress(body, compresslevel=current_app.config["COMPRESS_GZIP_LEVEL"], mtime=0) # mtime=0: одинаковый результат
+
+def compress_body(body, encoding):
+    """Сжатое тело. Большое в gevent-воркере сжимается вне хаба (zlib и brotli отпускают GIL);
+    в gthread-воркере запрос и так в своем потоке."""
+    hub_pool = gevent_hub_threadpool() if len(body) >= current_app.config["COMPRESS_OFFLOAD_BYTES"] else None
+    if hub_pool: return hub_pool.spawn(_compress, body, encoding).get()
+    return _compress(body, encoding)
+
+def compress_chunks(chunks, encoding):
+    """Сжатие потока: память не зависит от длины ответа, куски отдаются по мере заполнения буфера."""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=current_app.config["COMPRESS_BROTLI_QUALITY"])
+        compress, finish = compressor.process, compressor.finish
+    else:
+        compressor = zlib.compressobj(current_app.config["COMPRESS_GZIP_LEVEL"], zlib.DEFLATED, 16 + zlib.MAX_WBITS) # gzip-обертка
+        compress, finish = compressor.compress, compressor.flush
+    for chunk in chunks:
+        data = compress(chunk)
+        if data: yield data
+    yield finish()
+
+def mark_compressed(response, encoding, raw_size):
+    """Заголовки сжатого ответа; у сжатого варианта свой ETag (иначе кеши перепутают представления)."""
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag: response.set_etag(f"{etag}-{encoding}", weak)
+    if raw_size is not None:
+        inc_metric("http_compressed_bytes_total", raw_size, encoding=encoding, stage="raw")
+        inc_metric("http_compressed_bytes_total", response.content_length, encoding=encoding, stage="sent")
+
+@api.after_app_request
+def _compress_response(response):
+    if response.status_code not in (200, 304) or response.direct_passthrough or response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+    response.vary.add('Accept-Encoding')
+    if response.status_code != 200 or 'Content-Encoding' in response.headers: return response # 304 / вариант из кеша ленты
+    encoding = negotiate_encoding()
+    if not encoding: return response
+    started = time.perf_counter()
+    if response.is_streamed:
+        response.response = compress_chunks(response.iter_encoded(), encoding)
+        response.headers.pop('Content-Length', None)
+        mark_compressed(response, encoding, None)
+        return response
+    body = response.get_data()
+    if len(body) < current_app.config["COMPRESS_MIN_BYTES"]: return response
+    response.set_data(compress_body(body, encoding))
+    mark_compressed(response, encoding, len(body))
+    g._compress_time = time.perf_counter() - started
+    return response
 
 
 # 5. Определение Моделей Базы Данных (SQLAlchemy Models)
@@ -47,6 +530,8 @@ class User(db.Model):
     full_name = db.Column(db.String(120), nullable=True)
     telegram = db.Column(db.String(80), nullable=True, unique=True, index=True) # Уникальный TG
     resume_link = db.Column(db.String(255), nullable=True)
+    # Увеличивается при смене роли - токены со старой версией перестают действовать
+    token_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     # Связи
@@ -60,44 +545,73 @@ class User(db.Model):
         return f'<User {self.id}: {self.username} ({self.role})>'
 
 
-class Startup(db.Model):
+class SyncTracked:
+    """Номер последнего изменения строки и его время; ставят триггеры SQLite (см. раздел 16)."""
+    change_seq = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    updated_at = db.Column(db.DateTime, nullable=True)
+
+
+class Startup(SyncTracked, db.Model):
     __tablename__ = 'startups'
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), nullable=False)
     description = db.Column(db.Text, nullable=False)
     funds_raised = db.Column(db.JSON)
     opensea_link = db.Column(db.String(255), nullable=True)
-    status = db.Column(db.String(10), nullable=False, default='pending', index=True)
+    status = db.Column(db.String(10), nullable=False, default='pending')
     rejection_reason = db.Column(db.Text, nullable=True)
     creator_user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     current_stage = db.Column(db.String(20), nullable=False)
     stage_timeline = db.Column(db.JSON)
-    is_held = db.Column(db.Boolean, default=False, nullable=False, index=True)
+    is_held = db.Column(db.Boolean, default=False, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
     vacancies = db.relationship('Vacancy', backref='startup', lazy='dynamic', cascade="all, delete-orphan")
 
+    # Индексы под списки (см. visible_startups_branches). rowid (= id) в индексе SQLite неявно идет
+    # последним, поэтому при равенстве по всем колонкам строки уже упорядочены по id
+    __table_args__ = (db.Index('ix_startups_status_is_held', 'status', 'is_held'),
+                      db.Index('ix_startups_change_seq', 'change_seq'))
+
     def __repr__(self):
         return f'<Startup {self.id}: {self.name}>'
 
 
-class Meetup(db.Model):
+class StartupMilestone(db.Model):
+    """Плановая дата этапа - строка на каждую непустую дату stage_timeline. Ведут триггеры SQLite
+    (раздел 11.1), сам stage_timeline остается в startups - его отдают сериализаторы."""
+    __tablename__ = 'startup_milestones'
+    startup_id = db.Column(db.Integer, primary_key=True) # Без FK: строки удаляет триггер вместе со стартапом
+    stage = db.Column(db.String(20), primary_key=True)
+    planned_date = db.Column(db.Date, nullable=False) # Текст YYYY-MM-DD, как date() в SQLite
+
+    # Фильтры /startups по этапу и датам - диапазон по индексу, startup_id берется из него же
+    __table_args__ = (db.Index('ix_startup_milestones_stage_planned_date', 'stage', 'planned_date', 'startup_id'),
+                      db.Index('ix_startup_milestones_planned_date', 'planned_date', 'startup_id'))
+
+
+class Meetup(SyncTracked, db.Model):
     __tablename__ = 'meetups'
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(150), nullable=False)
     date = db.Column(db.DateTime, nullable=False, index=True) # Храним как DateTime UTC
     description = db.Column(db.Text, nullable=False)
     link = db.Column(db.String(255), nullable=False)
-    status = db.Column(db.String(10), nullable=False, default='pending', index=True)
+    status = db.Column(db.String(10), nullable=False, default='pending')
     rejection_reason = db.Column(db.Text, nullable=True)
-    creator_user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    creator_user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Список идет по (date, id) по убыванию - обе ветви видимости читают его готовым из индекса
+    __table_args__ = (db.Index('ix_meetups_status_date', 'status', 'date'),
+                      db.Index('ix_meetups_creator_user_id_date', 'creator_user_id', 'date'),
+                      db.Index('ix_meetups_change_seq', 'change_seq'))
+
     def __repr__(self):
         return f'<Meetup {self.id}: {self.title}>'
 
 
-class Vacancy(db.Model):
+class Vacancy(SyncTracked, db.Model):
     __tablename__ = 'vacancies'
     id = db.Column(db.Integer, primary_key=True)
     startup_id = db.Column(db.Integer, db.ForeignKey('startups.id'), nullable=False, index=True)
@@ -105,29 +619,154 @@ class Vacancy(db.Model):
     description = db.Column(db.Text, nullable=False)
     salary = db.Column(db.String(100), nullable=True)
     requirements = db.Column(db.Text, nullable=False)
-    applicants = db.Column(db.JSON)
+    # Число строк в vacancy_applications; меняется атомарным UPDATE в apply_for_vacancy
+    applicant_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     status = db.Column(db.String(10), nullable=False, default='pending', index=True)
     rejection_reason = db.Column(db.Text, nullable=True)
     creator_user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Копии из startups для публичной ленты без JOIN (см. 8.6, refresh_vacancy_visibility):
+    # publicly_visible = вакансия одобрена, а ее стартап одобрен и не на паузе
+    publicly_visible = db.Column(db.Boolean, nullable=False, default=False, server_default='0', index=True)
+    startup_name = db.Column(db.String(120), nullable=True)
+    startup_creator_id = db.Column(db.Integer, nullable=True)
+
+    applications = db.relationship('VacancyApplication', backref='vacancy', lazy='dynamic', cascade="all, delete-orphan")
+
+    __table_args__ = (db.Index('ix_vacancies_change_seq', 'change_seq'),)
 
     def __repr__(self):
         return f'<Vacancy {self.id}: {self.title}>'
 
 
-class Notification(db.Model):
+class VacancyApplication(db.Model):
+    __tablename__ = 'vacancy_applications'
+    id = db.Column(db.Integer, primary_key=True)
+    vacancy_id = db.Column(db.Integer, db.ForeignKey('vacancies.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    # Контакты на момент отклика (как раньше хранились в Vacancy.applicants)
+    telegram = db.Column(db.String(80), nullable=True)
+    resume_link = db.Column(db.String(255), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Один отклик на пару (вакансия, пользователь). Отклики вакансии идут по id - для этого
+    # отдельный индекс по vacancy_id (у уникального после vacancy_id идет user_id, а не rowid);
+    # (user_id, vacancy_id) покрывает get_applied_vacancy_ids без чтения таблицы
+    __table_args__ = (db.UniqueConstraint('vacancy_id', 'user_id', name='uq_vacancy_applications_vacancy_user'),
+                      db.Index('ix_vacancy_applications_vacancy_id', 'vacancy_id'),
+                      db.Index('ix_vacancy_applications_user_id_vacancy_id', 'user_id', 'vacancy_id'))
+
+    def __repr__(self):
+        return f'<VacancyApplication {self.id}: User {self.user_id} -> Vacancy {self.vacancy_id}>'
+
+
+class Notification(SyncTracked, db.Model):
     __tablename__ = 'notifications'
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     admin_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     message = db.Column(db.Text, nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
-    is_read = db.Column(db.Boolean, default=False, nullable=False, index=True)
+    is_read = db.Column(db.Boolean, default=False, nullable=False)
+
+    # Лента пользователя по (timestamp, id) и счетчик/отметка непрочитанных
+    __table_args__ = (db.Index('ix_notifications_user_id_timestamp', 'user_id', 'timestamp'),
+                      db.Index('ix_notifications_user_id_is_read', 'user_id', 'is_read'),
+                      db.Index('ix_notifications_user_id_change_seq', 'user_id', 'change_seq'))
 
     def __repr__(self):
         return f'<Notification {self.id} to User {self.user_id}>'
 
 
+class BroadcastJob(db.Model):
+    """Массовая рассылка уведомлений сегменту; прогресс пишется в той же транзакции, что и пачка уведомлений."""
+    __tablename__ = 'broadcast_jobs'
+    id = db.Column(db.Integer, primary_key=True)
+    admin_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    message = db.Column(db.Text, nullable=False)
+    segment = db.Column(db.JSON, nullable=False)
+    status = db.Column(db.String(10), nullable=False, default='pending') # pending | running | done | failed
+    total = db.Column(db.Integer, nullable=False, default=0)
+    sent = db.Column(db.Integer, nullable=False, default=0)
+    last_user_id = db.Column(db.Integer, nullable=False, default=0) # Получатели идут по возрастанию id
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True) # Пишется с каждой пачкой; старый - воркер задачи умер
+
+    def __repr__(self):
+        return f'<BroadcastJob {self.id}: {self.status} {self.sent}/{self.total}>'
+
+
+class FeedVersion(db.Model):
+    """Счетчик версии публичной ленты. Лежит в БД, а не в памяти процесса,
+    чтобы все воркеры, работающие с одним файлом SQLite, видели одни и те же версии."""
+    __tablename__ = 'feed_versions'
+    name = db.Column(db.String(20), primary_key=True) # 'startups' | 'vacancies' | 'meetups'
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<FeedVersion {self.name}={self.version}>'
+
+
+class SyncSequence(db.Model):
+    """Единственная строка (id=1) - последний выданный номер изменения для /sync и последний
+    номер удаленного по сроку надгробия (token меньше него /sync уже не обслуживает)."""
+    __tablename__ = 'sync_sequence'
+    id = db.Column(db.Integer, primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+    pruned_through = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+
+class SyncTombstone(db.Model):
+    """Удаленная строка для /sync; owner_id - получатель (для уведомлений), иначе NULL."""
+    __tablename__ = 'sync_tombstones'
+    seq = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(20), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    owner_id = db.Column(db.Integer, nullable=True)
+    deleted_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<SyncTombstone {self.seq}: {self.entity} {self.entity_id}>'
+
+
+class StartupStats(db.Model):
+    """Сводка стартапов по (status, current_stage, is_held): число, средства по валютам, вакансии
+    и отклики. Ведут триггеры SQLite (раздел 17) в той же транзакции, что меняет данные."""
+    __tablename__ = 'startup_stats'
+    status = db.Column(db.String(10), primary_key=True)
+    current_stage = db.Column(db.String(20), primary_key=True)
+    is_held = db.Column(db.Boolean, primary_key=True)
+    startups = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    funds_eth = db.Column(db.Float, nullable=False, default=0, server_default='0')
+    funds_btc = db.Column(db.Float, nullable=False, default=0, server_default='0')
+    funds_usdt = db.Column(db.Float, nullable=False, default=0, server_default='0')
+    vacancies = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    approved_vacancies = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    applications = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+
+class StartupActivity(db.Model):
+    """Вакансии и отклики одного стартапа (триггеры, раздел 17); строка есть у каждого стартапа."""
+    __tablename__ = 'startup_activity'
+    startup_id = db.Column(db.Integer, primary_key=True) # Без FK: строку удаляет триггер вместе со стартапом
+    vacancies = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    approved_vacancies = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    applications = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    # Топ по откликам читается из индекса по убыванию (startup_id = rowid идет в нем последним)
+    __table_args__ = (db.Index('ix_startup_activity_applications', 'applications'),)
+
+
+class MeetupDayStats(db.Model):
+    """Число митапов по (status, день UTC) - ближайшие считаются по дням, а не по строкам (раздел 17)."""
+    __tablename__ = 'meetup_day_stats'
+    status = db.Column(db.String(10), primary_key=True)
+    day = db.Column(db.String(10), primary_key=True) # YYYY-MM-DD
+    meetups = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+
 # 6. JWT Error Handlers
 @jwt.expired_token_loader
 def expired_token_callback(jwt_header, jwt_payload):
@@ -157,15 +796,17 @@ def revoked_token_callback(jwt_header, jwt_payload):
 
 # 7. Этапы и Хелперы
 ALLOWED_STAGES = ['idea', 'mvp', 'pmf', 'scaling', 'established']
+FUNDS_CURRENCIES = ('ETH', 'BTC', 'USDT') # Ключи funds_raised (и колонки funds_<валюта> в startup_stats)
 
 def get_stage_order(stage_key):
     try: return ALLOWED_STAGES.index(stage_key)
     except ValueError: return -1
 
+_url_re = re.compile(r'https?://[^\s/$.?#].[^\s]*', re.IGNORECASE) # При импорте: в мастере gunicorn до fork
+
 def is_valid_url(url):
     if not url or not isinstance(url, str): return False
-    pattern = re.compile(r'https?://[^\s/$.?#].[^\s]*', re.IGNORECASE)
-    return bool(pattern.match(url.strip()))
+    return bool(_url_re.match(url.strip()))
 
 def is_valid_iso_date(date_string):
     if date_string is None: return True
@@ -173,19 +814,125 @@ def is_valid_iso_date(date_string):
     try: date.fromisoformat(date_string); return True
     except ValueError: return False
 
+def normalize_iso_date(date_string):
+    """ISO-дата (любая форма, что принимает date.fromisoformat) -> YYYY-MM-DD; прочее - как есть."""
+    try: return date.fromisoformat(date_string).isoformat()
+    except (TypeError, ValueError): return date_string
+
+def startup_fields(data):
+    """Поля нового стартапа по правилам add_startup -> (поля, None) или (None, ошибка)."""
+    name, description = data.get("name"), data.get("description")
+    opensea_link, current_stage = data.get("opensea_link") or None, data.get("current_stage")
+    if not name or not description or not isinstance(name, str) or not isinstance(description, str):
+        return None, 'Name/Desc required'
+    if opensea_link and not is_valid_url(opensea_link): return None, 'OpenSea URL invalid'
+    if not current_stage or current_stage not in ALLOWED_STAGES: return None, 'Stage invalid'
+    current_stage_order = get_stage_order(current_stage)
+    return {"name": name.strip(), "description": description.strip(), "funds_raised": {},
+            "opensea_link": opensea_link.strip() if opensea_link else None, "current_stage": current_stage,
+            "stage_timeline": {stage: None for i, stage in enumerate(ALLOWED_STAGES) if i > current_stage_order},
+            "is_held": False}, None
+
+def meetup_fields(data):
+    """Поля нового митапа по правилам add_meetup; дата - ISO, хранится в UTC."""
+    title, date_str = data.get("title"), data.get("date")
+    description, link = data.get("description"), data.get("link")
+    if not all([title, date_str, description, link]) or not all(isinstance(v, str) for v in (title, date_str, description)):
+        return None, "Fields?"
+    try:
+        # Принимаем ISO строку, конвертируем в UTC для хранения
+        meetup_date = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
+        if meetup_date.tzinfo is None: meetup_date = meetup_date.replace(tzinfo=timezone.utc)
+        else: meetup_date = meetup_date.astimezone(timezone.utc)
+    except ValueError: return None, "Date format?"
+    if not is_valid_url(link): return None, "Link?"
+    return {"title": title.strip(), "date": meetup_date, "description": description.strip(), "link": link.strip()}, None
+
+def vacancy_fields(data):
+    """Поля новой вакансии по правилам add_vacancy (без проверок стартапа - они требуют БД)."""
+    startup_id, title = data.get("startup_id"), data.get("title")
+    description, salary, requirements = data.get("description"), data.get("salary"), data.get("requirements")
+    if not all([startup_id, title, description, requirements]) or not all(isinstance(v, str) for v in (title, description, requirements)):
+        return None, "Fields?"
+    try: startup_id = int(startup_id)
+    except (TypeError, ValueError): return None, "Startup ID?"
+    return {"startup_id": startup_id, "title": title.strip(), "description": description.strip(),
+            "salary": salary.strip() if isinstance(salary, str) and salary.strip() else None,
+            "requirements": requirements.strip()}, None
+
 def get_current_user() -> User | None:
-    """Получает объект User текущего пользователя из JWT, если он валиден."""
+    """Получает объект User текущего пользователя из JWT, если он валиден.
+
+    Результат запоминается в flask.g, поэтому повторные вызовы в рамках одного
+    запроса (декоратор + обработчик) не проверяют JWT и не ходят в БД заново.
+    """
+    if '_current_user' in g: return g._current_user
+    user = None
     try:
         verify_jwt_in_request(optional=True)
         identity_str = get_jwt_identity()
         if identity_str:
             user_id = int(identity_str)
             user = User.query.get(user_id) # Ищем по первичному ключу
-            return user
-        return None
+            # Токен выпущен до смены роли - считаем его недействительным
+            if user and get_jwt().get("tv", 0) != user.token_version: user = None
     except Exception as e:
         print(f"Error getting current user from JWT: {e}")
-        return None
+    g._current_user = user
+    return user
+
+TOKEN_VERSION_CACHE_MAX_ENTRIES = 10000
+_token_version_cache = {} # user_id -> (token_version, monotonic-время истечения); порядок вставки = порядок истечения
+_token_version_lock = threading.Lock()
+
+def get_token_version(user_id):
+    """token_version пользователя с кешем на JWT_TOKEN_VERSION_TTL секунд (None - пользователя нет).
+
+    Роль, смененная в другом воркере, и отзыв токенов действуют здесь не позже чем через TTL.
+    Истекшие записи выметаются с начала словаря при каждой вставке, сверх лимита - самые старые."""
+    now = time.monotonic()
+    cached = _token_version_cache.get(user_id)
+    if cached and cached[1] > now: return cached[0]
+    version = db.session.query(User.token_version).filter(User.id == user_id).scalar()
+    with _token_version_lock:
+        _token_version_cache.pop(user_id, None) # Обновленная запись - в конец
+        while _token_version_cache:
+            oldest = next(iter(_token_version_cache))
+            if len(_token_version_cache) < TOKEN_VERSION_CACHE_MAX_ENTRIES and _token_version_cache[oldest][1] > now: break
+            del _token_version_cache[oldest]
+        _token_version_cache[user_id] = (version, now + current_app.config["JWT_TOKEN_VERSION_TTL"])
+    return version
+
+def get_current_identity() -> tuple[int | None, str | None]:
+    """Возвращает (id, role) текущего пользователя или (None, None) для анонима.
+
+    При JWT_ROLE_CLAIMS=true берет их из claims токена (нужна только сверка
+    token_version через кеш), иначе - из get_current_user(). Токены без claim
+    role (выпущенные до включения режима) идут по обычному пути через БД.
+    """
+    if '_current_identity' in g: return g._current_identity
+    identity = None
+    if current_app.config["JWT_ROLE_CLAIMS"]:
+        try:
+            verify_jwt_in_request(optional=True)
+            claims = get_jwt()
+            if claims.get("sub") and "role" in claims:
+                user_id = int(claims["sub"])
+                valid = claims.get("tv", 0) == get_token_version(user_id)
+                identity = (user_id, claims["role"]) if valid else (None, None)
+        except Exception as e:
+            print(f"Error reading identity claims from JWT: {e}")
+    if identity is None:
+        user = get_current_user()
+        identity = (user.id, user.role) if user else (None, None)
+    g._current_identity = identity
+    return identity
+
+def set_user_role(user: User, role: str):
+    """Меняет роль и отзывает ранее выданные токены пользователя (commit - на вызывающем)."""
+    user.role = role
+    user.token_version = (user.token_version or 0) + 1
+    with _token_version_lock: _token_version_cache.pop(user.id, None) # Этот воркер видит смену сразу, остальные - через TTL
 
 
 # 8. Admin Required Decorator
@@ -195,8 +942,8 @@ def admin_required():
         @wraps(fn)
         @jwt_required()
         def decorator(*args, **kwargs):
-            current_user = get_current_user()
-            if current_user and current_user.role == 'admin':
+            _, current_role = get_current_identity()
+            if current_role == 'admin':
                 return fn(*args, **kwargs)
             else:
                 return jsonify(error="Требуются права администратора"), 403
@@ -204,10 +951,494 @@ def admin_required():
     return wrapper
 
 
+# 8.1 Курсорная (keyset) пагинация списков
+DEFAULT_PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 200 # Верхняя граница ?limit=
+LEGACY_LIST_LIMIT = 1000 # Потолок старого ответа-массива (без ?limit= и ?cursor=); дальше - страницами
+
+def encode_cursor(values):
+    """Кодирует значения ключей сортировки последней строки в непрозрачную строку."""
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_raw_cursor(cursor, size):
+    """Список значений из курсора (без приведения типов); при любом мусоре бросает ValueError."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except Exception as e: raise ValueError(f"bad cursor: {e}")
+    if not isinstance(values, list) or len(values) != size: raise ValueError("bad cursor shape")
+    return values
+
+def decode_cursor(cursor, order_columns):
+    """Обратное к encode_cursor: значения приводятся к типам колонок сортировки."""
+    values = decode_raw_cursor(cursor, len(order_columns))
+    try:
+        return [datetime.fromisoformat(v) if col.type.python_type is datetime else col.type.python_type(v)
+                for col, v in zip(order_columns, values)]
+    except (TypeError, ValueError) as e: raise ValueError(f"bad cursor value: {e}")
+
+def keyset_condition(order_columns, values):
+    """(c1, c2, ...) < (v1, v2, ...) для сортировки по убыванию, развернуто в OR/AND.
+
+    Отдельное c1 <= v1 впереди дает SQLite границу диапазона по индексу: без нее
+    OR-условие проверяется построчно от начала индекса, и страница дорожает с глубиной.
+    """
+    conditions = []
+    for i, (col, value) in enumerate(zip(order_columns, values)):
+        equal_prefix = [c == v for c, v in zip(order_columns[:i], values[:i])]
+        conditions.append(and_(*equal_prefix, col < value))
+    if len(order_columns) == 1: return conditions[0]
+    return and_(order_columns[0] <= values[0], or_(*conditions))
+
+def keyset_list_response(query, order_columns, serializer, legacy_array=True, field_columns=None):
+    """Отдает список по убыванию order_columns.
+
+    Без ?limit= и ?cursor= - как раньше, JSON-массив (если legacy_array), но не длиннее
+    LEGACY_LIST_LIMIT, с заголовком Deprecation и, если строк больше, Link rel="next" на
+    следующую страницу. Иначе - страница {"items": [...], "next_cursor": ...}; следующая
+    страница строится от ключа последней строки (WHERE ... < курсор), без OFFSET, поэтому
+    ее цена не зависит от глубины.
+
+    query может быть списком запросов-ветвей с непересекающимися строками (см.
+    visible_startups_branches): они склеиваются UNION ALL, и SQLite сливает ветви,
+    уже упорядоченные своими индексами, без сортировки - в отличие от OR в одном WHERE.
+
+    С field_columns (см. list_field_columns) список понимает ?fields= и ?view=summary (раздел 8.7).
+    """
+    branches = list(query) if isinstance(query, (list, tuple)) else [query]
+    if field_columns:
+        try: branches, serializer = project_list(branches, field_columns, order_columns, serializer)
+        except ValueError as e: return jsonify(error=f"Неизвестные поля: {e}"), 400
+    def fetch(branches, limit):
+        if len(branches) == 1:
+            return branches[0].order_by(*[desc(col) for col in order_columns]).limit(limit).all()
+        # ORDER BY составного SELECT в SQLite - по номеру колонки результата
+        statement = union_all(*[branch.statement for branch in branches])
+        keys = list(statement.selected_columns.keys())
+        statement = statement.order_by(*[desc(literal_column(str(keys.index(col.key) + 1))) for col in order_columns])
+        return db.session.execute(statement.limit(limit)).all()
+
+    legacy = legacy_array and 'limit' not in request.args and 'cursor' not in request.args
+    if legacy: limit = LEGACY_LIST_LIMIT
+    else: limit = max(1, min(request.args.get('limit', DEFAULT_PAGE_LIMIT, type=int), MAX_PAGE_LIMIT))
+    cursor = request.args.get('cursor')
+    if cursor:
+        try: values = decode_cursor(cursor, order_columns)
+        except ValueError: return jsonify(error="Некорректный курсор"), 400
+        branches = [branch.filter(keyset_condition(order_columns, values)) for branch in branches]
+
+    rows = fetch(branches, limit + 1) # +1 строка, чтобы понять, есть ли продолжение
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = [getattr(rows[-1], col.key) for col in order_columns]
+        # Дата, прочитанная строкой (raw_datetime_column), в курсоре - как у DateTime-колонки
+        next_cursor = encode_cursor([datetime.fromisoformat(v) if isinstance(v, str) and col.type.python_type is datetime else v
+                                     for col, v in zip(order_columns, last)])
+    if not legacy: return jsonify(items=[serializer(row) for row in rows], next_cursor=next_cursor)
+
+    response = jsonify([serializer(row) for row in rows])
+    response.headers['Deprecation'] = 'true' # Массив без ?limit= оставлен для старого фронтенда
+    if next_cursor:
+        args = [(k, v) for k, v in request.args.items(multi=True)] + [('limit', MAX_PAGE_LIMIT), ('cursor', next_cursor)]
+        response.headers['Link'] = f'<{request.path}?{urlencode(args)}>; rel="next"'
+    return response
+
+
+# 8.2 Кеш анонимных публичных лент (версии в БД + ETag/304)
+FEED_CACHE_MAX_ENTRIES = 256
+_feed_cache = {} # (лента, query string) -> (версия, тело, etag, сжатые варианты, заголовки)
+FEED_CACHE_HEADERS = ('Deprecation', 'Link') # Заголовки ответа ленты, которые кешируются вместе с телом
+
+def bump_feed_versions(*feeds):
+    """Увеличивает версии лент в текущей транзакции (commit - на вызывающем).
+
+    Вызывается каждым эндпоинтом, который меняет то, что видно в ленте,
+    поэтому версия и данные фиксируются (или откатываются) вместе.
+    """
+    for feed in feeds:
+        db.session.execute(sqlite_insert(FeedVersion).values(name=feed, version=1)
+                           .on_conflict_do_update(index_elements=[FeedVersion.name],
+                                                  set_={"version": FeedVersion.version + 1}))
+
+def get_feed_version(feed):
+    return db.session.query(FeedVersion.version).filter(FeedVersion.name == feed).scalar() or 0
+
+def cached_public_feed(feed):
+    """Кеширует готовое JSON-тело ленты для анонимных запросов.
+
+    Запрос с заголовком Authorization идет мимо кеша. Для анонима читается
+    версия ленты (один SELECT по первичному ключу); если тело для этой версии
+    уже собрано - отдается без запросов к таблицам и без сериализации.
+    Ответ несет сильный ETag, If-None-Match с тем же значением дает 304.
+    Сжатые варианты тела (gzip/br, раздел 4.3) кешируются рядом с ним.
+    """
+    def wrapper(fn):
+        @wraps(fn)
+        def decorator(*args, **kwargs):
+            if request.headers.get('Authorization'): return fn(*args, **kwargs)
+            # Версию читаем ДО сборки тела: тело может оказаться только новее версии, но не старее
+            version = get_feed_version(feed)
+            key = (feed, request.query_string)
+            cached = _feed_cache.get(key)
+            if not cached or cached[0] != version:
+                response = make_response(fn(*args, **kwargs))
+                if response.status_code != 200: return response
+                body = response.get_data()
+                headers = {name: response.headers[name] for name in FEED_CACHE_HEADERS if name in response.headers}
+                cached = (version, body, f"{feed}-{version}-{hashlib.sha1(body).hexdigest()[:16]}", {}, headers)
+                if key not in _feed_cache and len(_feed_cache) >= FEED_CACHE_MAX_ENTRIES:
+                    _feed_cache.pop(next(iter(_feed_cache)), None) # Выкидываем самую старую запись
+                _feed_cache[key] = cached
+            body = cached[1]
+            encoding = negotiate_encoding() if len(body) >= current_app.config["COMPRESS_MIN_BYTES"] else None
+            if encoding:
+                variants = cached[3]
+                if encoding not in variants: # Сжимаем один раз на версию ленты
+                    started = time.perf_counter()
+                    variants[encoding] = compress_body(body, encoding)
+                    g._compress_time = time.perf_counter() - started
+                body = variants[encoding]
+            response = current_app.response_class(body, mimetype='application/json')
+            response.set_etag(cached[2])
+            response.headers.update(cached[4])
+            if encoding: mark_compressed(response, encoding, len(cached[1]))
+            response.headers['Cache-Control'] = 'no-cache' # Браузер хранит, но каждый раз сверяет ETag
+            return response.make_conditional(request)
+        return decorator
+    return wrapper
+
+
+# 8.3 Пакетная модерация (одним UPDATE в одной транзакции)
+BATCH_MODERATION_MAX_IDS = 500
+BATCH_MODERATION_ACTIONS = {Startup: ('approve', 'reject', 'toggle_hold'), Meetup: ('approve', 'reject'),
+                            Vacancy: ('approve', 'reject')}
+BATCH_MODERATION_FEEDS = {Startup: ('startups', 'vacancies'), Meetup: ('meetups',), Vacancy: ('vacancies',)}
+
+def vacancy_startup_available_condition():
+    """Вакансию можно одобрить, только если ее стартап одобрен и не на паузе (коррелированный EXISTS)."""
+    return exists().where(Startup.id == Vacancy.startup_id, Startup.status == 'approved', Startup.is_held == False)
+
+def batch_moderation_response(model, action):
+    """Тело: {"ids": [...], "reason": "..."} или {"items": [{"id": ..., "reason": ...}, ...]}.
+
+    Правила одиночных эндпоинтов ("только pending", для вакансий - "стартап одобрен
+    и не на паузе") стоят в WHERE самого UPDATE. Ответ - результат по каждому id.
+    """
+    if action not in BATCH_MODERATION_ACTIONS[model]: return jsonify({"error": f"Action {action}?"}), 404
+    data = request.json or {}
+    if not isinstance(data, dict): return jsonify({"error": "Тело: {ids: [...]} или {items: [...]}"}), 400
+    shared_reason = data.get("reason")
+    if "items" in data:
+        items = data["items"]
+        if not isinstance(items, list) or not all(isinstance(i, dict) for i in items): return jsonify({"error": "items?"}), 400
+        ids, item_reasons = [i.get("id") for i in items], [i.get("reason", shared_reason) for i in items]
+    else:
+        ids = data.get("ids")
+        item_reasons = [shared_reason] * len(ids) if isinstance(ids, list) else []
+    if not isinstance(ids, list) or not ids or len(ids) > BATCH_MODERATION_MAX_IDS \
+            or not all(type(i) is int for i in ids) or len(set(ids)) != len(ids): # bool - тоже int, но не id
+        return jsonify({"error": f"ids: до {BATCH_MODERATION_MAX_IDS} разных чисел"}), 400
+    reasons = dict(zip(ids, item_reasons))
+
+    conditions = [model.id.in_(ids)]
+    if action == 'toggle_hold':
+        values = {model.is_held: ~model.is_held}
+    else:
+        conditions.append(model.status == 'pending')
+        if action == 'approve':
+            values = {model.status: 'approved', model.rejection_reason: None}
+            if model is Vacancy: conditions.append(vacancy_startup_available_condition())
+        else:
+            if not all(isinstance(r, str) and r.strip() for r in reasons.values()): return jsonify({"error": "Reason?"}), 400
+            values = {model.status: 'rejected',
+                      model.rejection_reason: case({i: r.strip() for i, r in reasons.items()}, value=model.id)}
+
+    returning = [model.id, model.status] + ([model.is_held] if model is Startup else [])
+    stmt = update(model).where(*conditions).values(values).returning(*returning)\
+                        .execution_options(synchronize_session=False)
+    try:
+        updated = {row.id: row for row in db.session.execute(stmt)}
+        if updated and model is Startup: refresh_vacancy_visibility(Vacancy.startup_id.in_(list(updated)))
+        if updated and model is Vacancy: refresh_vacancy_visibility(Vacancy.id.in_(list(updated)))
+        if updated: bump_feed_versions(*BATCH_MODERATION_FEEDS[model])
+        db.session.commit()
+    except Exception as e: db.session.rollback(); print(f"Error: {e}"); return jsonify({"error": "Ошибка БД"}), 500
+
+    # Почему не прошли остальные - один SELECT по ним
+    failed_ids = [i for i in ids if i not in updated]
+    existing = {row.id: row for row in db.session.query(model.id, model.status).filter(model.id.in_(failed_ids))} \
+               if failed_ids else {}
+    results = []
+    for i in ids:
+        if i in updated:
+            row = updated[i]
+            result = {"id": i, "ok": True, "status": row.status}
+            if model is Startup: result["is_held"] = row.is_held
+        elif i not in existing: result = {"id": i, "ok": False, "error": "Not found"}
+        elif existing[i].status != 'pending': result = {"id": i, "ok": False, "error": "Only pending"}
+        else: result = {"id": i, "ok": False, "error": "Startup not available"}
+        results.append(result)
+    print(f"Batch {action} on {model.__tablename__}: {len(updated)}/{len(ids)} updated")
+    return jsonify(updated=len(updated), results=results)
+
+
+# 8.4 Хеширование паролей в ограниченном пуле
+_password_pool = {} # 'state' -> {slots, submit}; см. _password_pool_state
+
+class PasswordPoolBusy(Exception):
+    """Все слоты пула хеширования заняты - отвечаем 503, а не копим очередь."""
+
+def _password_pool_state():
+    """Пул создается лениво (после fork и monkey-patch). В gevent-воркере хеш считается
+    в нативном threadpool хаба: обычный поток там стал бы гринлетом и блокировал бы hub."""
+    state = _password_pool.get('state')
+    if state: return state
+    workers = current_app.config["PASSWORD_HASH_WORKERS"]
+    hub_pool = gevent_hub_threadpool()
+    if hub_pool:
+        hub_pool.maxsize = max(hub_pool.maxsize, workers)
+        submit = lambda fn, *args: hub_pool.spawn(fn, *args).get()
+    else:
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        submit = lambda fn, *args: executor.submit(fn, *args).result()
+    candidate = {'slots': threading.BoundedSemaphore(workers + current_app.config["PASSWORD_HASH_QUEUE"]), 'submit': submit}
+    return _password_pool.setdefault('state', candidate)
+
+def run_password_job(fn, *args):
+    """Выполняет fn в пуле и ждет результат; PasswordPoolBusy, если пул и очередь заполнены."""
+    state = _password_pool_state()
+    if not state['slots'].acquire(blocking=False): raise PasswordPoolBusy()
+    try: return state['submit'](fn, *args)
+    finally: state['slots'].release()
+
+def hash_password(password):
+    return run_password_job(generate_password_hash, password, current_app.config["PASSWORD_HASH_METHOD"])
+
+def password_needs_rehash(password_hash):
+    """Хеш посчитан другим методом/числом итераций, чем PASSWORD_HASH_METHOD."""
+    method = current_app.config["PASSWORD_HASH_METHOD"]
+    if method.startswith('pbkdf2:') and method.count(':') == 1: method += f":{DEFAULT_PBKDF2_ITERATIONS}" # Так его запишет werkzeug
+    return password_hash.split('$', 1)[0] != method
+
+def password_pool_busy_response():
+    response = jsonify({"error": "Сервер перегружен, повторите попытку"})
+    response.status_code = 503
+    response.headers["Retry-After"] = "1"
+    return response
+
+
+# 8.5 Чтение списков без ORM
+# Списки выбирают только нужные колонки (строки Core, без объектов ORM и identity map),
+# JSON-колонки - текстом из БД (в канонической форме, см. canonical_json_dumps), время -
+# строкой SQLite "YYYY-MM-DD HH:MM:SS.ffffff", которую достаточно переставить в ISO.
+def raw_json_column(column):
+    """JSON-колонка без json.loads на чтении."""
+    return type_coerce(column, db.Text).label(column.key)
+
+def raw_json_value(text):
+    """Как `value or {}` у ORM-сериализаторов; NULL JSON-колонка хранится как 'null'."""
+    return RawJSON(text) if text and text != 'null' else EMPTY_JSON_OBJECT
+
+def raw_datetime_column(column):
+    return type_coerce(column, db.String).label(column.key)
+
+def format_utc_timestamp(text):
+    """'2024-01-01 18:00:00.000000' -> '2024-01-01T18:00:00Z' - то же, что isoformat(timespec='seconds') + 'Z'."""
+    return f"{text[:10]}T{text[11:19]}Z"
+
+
+# 8.6 Денормализованная видимость вакансий
+# Публичная лента вакансий читает только vacancies по индексу publicly_visible. Флаг и копии
+# полей стартапа пересчитывает refresh_vacancy_visibility - одним UPDATE в той же транзакции,
+# что и смена статуса/паузы стартапа или статуса вакансии. Расхождения (ручные правки БД,
+# старые версии кода) находит и чинит flask --app main check-vacancy-visibility.
+def vacancy_visibility_values():
+    """Денормализованные колонки вакансии, вычисленные заново из startups (коррелированные подзапросы)."""
+    from_startup = lambda col: db.select(col).where(Startup.id == Vacancy.startup_id).scalar_subquery()
+    return {Vacancy.publicly_visible: and_(Vacancy.status == 'approved', vacancy_startup_available_condition()),
+            Vacancy.startup_name: from_startup(Startup.name), Vacancy.startup_creator_id: from_startup(Startup.creator_user_id)}
+
+def vacancy_visibility_drift_condition():
+    """Вакансии, у которых копии разошлись с вычисленными значениями."""
+    return or_(*[col.is_not(value) for col, value in vacancy_visibility_values().items()])
+
+def refresh_vacancy_visibility(*conditions):
+    """Пересчитывает копии у вакансий под conditions (в текущей транзакции); -> число измененных строк.
+    Строки, в которых ничего не меняется, не переписываются."""
+    db.session.flush() # Изменения стартапа/вакансии через ORM должны быть видны подзапросам
+    stmt = update(Vacancy).where(*conditions, vacancy_visibility_drift_condition())\
+                          .values(vacancy_visibility_values()).execution_options(synchronize_session=False)
+    return db.session.execute(stmt).rowcount
+
+
+# 8.7 Проекция списков (?fields=, view=summary)
+# ?fields=id,name - только эти поля; колонки, которые им не нужны, заменяются в SELECT на NULL
+# (JOIN и фильтры запроса не меняются, сериализатор строки - тот же). view=summary режет
+# длинные тексты до SUMMARY_TEXT_LENGTH символов прямо в SQL и ставит "truncated": true;
+# полный текст - GET /<лента>/<id>.
+SUMMARY_TEXT_LENGTH = 200
+SUMMARY_TEXT_FIELDS = ('description', 'requirements')
+
+def list_field_columns(columns, exclude=(), **derived):
+    """{поле ответа: ключи колонок строки} - одноименные колонки (кроме служебных exclude) и вычисляемые поля."""
+    fields = {col.key: (col.key,) for col in columns if col.key not in exclude}
+    fields.update(derived)
+    return fields
+
+def project_list(branches, field_columns, order_columns, serializer):
+    """-> (ветви с урезанным SELECT, сериализатор); ValueError со списком неизвестных полей."""
+    requested, summary = request.args.get('fields'), request.args.get('view') == 'summary'
+    if requested is None and not summary: return branches, serializer
+    fields, needed = None, None
+    if requested is not None:
+        fields = list(dict.fromkeys(f.strip() for f in requested.split(',') if f.strip()))
+        unknown = [f for f in fields if f not in field_columns]
+        if unknown or not fields: raise ValueError(', '.join(unknown) or '-')
+        # Ключи сортировки нужны курсору, даже если их нет среди полей
+        needed = {key for f in fields for key in field_columns[f]} | {col.key for col in order_columns}
+    def project(branch):
+        columns = []
+        for description in branch.column_descriptions:
+            name, expr = description['name'], description['expr']
+            if needed is not None and name not in needed: expr = null().label(name)
+            elif summary and name in SUMMARY_TEXT_FIELDS: expr = func.substr(expr, 1, SUMMARY_TEXT_LENGTH + 1).label(name)
+            columns.append(expr)
+        return branch.with_entities(*columns)
+    def projected_serializer(row):
+        item = serializer(row)
+        if summary:
+            truncated = False
+            for name in SUMMARY_TEXT_FIELDS:
+                text = item.get(name)
+                if text and len(text) > SUMMARY_TEXT_LENGTH: item[name], truncated = text[:SUMMARY_TEXT_LENGTH], True
+            item["truncated"] = truncated
+        if fields: item = {f: item[f] for f in fields + (["truncated"] if summary else [])}
+        return item
+    return [project(branch) for branch in branches], projected_serializer
+
+
+# 8.8 Ограничение частоты запросов (общее для всех воркеров)
+# Состояние - в отдельном файле SQLite (RATE_LIMIT_DB), а не в основной БД: проверка не ждет
+# лок писателя основной БД и не трогает ее таблицы, отказ (429) отдается до обработчика -
+# без запросов к БД и без хеширования пароля. Алгоритм - GCRA (token bucket в одном числе):
+# у ключа хранится "теоретическое время прихода" tat, каждый запрос сдвигает его на
+# period/limit, и запрос проходит, пока tat - now <= period (всплеск до limit запросов).
+# Все правила запроса проверяются в одной транзакции BEGIN IMMEDIATE (атомарно между
+# процессами), и новые tat записываются, только если прошли все: отказ по одному правилу
+# не тратит запросы остальных.
+RATE_LIMIT_POLICIES = { # имя -> (запросов, за секунд)
+    'login_ip': (30, 60), 'login_username': (10, 60), # Перебор паролей: с одного IP и на одно имя
+    'register_ip': (10, 600),
+    'write_user': (30, 60), 'write_ip': (120, 60), # Создание записей и отклики
+}
+RATE_LIMIT_CLEANUP_EVERY = 1000 # Раз в столько проверок процесс удаляет истекшие ключи
+_rate_limit_pools = {} # pid -> очередь соединений с RATE_LIMIT_DB (после fork - новая)
+_rate_limit_checks = [0]
+
+def rate_limit_policy(name):
+    limit, period = current_app.config["RATE_LIMITS"].get(name) or RATE_LIMIT_POLICIES[name]
+    return int(limit), float(period)
+
+def _rate_limit_connection_pool():
+    pool = _rate_limit_pools.get(os.getpid())
+    if pool is None: pool = _rate_limit_pools.setdefault(os.getpid(), queue.LifoQueue())
+    return pool
+
+def _open_rate_limit_connection():
+    conn = sqlite3.connect(current_app.config["RATE_LIMIT_DB"], timeout=1, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF") # Счетчики не жалко потерять при сбое ОС
+    conn.execute("CREATE TABLE IF NOT EXISTS rate_limits (key TEXT PRIMARY KEY, tat REAL NOT NULL) WITHOUT ROWID")
+    return conn
+
+def rate_limit_hits(hits):
+    """Учитывает запрос по правилам hits [(политика, ключ)] -> [(прошел?, осталось запросов, секунд до
+    повтора/полного сброса)] в том же порядке. tat сдвигаются, только если прошли все правила."""
+    now, checks = time.time(), []
+    for policy, key in hits:
+        limit, period = rate_limit_policy(policy)
+        checks.append((f"{policy}:{key}", period / limit, period))
+    pool = _rate_limit_connection_pool()
+    try: conn = pool.get_nowait()
+    except queue.Empty: conn = _open_rate_limit_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            keys = [key for key, _, _ in checks]
+            stored = dict(conn.execute(f"SELECT key, tat FROM rate_limits WHERE key IN ({', '.join('?' * len(keys))})", keys))
+            results, updates = [], []
+            for key, interval, period in checks:
+                tat = max(stored.get(key, now), now) + interval
+                if tat <= now + period:
+                    results.append((True, int((now + period - tat) / interval + 1e-9), tat - now)); updates.append((key, tat))
+                else: results.append((False, 0, tat - period - now))
+            if len(updates) == len(checks):
+                conn.executemany("INSERT INTO rate_limits (key, tat) VALUES (?, ?) "
+                                 "ON CONFLICT (key) DO UPDATE SET tat = excluded.tat", updates)
+            conn.execute("COMMIT")
+        except BaseException: conn.execute("ROLLBACK"); raise
+        return results
+    finally:
+        _rate_limit_checks[0] += 1
+        if _rate_limit_checks[0] % RATE_LIMIT_CLEANUP_EVERY == 0:
+            conn.execute("DELETE FROM rate_limits WHERE tat < ?", (now,)) # Полностью восстановившиеся = отсутствующие
+        pool.put(conn)
+
+def rate_limit_hit(policy, key):
+    """Одно правило: rate_limit_hits для [(policy, key)]."""
+    return rate_limit_hits([(policy, key)])[0]
+
+def client_ip_key(): return request.remote_addr
+def jwt_user_key(): return get_jwt_identity() # Только под @jwt_required (без запроса к БД)
+def login_username_key():
+    username = (request.get_json(silent=True) or {}).get('username')
+    return username.strip().lower() if isinstance(username, str) and username.strip() else None
+
+def rate_limited(*rules):
+    """Декоратор: правила (политика, функция ключа) проверяются до обработчика; ключ None - правило пропускается.
+
+    Ответ получает заголовки RateLimit-* самого строгого правила, отказ - 429 с Retry-After.
+    Ошибка хранилища лимитов запрос не блокирует (лимитер не должен ронять API).
+    """
+    def wrapper(fn):
+        @wraps(fn)
+        def decorator(*args, **kwargs):
+            if not current_app.config["RATE_LIMIT_ENABLED"]: return fn(*args, **kwargs)
+            hits = [(policy, key) for policy, key in ((policy, key_fn()) for policy, key_fn in rules) if key is not None]
+            try: results = rate_limit_hits(hits) if hits else []
+            except sqlite3.Error as e:
+                inc_metric("rate_limit_errors_total"); print(f"Rate limit store error: {e}"); results = []
+            strictest = None # (осталось, секунд, лимит, период)
+            for (policy, _), (allowed, remaining, reset) in zip(hits, results):
+                limit, period = rate_limit_policy(policy)
+                if not allowed:
+                    inc_metric("rate_limited_total", policy=policy)
+                    response = jsonify({"error": "Слишком много запросов, повторите позже"})
+                    response.status_code = 429
+                    response.headers["Retry-After"] = str(max(1, math.ceil(reset)))
+                    response.headers["RateLimit-Policy"] = f"{limit};w={int(period)}"
+                    response.headers["RateLimit-Limit"], response.headers["RateLimit-Remaining"] = str(limit), "0"
+                    response.headers["RateLimit-Reset"] = response.headers["Retry-After"]
+                    return response
+                if strictest is None or remaining < strictest[0]: strictest = (remaining, reset, limit, period)
+            response = make_response(fn(*args, **kwargs))
+            if strictest:
+                remaining, reset, limit, period = strictest
+                response.headers["RateLimit-Policy"] = f"{limit};w={int(period)}"
+                response.headers["RateLimit-Limit"], response.headers["RateLimit-Remaining"] = str(limit), str(remaining)
+                response.headers["RateLimit-Reset"] = str(max(1, math.ceil(reset)))
+            return response
+        return decorator
+    return wrapper
+
+
 # --- API Endpoints ---
 
 # 9. Auth Endpoints
-@app.route("/register", methods=["POST"])
+@api.route("/register", methods=["POST"])
+@rate_limited(('register_ip', client_ip_key))
+@write_transaction(False) # Проверка имени - чтение; INSERT после хеша - в своей транзакции
 def register():
     data = request.json
     username = data.get("username")
@@ -217,8 +1448,10 @@ def register():
     if len(password) < 4: return jsonify({"error": "Пароль > 4 символов"}), 400
     if username == 'admin': return jsonify({"error": "Регистрация 'admin' запрещена"}), 409
     if User.query.filter_by(username=username).first(): return jsonify({"error": "Имя занято"}), 409
+    db.session.rollback() # Не держим лок записи SQLite, пока считается хеш
 
-    password_hash = generate_password_hash(password)
+    try: password_hash = hash_password(password)
+    except PasswordPoolBusy: return password_pool_busy_response()
     new_user = User(username=username, password_hash=password_hash, full_name=username)
 
     try:
@@ -229,7 +1462,23 @@ def register():
     except Exception as e: db.session.rollback(); print(f"Error: {e}"); return jsonify({"error": "Ошибка сервера"}), 500
 
 
-@app.route("/login", methods=["POST"])
+def upgrade_password_hash(user, password):
+    """Перехеширует пароль текущим методом после успешного входа. Не критично:
+    при занятом пуле или гонке просто попробуем при следующем входе."""
+    try:
+        new_hash = hash_password(password)
+        # Условие на старый хеш: не затираем пароль, смененный параллельно
+        User.query.filter_by(id=user.id, password_hash=user.password_hash)\
+                  .update({User.password_hash: new_hash}, synchronize_session=False)
+        db.session.commit()
+        print(f"Password hash upgraded for user {user.id}")
+    except PasswordPoolBusy: pass
+    except Exception as e: db.session.rollback(); print(f"Rehash error for user {user.id}: {e}")
+
+
+@api.route("/login", methods=["POST"])
+@rate_limited(('login_ip', client_ip_key), ('login_username', login_username_key))
+@write_transaction(False) # Только чтение; редкий перехеш - одиночный UPDATE в своей транзакции
 def login():
     data = request.json
     username = data.get("username")
@@ -237,9 +1486,17 @@ def login():
     if not username or not password: return jsonify({"error": "Нужны имя и пароль"}), 400
 
     user = User.query.filter_by(username=username).first()
+    if user: db.session.expunge(user) # Загруженные поля остаются доступны после rollback
+    db.session.rollback() # Не держим лок записи SQLite, пока проверяется хеш
+
+    try: password_ok = bool(user) and run_password_job(check_password_hash, user.password_hash, password)
+    except PasswordPoolBusy: return password_pool_busy_response()
 
-    if user and check_password_hash(user.password_hash, password):
-        access_token = create_access_token(identity=str(user.id))
+    if password_ok:
+        if password_needs_rehash(user.password_hash): upgrade_password_hash(user, password)
+        # role и версия токена в claims - для режима JWT_ROLE_CLAIMS
+        access_token = create_access_token(identity=str(user.id),
+                                           additional_claims={"role": user.role, "tv": user.token_version})
         print(f"Login OK: ID={user.id}, Role={user.role}")
         return jsonify(access_token=access_token, username=user.username, role=user.role)
     else:
@@ -248,7 +1505,7 @@ def login():
 
 
 # 10. Profile & User Endpoints
-@app.route("/profile", methods=["GET"])
+@api.route("/profile", methods=["GET"])
 @jwt_required()
 def get_profile():
     current_user = get_current_user()
@@ -260,7 +1517,7 @@ def get_profile():
     })
 
 
-@app.route("/profile", methods=["PUT"])
+@api.route("/profile", methods=["PUT"])
 @jwt_required()
 def update_profile():
     current_user = get_current_user()
@@ -285,6 +1542,7 @@ def update_profile():
     if not updated: return jsonify({"message": "Нет данных для обновления"}), 200
 
     try:
+        bump_feed_versions('startups') # В ленте стартапов видны контакты создателя
         db.session.commit()
         print(f"Profile updated for user ID: {current_user.id}")
         return jsonify({"message": "Профиль обновлен", "profile": {
@@ -296,55 +1554,363 @@ def update_profile():
     except Exception as e: db.session.rollback(); print(f"Error: {e}"); return jsonify({"error": "Ошибка сервера"}), 500
 
 
-@app.route("/profile/notifications", methods=["GET"])
+def serialize_notification(n: Notification) -> dict:
+    """Сериализует объект Notification в словарь."""
+    return {
+        "id": n.id, "user_id": n.user_id, "admin_id": n.admin_id, "message": n.message,
+        # Форматируем UTC дату в ISO строку с 'Z'
+        "timestamp": n.timestamp.replace(tzinfo=timezone.utc).isoformat(timespec='seconds').replace('+00:00', 'Z'),
+        "is_read": n.is_read
+    }
+
+NOTIFICATION_LIST_COLUMNS = (Notification.id, Notification.user_id, Notification.admin_id, Notification.message,
+                             raw_datetime_column(Notification.timestamp), Notification.is_read)
+
+NOTIFICATION_LIST_FIELDS = list_field_columns(NOTIFICATION_LIST_COLUMNS)
+
+def serialize_notification_row(row) -> dict:
+    """serialize_notification для строки NOTIFICATION_LIST_COLUMNS."""
+    return {"id": row.id, "user_id": row.user_id, "admin_id": row.admin_id, "message": row.message,
+            "timestamp": format_utc_timestamp(row.timestamp), "is_read": row.is_read}
+
+@api.route("/profile/notifications", methods=["GET"])
 @jwt_required()
 def get_my_notifications():
     current_user = get_current_user()
     if not current_user: return jsonify({"error": "Пользователь не найден"}), 404
 
-    notifications = Notification.query.filter_by(user_id=current_user.id)\
-                                      .order_by(desc(Notification.timestamp)).all()
-    result = [{
-        "id": n.id, "user_id": n.user_id, "admin_id": n.admin_id, "message": n.message,
-        # Форматируем UTC дату в ISO строку с 'Z'
-        "timestamp": n.timestamp.replace(tzinfo=timezone.utc).isoformat(timespec='seconds').replace('+00:00', 'Z'),
-        "is_read": n.is_read
-    } for n in notifications]
-    return jsonify(result)
+    query = db.session.query(*NOTIFICATION_LIST_COLUMNS).filter(Notification.user_id == current_user.id)
+    return keyset_list_response(query, [Notification.timestamp, Notification.id], serialize_notification_row,
+                                field_columns=NOTIFICATION_LIST_FIELDS)
+
+
+@api.route("/profile/notifications/unread_count", methods=["GET"])
+@jwt_required()
+def get_unread_notifications_count():
+    current_user_id, _ = get_current_identity()
+    if not current_user_id: return jsonify({"error": "Пользователь не найден"}), 404
+    return jsonify(unread_count=count_unread_notifications(current_user_id))
 
 
-@app.route('/users/<int:user_id>/notifications', methods=['POST'])
+@api.route("/profile/notifications/read", methods=["POST"])
+@jwt_required()
+def mark_notifications_read():
+    """Отмечает прочитанными одним UPDATE: {"ids": [...]} или {"up_to": "<ISO-время>"} (включительно)."""
+    current_user_id, _ = get_current_identity()
+    if not current_user_id: return jsonify({"error": "Пользователь не найден"}), 404
+
+    data = request.json or {}
+    if not isinstance(data, dict): return jsonify({"error": "Тело: {ids: [...]} или {up_to: ...}"}), 400
+    query = Notification.query.filter(Notification.user_id == current_user_id, Notification.is_read == False)
+    if "ids" in data:
+        ids = data["ids"]
+        if not isinstance(ids, list) or not ids or len(ids) > MAX_PAGE_LIMIT or not all(type(i) is int for i in ids):
+            return jsonify({"error": f"ids: список до {MAX_PAGE_LIMIT} чисел"}), 400
+        query = query.filter(Notification.id.in_(ids))
+    elif "up_to" in data:
+        try:
+            up_to = datetime.fromisoformat(str(data["up_to"]).replace('Z', '+00:00'))
+            if up_to.tzinfo: up_to = up_to.astimezone(timezone.utc).replace(tzinfo=None) # В БД - наивное UTC
+        except ValueError: return jsonify({"error": "up_to: формат даты?"}), 400
+        query = query.filter(Notification.timestamp <= up_to)
+    else: return jsonify({"error": "Нужно ids или up_to"}), 400
+
+    try:
+        updated = query.update({Notification.is_read: True}, synchronize_session=False)
+        db.session.commit()
+        return jsonify(updated=updated, unread_count=count_unread_notifications(current_user_id))
+    except Exception as e: db.session.rollback(); print(f"Error: {e}"); return jsonify({"error": "Ошибка сервера"}), 500
+
+
+def count_unread_notifications(user_id):
+    return db.session.query(func.count(Notification.id))\
+                     .filter(Notification.user_id == user_id, Notification.is_read == False).scalar()
+
+
+# 10.1 Поток уведомлений (Server-Sent Events)
+# Открытый поток не держит ни соединение с БД, ни запрос к ней: он ждет в своей очереди.
+# Раз в NOTIFICATION_POLL_SECONDS один фоновый поток процесса выбирает notifications с
+# id > последнего увиденного (запрос по первичному ключу) и раскладывает строки по очередям
+# получателей - так приходят и уведомления, записанные другими воркерами. Запись в этом же
+# процессе будит его сразу. Чтобы держать тысячи простаивающих потоков, запускайте
+# gunicorn с GUNICORN_WORKER_CLASS=gevent (см. gunicorn.conf.py): тогда ожидание - это гринлет.
+SSE_KEEPALIVE_SECONDS = 15
+SSE_BACKLOG_LIMIT = 500 # Сколько пропущенных уведомлений отдаем при переподключении (Last-Event-ID)
+SSE_QUEUE_SIZE = 1000
+_notification_streams = {} # 'state' -> {lock, wake, subscribers, last_id}; см. _notification_streams_state
+
+def _notification_streams_state():
+    """Состояние раздачи; создается при первом подключении - уже после monkey-patch gevent-воркера,
+    чтобы Lock/Event/Queue были кооперативными."""
+    state = _notification_streams.get('state')
+    if state: return state
+    last_id = db.session.query(func.max(Notification.id)).scalar() or 0
+    candidate = {'lock': threading.Lock(), 'wake': threading.Event(), 'subscribers': {}, 'last_id': last_id,
+                 'app': current_app._get_current_object()}
+    state = _notification_streams.setdefault('state', candidate) # Атомарно: поток опроса запустит один победитель
+    if state is candidate:
+        threading.Thread(target=_poll_new_notifications, args=(state,), name='notification-poller', daemon=True).start()
+    return state
+
+def _poll_new_notifications(state):
+    while True:
+        state['wake'].wait(state['app'].config["NOTIFICATION_POLL_SECONDS"]); state['wake'].clear()
+        try:
+            with state['app'].app_context():
+                rows = db.session.query(Notification.id, Notification.user_id, Notification.admin_id, Notification.message,
+                                        Notification.timestamp, Notification.is_read)\
+                                 .filter(Notification.id > state['last_id']).order_by(Notification.id).limit(1000).all()
+        except Exception as e:
+            print(f"Notification poller error: {e}"); continue
+        if not rows: continue
+        state['last_id'] = rows[-1].id
+        if len(rows) == 1000: state['wake'].set() # Есть еще - следующая пачка без ожидания
+        with state['lock']: subscribers = {uid: list(qs) for uid, qs in state['subscribers'].items()}
+        for row in rows:
+            for subscriber in subscribers.get(row.user_id, ()):
+                try: subscriber.put_nowait(serialize_notification(row))
+                except queue.Full: pass # Клиент не успевает читать - догонит по Last-Event-ID
+
+def wake_notification_streams():
+    state = _notification_streams.get('state')
+    if state: state['wake'].set()
+
+def _format_sse(notification):
+    return f"id: {notification['id']}\nevent: notification\ndata: {json.dumps(notification, ensure_ascii=False)}\n\n"
+
+@api.route("/profile/notifications/stream", methods=["GET"])
+@jwt_required(locations=["headers", "query_string"]) # EventSource не умеет заголовки - токен в ?jwt=
+def stream_my_notifications():
+    claims = get_jwt()
+    user_id = int(claims["sub"])
+    if claims.get("tv", 0) != get_token_version(user_id): return jsonify(error="Токен был отозван"), 401
+
+    state = _notification_streams_state()
+    subscriber = queue.Queue(maxsize=SSE_QUEUE_SIZE)
+    with state['lock']: state['subscribers'].setdefault(user_id, set()).add(subscriber)
+
+    # Подписываемся ДО чтения пропущенного, иначе уведомление между ними потерялось бы
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    backlog = []
+    if last_event_id and last_event_id.isdigit():
+        backlog = [serialize_notification(n) for n in
+                   Notification.query.filter(Notification.user_id == user_id, Notification.id > int(last_event_id))
+                                     .order_by(Notification.id).limit(SSE_BACKLOG_LIMIT)]
+
+    def generate():
+        last_sent_id = int(last_event_id) if last_event_id and last_event_id.isdigit() else 0
+        try:
+            yield "retry: 5000\n\n"
+            for notification in backlog:
+                yield _format_sse(notification); last_sent_id = notification['id']
+            while True:
+                try: notification = subscriber.get(timeout=SSE_KEEPALIVE_SECONDS)
+                except queue.Empty: yield ": keepalive\n\n"; continue
+                if notification['id'] <= last_sent_id: continue # Уже отдано из backlog
+                yield _format_sse(notification); last_sent_id = notification['id']
+        finally:
+            with state['lock']:
+                subscribers = state['subscribers'].get(user_id)
+                if subscribers is not None:
+                    subscribers.discard(subscriber)
+                    if not subscribers: del state['subscribers'][user_id]
+
+    return Response(generate(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}) # nginx: не буферизовать
+
+
+@api.route('/users/<int:user_id>/notifications', methods=['POST'])
 @admin_required()
 def send_user_notification(user_id):
-    admin_user = get_current_user()
+    admin_id, _ = get_current_identity() # Уже получено в admin_required
     target_user = User.query.get(user_id)
     if not target_user: return jsonify({'error': 'Получатель не найден'}), 404
-    if target_user.id == admin_user.id: return jsonify({'error': 'Нельзя отправить себе'}), 400
+    if target_user.id == admin_id: return jsonify({'error': 'Нельзя отправить себе'}), 400
 
     data = request.json; message_text = data.get("message")
     if not message_text or not isinstance(message_text, str) or not message_text.strip():
         return jsonify({'error': 'Текст пуст'}), 400
 
-    new_notification = Notification(user_id=target_user.id, admin_id=admin_user.id, message=message_text.strip())
+    new_notification = Notification(user_id=target_user.id, admin_id=admin_id, message=message_text.strip())
     try:
         db.session.add(new_notification); db.session.commit()
-        print(f"Admin {admin_user.id} sent notification {new_notification.id} to user {target_user.id}")
-        result_notification = {
-            "id": new_notification.id, "user_id": new_notification.user_id, "admin_id": new_notification.admin_id,
-            "message": new_notification.message,
-            "timestamp": new_notification.timestamp.replace(tzinfo=timezone.utc).isoformat(timespec='seconds').replace('+00:00', 'Z'),
-            "is_read": new_notification.is_read
-        }
-        return jsonify({"message": f"Уведомление отправлено {target_user.username}", "notification": result_notification}), 201
+        wake_notification_streams() # Открытые SSE-потоки этого воркера получат его сразу
+        print(f"Admin {admin_id} sent notification {new_notification.id} to user {target_user.id}")
+        return jsonify({"message": f"Уведомление отправлено {target_user.username}", "notification": serialize_notification(new_notification)}), 201
+    except Exception as e: db.session.rollback(); print(f"Error: {e}"); return jsonify({"error": "Ошибка сервера"}), 500
+
+
+# 10.2 Массовые рассылки уведомлений
+# Задача сама идет по сегменту от last_user_id, поэтому прерванную (перезапуск воркера, деплой)
+# продолжает любой воркер: задачи без heartbeat дольше BROADCAST_STALE_SECONDS подхватывает
+# фоновая проверка в каждом воркере (start_broadcast_watchdog) или flask --app main resume-broadcasts.
+BROADCAST_CHUNK_SIZE = 1000 # Уведомлений на одну транзакцию
+BROADCAST_SYNC_LIMIT = 1000 # До стольких получателей рассылаем прямо в запросе, больше - в фоне
+BROADCAST_STALE_SECONDS = 60
+BROADCAST_MAX_EXPLICIT_IDS = 10000
+
+def broadcast_recipients_query(segment, admin_id):
+    """Один запрос, возвращающий id получателей сегмента по возрастанию (без самого отправителя).
+
+    segment: {"type": "all"} | {"type": "role", "role": ...} | {"type": "startup_creators"} |
+             {"type": "vacancy_applicants", "vacancy_id": ...} | {"type": "users", "user_ids": [...]}
+    """
+    if not isinstance(segment, dict): raise ValueError("segment?")
+    segment_type = segment.get("type")
+    query = db.session.query(User.id)
+    if segment_type == "all": pass
+    elif segment_type == "role":
+        if segment.get("role") not in ("user", "admin"): raise ValueError("role: user | admin")
+        query = query.filter(User.role == segment["role"])
+    elif segment_type == "startup_creators":
+        query = query.filter(User.id.in_(db.session.query(Startup.creator_user_id)))
+    elif segment_type == "vacancy_applicants":
+        if type(segment.get("vacancy_id")) is not int: raise ValueError("vacancy_id?")
+        query = query.filter(User.id.in_(db.session.query(VacancyApplication.user_id)
+                                                   .filter(VacancyApplication.vacancy_id == segment["vacancy_id"])))
+    elif segment_type == "users":
+        user_ids = segment.get("user_ids")
+        if not isinstance(user_ids, list) or not user_ids or len(user_ids) > BROADCAST_MAX_EXPLICIT_IDS \
+                or not all(type(i) is int for i in user_ids): # bool - тоже int, но не id
+            raise ValueError(f"user_ids: список до {BROADCAST_MAX_EXPLICIT_IDS} чисел")
+        query = query.filter(User.id.in_(user_ids)) # Заодно отбрасывает несуществующих
+    else: raise ValueError("segment.type: all | role | startup_creators | vacancy_applicants | users")
+    return query.filter(User.id != admin_id).order_by(User.id)
+
+def serialize_broadcast_job(job: BroadcastJob) -> dict:
+    to_iso = lambda dt: dt.replace(tzinfo=timezone.utc).isoformat(timespec='seconds').replace('+00:00', 'Z') if dt else None
+    return {
+        "id": job.id, "status": job.status, "total": job.total, "sent": job.sent, "segment": job.segment,
+        "error": job.error, "created_at": to_iso(job.created_at), "finished_at": to_iso(job.finished_at)
+    }
+
+def claim_broadcast_job(job_id, stale_only=False):
+    """Берет задачу в работу (pending -> running); stale_only - только с протухшим heartbeat
+    (ее воркер умер). Условный UPDATE: из нескольких воркеров задачу возьмет один. -> взята ли."""
+    stale = or_(BroadcastJob.heartbeat_at.is_(None),
+                BroadcastJob.heartbeat_at < datetime.utcnow() - timedelta(seconds=BROADCAST_STALE_SECONDS))
+    claimable = and_(BroadcastJob.status.in_(['pending', 'running']), stale) if stale_only else BroadcastJob.status == 'pending'
+    claimed = BroadcastJob.query.filter(BroadcastJob.id == job_id, claimable)\
+                                .update({BroadcastJob.status: 'running', BroadcastJob.heartbeat_at: datetime.utcnow()},
+                                        synchronize_session=False)
+    db.session.commit()
+    return claimed == 1
+
+@write_transaction() # Каждая пачка читает задачу и пишет уведомления
+def run_broadcast_job(job_id):
+    """Пишет уведомления пачками по BROADCAST_CHUNK_SIZE получателям после last_user_id. Выборка пачки,
+    уведомления, прогресс и heartbeat - одна транзакция: после обрыва задача продолжается без дублей."""
+    job = BroadcastJob.query.get(job_id)
+    admin_id, message, segment = job.admin_id, job.message, job.segment
+    recipients = lambda after: broadcast_recipients_query(segment, admin_id).filter(User.id > after)
+    try:
+        job.total = job.sent + recipients(job.last_user_id).count(); db.session.commit()
+        while True:
+            last_user_id = db.session.query(BroadcastJob.last_user_id).filter(BroadcastJob.id == job_id).scalar()
+            chunk = [uid for (uid,) in recipients(last_user_id).limit(BROADCAST_CHUNK_SIZE)]
+            if not chunk: db.session.rollback(); break
+            sent_at = datetime.utcnow()
+            db.session.execute(db.insert(Notification), [
+                {"user_id": uid, "admin_id": admin_id, "message": message, "timestamp": sent_at, "is_read": False}
+                for uid in chunk])
+            BroadcastJob.query.filter(BroadcastJob.id == job_id)\
+                              .update({BroadcastJob.sent: BroadcastJob.sent + len(chunk),
+                                       BroadcastJob.last_user_id: chunk[-1], BroadcastJob.heartbeat_at: sent_at},
+                                      synchronize_session=False)
+            db.session.commit()
+            wake_notification_streams()
+            time.sleep(0) # Отдаем управление другим потокам/гринлетам между пачками
+        BroadcastJob.query.filter(BroadcastJob.id == job_id)\
+                          .update({BroadcastJob.status: 'done', BroadcastJob.total: BroadcastJob.sent,
+                                   BroadcastJob.finished_at: datetime.utcnow()}, synchronize_session=False)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback(); print(f"Broadcast job {job_id} failed: {e}")
+        BroadcastJob.query.filter(BroadcastJob.id == job_id)\
+                          .update({BroadcastJob.status: 'failed', BroadcastJob.error: str(e),
+                                   BroadcastJob.finished_at: datetime.utcnow()}, synchronize_session=False)
+        db.session.commit()
+
+def _run_broadcast_job_in_background(app, job_id):
+    with app.app_context():
+        if claim_broadcast_job(job_id): run_broadcast_job(job_id)
+
+def resume_stale_broadcasts():
+    """Продолжает задачи, чей воркер умер (pending/running без heartbeat BROADCAST_STALE_SECONDS) -> их id."""
+    stale_before = datetime.utcnow() - timedelta(seconds=BROADCAST_STALE_SECONDS)
+    candidates = [job_id for (job_id,) in db.session.query(BroadcastJob.id)
+                  .filter(BroadcastJob.status.in_(['pending', 'running']),
+                          or_(BroadcastJob.heartbeat_at.is_(None), BroadcastJob.heartbeat_at < stale_before))
+                  .order_by(BroadcastJob.id)]
+    db.session.rollback()
+    resumed = []
+    for job_id in candidates:
+        if not claim_broadcast_job(job_id, stale_only=True): continue # Уже взял другой воркер
+        print(f"Resuming broadcast job {job_id}")
+        run_broadcast_job(job_id); resumed.append(job_id)
+    return resumed
+
+_broadcast_watchdog = {} # 'thread' -> поток проверки; см. start_broadcast_watchdog
+
+def _watch_broadcasts(app):
+    with app.app_context():
+        while True:
+            try: resume_stale_broadcasts()
+            except Exception as e: db.session.rollback(); print(f"Broadcast watchdog error: {e}")
+            db.session.remove()
+            time.sleep(BROADCAST_STALE_SECONDS)
+
+def start_broadcast_watchdog():
+    """Фоновая проверка воркера: подхватывает рассылки, прерванные перезапуском (вызывает post_worker_init)."""
+    thread = threading.Thread(target=_watch_broadcasts, args=(current_app._get_current_object(),),
+                              name='broadcast-watchdog', daemon=True)
+    if _broadcast_watchdog.setdefault('thread', thread) is thread: thread.start()
+
+@api.route('/notifications/broadcast', methods=['POST'])
+@admin_required()
+def broadcast_notification():
+    admin_id, _ = get_current_identity()
+    data = request.json or {}
+    if not isinstance(data, dict): return jsonify({'error': 'Тело: {message, segment}'}), 400
+    message_text = data.get("message")
+    if not message_text or not isinstance(message_text, str) or not message_text.strip():
+        return jsonify({'error': 'Текст пуст'}), 400
+    segment = data.get("segment")
+    try: recipients_query = broadcast_recipients_query(segment, admin_id)
+    except ValueError as e: return jsonify({'error': str(e)}), 400
+
+    # Получателей не выбираем: хватает знать, больше ли их BROADCAST_SYNC_LIMIT (total посчитает задача)
+    is_small = recipients_query.limit(BROADCAST_SYNC_LIMIT + 1).count() <= BROADCAST_SYNC_LIMIT
+    job = BroadcastJob(admin_id=admin_id, message=message_text.strip(), segment=segment,
+                       status='pending', total=0, heartbeat_at=datetime.utcnow())
+    try: db.session.add(job); db.session.commit()
     except Exception as e: db.session.rollback(); print(f"Error: {e}"); return jsonify({"error": "Ошибка сервера"}), 500
 
+    if is_small:
+        if claim_broadcast_job(job.id): run_broadcast_job(job.id)
+        db.session.refresh(job)
+        print(f"Admin {admin_id} broadcast job {job.id}: {job.sent}/{job.total}")
+        return jsonify({"message": f"Разослано: {job.sent}", "job": serialize_broadcast_job(job)}), 201
+    threading.Thread(target=_run_broadcast_job_in_background, args=(current_app._get_current_object(), job.id),
+                     name=f'broadcast-{job.id}', daemon=True).start()
+    print(f"Admin {admin_id} started broadcast job {job.id}")
+    return jsonify({"message": "Рассылка запущена", "job": serialize_broadcast_job(job)}), 202
+
 
-@app.route("/users", methods=["GET"])
+@api.route('/notifications/broadcast/<int:job_id>', methods=['GET'])
+@admin_required()
+def get_broadcast_job(job_id):
+    job = BroadcastJob.query.get(job_id)
+    if not job: return jsonify({'error': 'Рассылка не найдена'}), 404
+    return jsonify(serialize_broadcast_job(job))
+
+
+@api.route("/users", methods=["GET"])
 @admin_required()
 def get_all_users():
-    admin_user = get_current_user()
+    admin_id, _ = get_current_identity()
     # Исключаем текущего админа из списка
-    users = User.query.filter(User.id != admin_user.id).order_by(User.id).all()
+    users = User.query.filter(User.id != admin_id).order_by(User.id).all()
     result = [{"id": u.id, "username": u.username} for u in users]
     return jsonify(result)
 
@@ -353,7 +1919,7 @@ def get_all_users():
 def serialize_startup(startup: Startup) -> dict | None:
     """Сериализует объект Startup в словарь для JSON."""
     if not startup: return None
-    creator = User.query.get(startup.creator_user_id)
+    creator = startup.creator # Для списков подгружается заранее через joinedload
     return {
         "id": startup.id, "name": startup.name, "description": startup.description,
         "funds_raised": startup.funds_raised or {}, "opensea_link": startup.opensea_link,
@@ -365,66 +1931,107 @@ def serialize_startup(startup: Startup) -> dict | None:
         "creator_resume_link": creator.resume_link if creator else None
     }
 
-@app.route("/startups", methods=["GET"])
+STARTUP_LIST_COLUMNS = (
+    Startup.id, Startup.name, Startup.description, raw_json_column(Startup.funds_raised), Startup.opensea_link,
+    Startup.status, Startup.rejection_reason, Startup.creator_user_id, Startup.current_stage,
+    raw_json_column(Startup.stage_timeline), Startup.is_held, User.id.label('creator_id'),
+    User.username.label('creator_username'), User.telegram.label('creator_telegram'),
+    User.resume_link.label('creator_resume_link'))
+
+STARTUP_LIST_FIELDS = list_field_columns(STARTUP_LIST_COLUMNS, exclude=('creator_id',),
+                                         creator_username=('creator_id', 'creator_username'))
+
+def serialize_startup_row(row) -> dict:
+    """serialize_startup для строки STARTUP_LIST_COLUMNS (создатель - из LEFT JOIN users)."""
+    has_creator = row.creator_id is not None
+    return {
+        "id": row.id, "name": row.name, "description": row.description,
+        "funds_raised": raw_json_value(row.funds_raised), "opensea_link": row.opensea_link,
+        "status": row.status, "rejection_reason": row.rejection_reason,
+        "creator_user_id": row.creator_user_id, "current_stage": row.current_stage,
+        "stage_timeline": raw_json_value(row.stage_timeline), "is_held": row.is_held,
+        "creator_username": row.creator_username if has_creator else "N/A",
+        "creator_telegram": row.creator_telegram, "creator_resume_link": row.creator_resume_link
+    }
+
+def visible_startups_branches(user_id):
+    """Видимость для не-админа: одобренные и не на паузе + свои pending/rejected.
+    Условия не пересекаются; у каждого свой индекс (ix_startups_status_is_held, ix_startups_creator_user_id)."""
+    branches = [(Startup.status == 'approved') & (Startup.is_held == False)]
+    if user_id: branches.append((Startup.creator_user_id == user_id) & (Startup.status.in_(['pending', 'rejected'])))
+    return branches
+
+def visible_startups_condition(user_id):
+    return or_(*visible_startups_branches(user_id))
+
+@api.route("/startups", methods=["GET"])
+@cached_public_feed('startups')
 @jwt_required(optional=True)
 def get_startups():
-    current_user = get_current_user()
-    is_admin = current_user and current_user.role == 'admin'
+    current_user_id, current_role = get_current_identity()
+    is_admin = current_role == 'admin'
     filter_by_creator = request.args.get('filter_by_creator', 'false').lower() == 'true'
 
-    if filter_by_creator and not current_user: return jsonify(error="Требуется авторизация"), 401
+    if filter_by_creator and not current_user_id: return jsonify(error="Требуется авторизация"), 401
+
+    milestones, error = milestone_filter(request.args)
+    if error: return jsonify(error=error), 400
 
-    query = Startup.query
+    # Создатель - тем же SELECT (LEFT JOIN), только нужные колонки
+    query = db.session.query(*STARTUP_LIST_COLUMNS).outerjoin(User, User.id == Startup.creator_user_id)
+    if milestones is not None: query = query.filter(milestones)
     if not is_admin:
-        base_filter = (Startup.status == 'approved') & (Startup.is_held == False)
-        if current_user:
-            own_filter = (Startup.creator_user_id == current_user.id) & (Startup.status.in_(['pending', 'rejected']))
-            if filter_by_creator: query = query.filter(Startup.creator_user_id == current_user.id)
-            else: query = query.filter(or_(base_filter, own_filter)) # Используем or_
+        if current_user_id:
+            if filter_by_creator: query = query.filter(Startup.creator_user_id == current_user_id)
+            else: query = [query.filter(branch) for branch in visible_startups_branches(current_user_id)]
         else: # Аноним
              if filter_by_creator: return jsonify(error="Анонимный не может фильтровать"), 400
-             query = query.filter(base_filter)
+             query = query.filter(visible_startups_condition(None))
     elif filter_by_creator: # Админ с фильтром
-         query = query.filter(Startup.creator_user_id == current_user.id)
+         query = query.filter(Startup.creator_user_id == current_user_id)
     # Админ без фильтра - базовый query
+    return keyset_list_response(query, [Startup.id], serialize_startup_row, field_columns=STARTUP_LIST_FIELDS)
 
-    startups_list = query.order_by(desc(Startup.id)).all() # Используем desc
-    result = [serialize_startup(s) for s in startups_list]
-    return jsonify(result)
-
-
-@app.route("/startups", methods=["POST"])
+@api.route("/startups/<int:startup_id>", methods=["GET"])
+@jwt_required(optional=True)
+def get_startup(startup_id):
+    """Один стартап целиком (полные тексты к view=summary) с той же видимостью, что в ленте."""
+    current_user_id, current_role = get_current_identity()
+    query = db.session.query(*STARTUP_LIST_COLUMNS).outerjoin(User, User.id == Startup.creator_user_id)\
+                      .filter(Startup.id == startup_id)
+    if current_role != 'admin': query = query.filter(visible_startups_condition(current_user_id))
+    row = query.first()
+    if not row: return jsonify({"error": "Startup?"}), 404
+    return jsonify(serialize_startup_row(row))
+
+
+@api.route("/startups", methods=["POST"])
 @jwt_required()
+@rate_limited(('write_user', jwt_user_key), ('write_ip', client_ip_key))
 def add_startup():
     current_user = get_current_user()
     if not current_user: return jsonify({"error": "User?"}), 404
     if not current_user.telegram or not current_user.resume_link or not is_valid_url(current_user.resume_link):
          return jsonify({"error": "Заполните профиль."}), 400
 
-    data = request.json; name = data.get("name"); description = data.get("description")
-    opensea_link = data.get("opensea_link"); current_stage = data.get("current_stage")
-
-    if not name or not description: return jsonify({'error': 'Name/Desc required'}), 400
-    if opensea_link and not is_valid_url(opensea_link): return jsonify({'error': 'OpenSea URL invalid'}), 400
-    if not current_stage or current_stage not in ALLOWED_STAGES: return jsonify({'error': f'Stage invalid'}), 400
-
-    current_stage_order = get_stage_order(current_stage)
-    initial_timeline = {stage: None for i, stage in enumerate(ALLOWED_STAGES) if i > current_stage_order}
-
-    new_startup = Startup(
-        name=name.strip(), description=description.strip(), funds_raised={},
-        opensea_link=opensea_link.strip() if opensea_link else None, status='pending',
-        creator_user_id=current_user.id, current_stage=current_stage,
-        stage_timeline=initial_timeline, is_held=False
-    )
+    fields, error = startup_fields(request.json or {})
+    if error: return jsonify({'error': error}), 400
+    new_startup = Startup(**fields, status='pending', creator_user_id=current_user.id)
     try:
-        db.session.add(new_startup); db.session.commit()
+        db.session.add(new_startup); bump_feed_versions('startups', 'vacancies'); db.session.commit()
         print(f"Added PENDING startup: ID={new_startup.id}")
         return jsonify({"message": "Заявка отправлена", "startup": serialize_startup(new_startup)}), 201
     except Exception as e: db.session.rollback(); print(f"Error: {e}"); return jsonify({"error": "Ошибка БД"}), 500
 
 
-@app.route('/startups/<int:startup_id>/funds', methods=['PUT'])
+@api.route("/startups/batch/<action>", methods=["PUT"])
+@admin_required()
+def batch_moderate_startups(action):
+    """PUT /startups/batch/approve | reject | toggle_hold"""
+    return batch_moderation_response(Startup, action)
+
+
+@api.route('/startups/<int:startup_id>/funds', methods=['PUT'])
 @jwt_required()
 def update_startup_funds(startup_id):
     current_user = get_current_user(); startup = Startup.query.get(startup_id)
@@ -433,30 +2040,31 @@ def update_startup_funds(startup_id):
 
     new_funds_data = request.json; validated_funds = {}
     if not isinstance(new_funds_data, dict): return jsonify({'error': 'Тело запроса JSON?'}), 400
-    allowed = ["ETH", "BTC", "USDT"]
     for currency, amount in new_funds_data.items():
         upper_currency = currency.upper()
-        if upper_currency not in allowed: return jsonify({"error": f"Валюта {currency}?"}), 400
+        if upper_currency not in FUNDS_CURRENCIES: return jsonify({"error": f"Валюта {currency}?"}), 400
         try: amount_float = float(amount); assert amount_float >= 0; validated_funds[upper_currency] = amount_float
         except: return jsonify({"error": f"Сумма {amount} для {currency}?"}), 400
 
     startup.funds_raised = validated_funds # SQLAlchemy отследит изменение JSON
-    try: db.session.commit(); return jsonify({"message": "Средства обновлены", "startup": serialize_startup(startup)})
+    try: bump_feed_versions('startups'); db.session.commit(); return jsonify({"message": "Средства обновлены", "startup": serialize_startup(startup)})
     except Exception as e: db.session.rollback(); print(f"Error: {e}"); return jsonify({"error": "Ошибка БД"}), 500
 
 
-@app.route("/startups/<int:startup_id>/approve", methods=["PUT"])
+@api.route("/startups/<int:startup_id>/approve", methods=["PUT"])
 @admin_required()
 def approve_startup(startup_id):
     startup = Startup.query.get(startup_id)
     if not startup: return jsonify({"error": "Startup?"}), 404
     if startup.status != "pending": return jsonify({"error": "Only pending"}), 409
     startup.status = "approved"; startup.rejection_reason = None
-    try: db.session.commit(); return jsonify({"message": "Одобрен", "startup": serialize_startup(startup)})
+    try:
+        refresh_vacancy_visibility(Vacancy.startup_id == startup.id)
+        bump_feed_versions('startups', 'vacancies'); db.session.commit(); return jsonify({"message": "Одобрен", "startup": serialize_startup(startup)})
     except Exception as e: db.session.rollback(); print(f"Error: {e}"); return jsonify({"error": "Ошибка БД"}), 500
 
 
-@app.route("/startups/<int:startup_id>/reject", methods=["PUT"])
+@api.route("/startups/<int:startup_id>/reject", methods=["PUT"])
 @admin_required()
 def reject_startup(startup_id):
     startup = Startup.query.get(startup_id)
@@ -465,11 +2073,13 @@ def reject_startup(startup_id):
     data = request.json; reason = data.get("reason")
     if not reason or not isinstance(reason, str) or not reason.strip(): return jsonify({"error": "Reason?"}), 400
     startup.status = "rejected"; startup.rejection_reason = reason.strip()
-    try: db.session.commit(); return jsonify({"message": "Отклонен", "startup": serialize_startup(startup)})
+    try:
+        refresh_vacancy_visibility(Vacancy.startup_id == startup.id)
+        bump_feed_versions('startups', 'vacancies'); db.session.commit(); return jsonify({"message": "Отклонен", "startup": serialize_startup(startup)})
     except Exception as e: db.session.rollback(); print(f"Error: {e}"); return jsonify({"error": "Ошибка БД"}), 500
 
 
-@app.route('/startups/<int:startup_id>/timeline', methods=['PUT'])
+@api.route('/startups/<int:startup_id>/timeline', methods=['PUT'])
 @jwt_required()
 def update_startup_timeline(startup_id):
     current_user = get_current_user(); startup = Startup.query.get(startup_id)
@@ -487,31 +2097,66 @@ def update_startup_timeline(startup_id):
         if stage_order == -1: return jsonify({'error': f'Этап {stage_key}?'}), 400
         if stage_order <= current_stage_order: return jsonify({'error': f'Нельзя менять {stage_key}'}), 400
         if not is_valid_iso_date(date_value): return jsonify({'error': f'Формат даты {stage_key}?'}), 400
-        updated_timeline[stage_key] = date_value if date_value else None
+        updated_timeline[stage_key] = normalize_iso_date(date_value) if date_value else None
 
-    startup.stage_timeline = updated_timeline
-    try: db.session.commit(); return jsonify({"message": "План обновлен", "startup": serialize_startup(startup)})
+    startup.stage_timeline = updated_timeline # startup_milestones обновит триггер (раздел 11.1)
+    try: bump_feed_versions('startups'); db.session.commit(); return jsonify({"message": "План обновлен", "startup": serialize_startup(startup)})
     except Exception as e: db.session.rollback(); print(f"Error: {e}"); return jsonify({"error": "Ошибка БД"}), 500
 
 
-@app.route('/startups/<int:startup_id>/toggle_hold', methods=['PUT'])
+@api.route('/startups/<int:startup_id>/toggle_hold', methods=['PUT'])
 @admin_required()
 def toggle_hold_startup(startup_id):
     startup = Startup.query.get(startup_id)
     if not startup: return jsonify({'error': 'Startup?'}), 404
     startup.is_held = not startup.is_held
     try:
+        refresh_vacancy_visibility(Vacancy.startup_id == startup.id)
+        bump_feed_versions('startups', 'vacancies') # Пауза стартапа скрывает и его вакансии
         db.session.commit(); status_str = "приостановлен" if startup.is_held else "возвращен"
         print(f"Startup {startup_id} is now {status_str}")
         return jsonify({"message": f"Стартап {status_str}", "startup": serialize_startup(startup)})
     except Exception as e: db.session.rollback(); print(f"Error: {e}"); return jsonify({"error": "Ошибка БД"}), 500
 
 
+# 11.1 Плановые даты этапов (startup_milestones)
+# Непустые даты stage_timeline копируют в startup_milestones триггеры SQLite при любой записи
+# стартапа (PUT /timeline, импорт, массовые UPDATE), поэтому фильтры /startups по этапу и датам
+# идут диапазоном по индексу, а не разбором JSON каждой строки.
+def _insert_milestones_sql(ref, source=""):
+    """Непустые даты stage_timeline стартапа ref - в startup_milestones (source - откуда ref, если это не new)."""
+    return (f"INSERT INTO startup_milestones (startup_id, stage, planned_date) SELECT {ref}.id, t.key, date(t.value) "
+            f"FROM {source}json_each({ref}.stage_timeline) AS t WHERE t.type = 'text' AND date(t.value) IS NOT NULL")
+
+def create_milestone_triggers(conn):
+    """Триггеры startup_milestones (IF NOT EXISTS - можно вызывать повторно)."""
+    triggers = {
+        "startups_milestones_ai": f"AFTER INSERT ON startups BEGIN {_insert_milestones_sql('new')}; END",
+        "startups_milestones_au": f"AFTER UPDATE OF stage_timeline ON startups BEGIN "
+                                  f"DELETE FROM startup_milestones WHERE startup_id = old.id; {_insert_milestones_sql('new')}; END",
+        "startups_milestones_ad": "AFTER DELETE ON startups BEGIN DELETE FROM startup_milestones WHERE startup_id = old.id; END",
+    }
+    for name, body in triggers.items(): conn.exec_driver_sql(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+
+def milestone_filter(args):
+    """?milestone_stage=&milestone_from=&milestone_to= (to - не включая) -> (условие на Startup.id или None, ошибка).
+    Без этапа - любая плановая дата в диапазоне."""
+    stage, date_from, date_to = (args.get(name) for name in ('milestone_stage', 'milestone_from', 'milestone_to'))
+    if not (stage or date_from or date_to): return None, None
+    if stage and stage not in ALLOWED_STAGES: return None, f"milestone_stage: {' | '.join(ALLOWED_STAGES)}"
+    try: date_from, date_to = (date.fromisoformat(d) if d else None for d in (date_from, date_to))
+    except ValueError: return None, "milestone_from, milestone_to: YYYY-MM-DD"
+    conditions = [StartupMilestone.stage == stage] if stage else []
+    if date_from: conditions.append(StartupMilestone.planned_date >= date_from)
+    if date_to: conditions.append(StartupMilestone.planned_date < date_to)
+    return Startup.id.in_(db.session.query(StartupMilestone.startup_id).filter(*conditions)), None
+
+
 # 12. Meetups Endpoints
 def serialize_meetup(meetup: Meetup) -> dict | None:
     """Сериализует объект Meetup в словарь."""
     if not meetup: return None
-    creator = User.query.get(meetup.creator_user_id)
+    creator = meetup.creator # Для списков подгружается заранее через joinedload
     return {
         "id": meetup.id, "title": meetup.title,
         "date": meetup.date.replace(tzinfo=timezone.utc).isoformat(timespec='seconds').replace('+00:00', 'Z'),
@@ -520,58 +2165,86 @@ def serialize_meetup(meetup: Meetup) -> dict | None:
         "creator_username": creator.username if creator else "N/A"
     }
 
-@app.route("/meetups", methods=["GET"])
+MEETUP_LIST_COLUMNS = (Meetup.id, Meetup.title, raw_datetime_column(Meetup.date), Meetup.description, Meetup.link,
+                       Meetup.status, Meetup.rejection_reason, Meetup.creator_user_id,
+                       User.id.label('creator_id'), User.username.label('creator_username'))
+
+MEETUP_LIST_FIELDS = list_field_columns(MEETUP_LIST_COLUMNS, exclude=('creator_id',),
+                                        creator_username=('creator_id', 'creator_username'))
+
+def serialize_meetup_row(row) -> dict:
+    """serialize_meetup для строки MEETUP_LIST_COLUMNS."""
+    return {
+        "id": row.id, "title": row.title, "date": format_utc_timestamp(row.date),
+        "description": row.description, "link": row.link, "status": row.status,
+        "rejection_reason": row.rejection_reason, "creator_user_id": row.creator_user_id,
+        "creator_username": row.creator_username if row.creator_id is not None else "N/A"
+    }
+
+def visible_meetups_branches(user_id):
+    """Видимость для не-админа: одобренные + свои pending/rejected (непересекающиеся ветви, см. keyset_list_response)."""
+    branches = [Meetup.status == 'approved']
+    if user_id: branches.append((Meetup.creator_user_id == user_id) & (Meetup.status.in_(['pending', 'rejected'])))
+    return branches
+
+def visible_meetups_condition(user_id):
+    return or_(*visible_meetups_branches(user_id))
+
+@api.route("/meetups", methods=["GET"])
+@cached_public_feed('meetups')
 @jwt_required(optional=True)
 def get_meetups():
-    current_user = get_current_user()
-    is_admin = current_user and current_user.role == 'admin'
-    query = Meetup.query
-    if not is_admin:
-        approved_cond = (Meetup.status == 'approved')
-        if current_user:
-            own_cond = (Meetup.creator_user_id == current_user.id) & (Meetup.status.in_(['pending', 'rejected']))
-            query = query.filter(or_(approved_cond, own_cond))
-        else: query = query.filter(approved_cond)
-    meetups_list = query.order_by(desc(Meetup.date)).all()
-    return jsonify([serialize_meetup(m) for m in meetups_list])
-
-@app.route("/meetups", methods=["POST"])
+    current_user_id, current_role = get_current_identity()
+    is_admin = current_role == 'admin'
+    query = db.session.query(*MEETUP_LIST_COLUMNS).outerjoin(User, User.id == Meetup.creator_user_id)
+    if not is_admin: query = [query.filter(branch) for branch in visible_meetups_branches(current_user_id)]
+    return keyset_list_response(query, [Meetup.date, Meetup.id], serialize_meetup_row, # id - для однозначного порядка при равных датах
+                                field_columns=MEETUP_LIST_FIELDS)
+
+@api.route("/meetups/<int:meetup_id>", methods=["GET"])
+@jwt_required(optional=True)
+def get_meetup(meetup_id):
+    """Один митап целиком, с той же видимостью, что в ленте."""
+    current_user_id, current_role = get_current_identity()
+    query = db.session.query(*MEETUP_LIST_COLUMNS).outerjoin(User, User.id == Meetup.creator_user_id)\
+                      .filter(Meetup.id == meetup_id)
+    if current_role != 'admin': query = query.filter(visible_meetups_condition(current_user_id))
+    row = query.first()
+    if not row: return jsonify({"error": "Meetup?"}), 404
+    return jsonify(serialize_meetup_row(row))
+
+@api.route("/meetups", methods=["POST"])
 @jwt_required()
+@rate_limited(('write_user', jwt_user_key), ('write_ip', client_ip_key))
 def add_meetup():
     current_user = get_current_user()
     if not current_user: return jsonify({"error": "User?"}), 404
     if not current_user.telegram or not current_user.resume_link or not is_valid_url(current_user.resume_link):
         return jsonify({"error": "Заполните профиль."}), 400
 
-    data = request.json; title = data.get("title"); date_str = data.get("date")
-    description = data.get("description"); link = data.get("link")
-    if not all([title, date_str, description, link]): return jsonify({"error": "Fields?"}), 400
-    try:
-        # Принимаем ISO строку, конвертируем в UTC для хранения
-        meetup_date = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-        if meetup_date.tzinfo is None: meetup_date = meetup_date.replace(tzinfo=timezone.utc)
-        else: meetup_date = meetup_date.astimezone(timezone.utc)
-        # Проверяем, что дата не в прошлом (опционально)
-        # if meetup_date < datetime.now(timezone.utc): return jsonify({"error": "Дата в прошлом?"}), 400
-    except ValueError: return jsonify({"error": "Date format?"}), 400
-    if not is_valid_url(link): return jsonify({"error": "Link?"}), 400
-
-    new_meetup = Meetup(title=title.strip(), date=meetup_date, description=description.strip(),
-                      link=link.strip(), status='pending', creator_user_id=current_user.id)
-    try: db.session.add(new_meetup); db.session.commit(); return jsonify({"message": "Meetup pending", "meetup": serialize_meetup(new_meetup)}), 201
+    fields, error = meetup_fields(request.json or {})
+    if error: return jsonify({"error": error}), 400
+    new_meetup = Meetup(**fields, status='pending', creator_user_id=current_user.id)
+    try: db.session.add(new_meetup); bump_feed_versions('meetups'); db.session.commit(); return jsonify({"message": "Meetup pending", "meetup": serialize_meetup(new_meetup)}), 201
     except Exception as e: db.session.rollback(); print(f"Error: {e}"); return jsonify({"error": "DB Error"}), 500
 
-@app.route("/meetups/<int:meetup_id>/approve", methods=["PUT"])
+@api.route("/meetups/batch/<action>", methods=["PUT"])
+@admin_required()
+def batch_moderate_meetups(action):
+    """PUT /meetups/batch/approve | reject"""
+    return batch_moderation_response(Meetup, action)
+
+@api.route("/meetups/<int:meetup_id>/approve", methods=["PUT"])
 @admin_required()
 def approve_meetup(meetup_id):
     meetup = Meetup.query.get(meetup_id)
     if not meetup: return jsonify({"error": "Meetup?"}), 404
     if meetup.status != "pending": return jsonify({"error": "Only pending"}), 409
     meetup.status = "approved"; meetup.rejection_reason = None
-    try: db.session.commit(); return jsonify({"message": "Approved", "meetup": serialize_meetup(meetup)})
+    try: bump_feed_versions('meetups'); db.session.commit(); return jsonify({"message": "Approved", "meetup": serialize_meetup(meetup)})
     except Exception as e: db.session.rollback(); print(f"Error: {e}"); return jsonify({"error": "DB Error"}), 500
 
-@app.route("/meetups/<int:meetup_id>/reject", methods=["PUT"])
+@api.route("/meetups/<int:meetup_id>/reject", methods=["PUT"])
 @admin_required()
 def reject_meetup(meetup_id):
     meetup = Meetup.query.get(meetup_id)
@@ -580,67 +2253,130 @@ def reject_meetup(meetup_id):
     data = request.json; reason = data.get("reason")
     if not reason or not isinstance(reason, str) or not reason.strip(): return jsonify({"error": "Reason?"}), 400
     meetup.status = "rejected"; meetup.rejection_reason = reason.strip()
-    try: db.session.commit(); return jsonify({"message": "Rejected", "meetup": serialize_meetup(meetup)})
+    try: bump_feed_versions('meetups'); db.session.commit(); return jsonify({"message": "Rejected", "meetup": serialize_meetup(meetup)})
     except Exception as e: db.session.rollback(); print(f"Error: {e}"); return jsonify({"error": "DB Error"}), 500
 
 
 # 13. Vacancies Endpoints
-def serialize_vacancy(vacancy: Vacancy) -> dict | None:
-    """Сериализует объект Vacancy в словарь для JSON."""
+def serialize_vacancy(vacancy: Vacancy, applied_vacancy_ids=frozenset()) -> dict | None:
+    """Сериализует объект Vacancy в словарь для JSON.
+
+    Сами отклики не отдаются (см. GET /vacancies/<id>/applicants) - только счетчик
+    и флаг has_applied для текущего пользователя (applied_vacancy_ids).
+    """
     if not vacancy: return None
-    startup = Startup.query.get(vacancy.startup_id)
+    startup = vacancy.startup # В списке уже загружен из JOIN через contains_eager
     is_effectively_held = startup.is_held if startup else True
-    creator = User.query.get(vacancy.creator_user_id)
-    startup_creator = User.query.get(startup.creator_user_id) if startup else None
     return {
         "id": vacancy.id, "startup_id": vacancy.startup_id, "title": vacancy.title,
         "description": vacancy.description, "salary": vacancy.salary, "requirements": vacancy.requirements,
-        "applicants": vacancy.applicants or [], "status": vacancy.status,
+        "status": vacancy.status,
         "rejection_reason": vacancy.rejection_reason, "creator_user_id": vacancy.creator_user_id,
         "startup_name": startup.name if startup else "N/A",
         "startup_creator_id": startup.creator_user_id if startup else None,
-        "applicant_count": len(vacancy.applicants or []),
+        "applicant_count": vacancy.applicant_count or 0,
+        "has_applied": vacancy.id in applied_vacancy_ids,
         "is_effectively_held": is_effectively_held
     }
 
-@app.route("/vacancies", methods=["GET"])
+VACANCY_LIST_COLUMNS = (
+    Vacancy.id, Vacancy.startup_id, Vacancy.title, Vacancy.description, Vacancy.salary, Vacancy.requirements,
+    Vacancy.status, Vacancy.rejection_reason, Vacancy.creator_user_id, Vacancy.applicant_count,
+    Vacancy.startup_name, Vacancy.startup_creator_id)
+
+def vacancy_list_query(public=False):
+    """Строки для serialize_vacancy_row. Публичные (publicly_visible) - одной таблицей: их стартап
+    одобрен и не на паузе, поэтому is_effectively_held - константа; остальным нужен JOIN со Startup."""
+    if public: return db.session.query(*VACANCY_LIST_COLUMNS, false().label('startup_is_held')).filter(Vacancy.publicly_visible == True)
+    return db.session.query(*VACANCY_LIST_COLUMNS, Startup.is_held.label('startup_is_held'))\
+                     .join(Startup, Vacancy.startup_id == Startup.id)
+
+VACANCY_LIST_FIELDS = list_field_columns(VACANCY_LIST_COLUMNS, has_applied=('id',), is_effectively_held=('startup_is_held',))
+
+def serialize_vacancy_row(row, applied_vacancy_ids=frozenset()) -> dict:
+    """serialize_vacancy для строки vacancy_list_query."""
+    return {
+        "id": row.id, "startup_id": row.startup_id, "title": row.title,
+        "description": row.description, "salary": row.salary, "requirements": row.requirements,
+        "status": row.status,
+        "rejection_reason": row.rejection_reason, "creator_user_id": row.creator_user_id,
+        "startup_name": row.startup_name, "startup_creator_id": row.startup_creator_id,
+        "applicant_count": row.applicant_count or 0,
+        "has_applied": row.id in applied_vacancy_ids,
+        "is_effectively_held": row.startup_is_held
+    }
+
+def serialize_application(application: VacancyApplication) -> dict:
+    """Сериализует отклик на вакансию."""
+    return {
+        "id": application.id, "vacancy_id": application.vacancy_id, "user_id": application.user_id,
+        "telegram": application.telegram, "resume_link": application.resume_link,
+        "created_at": application.created_at.replace(tzinfo=timezone.utc).isoformat(timespec='seconds').replace('+00:00', 'Z')
+    }
+
+def own_hidden_vacancies_condition(user_id):
+    """Свои pending/rejected вакансии, если стартап не на паузе (нужен JOIN со Startup)."""
+    return (Startup.is_held == False) & (Vacancy.creator_user_id == user_id) & Vacancy.status.in_(['pending', 'rejected'])
+
+def visible_vacancies_condition(user_id):
+    """Видимость для не-админа: публичные (см. publicly_visible) + свои pending/rejected."""
+    if not user_id: return Vacancy.publicly_visible == True
+    return or_(Vacancy.publicly_visible == True, own_hidden_vacancies_condition(user_id))
+
+def get_applied_vacancy_ids(user_id):
+    """Один запрос на все вакансии, на которые откликнулся пользователь (для has_applied)."""
+    if not user_id: return frozenset()
+    return frozenset(vid for (vid,) in db.session.query(VacancyApplication.vacancy_id)
+                                                 .filter(VacancyApplication.user_id == user_id))
+
+@api.route("/vacancies", methods=["GET"])
+@cached_public_feed('vacancies')
 @jwt_required(optional=True)
 def get_vacancies():
-    current_user = get_current_user()
-    is_admin = current_user and current_user.role == 'admin'
+    current_user_id, current_role = get_current_identity()
+    is_admin = current_role == 'admin'
     filter_by_creator = request.args.get('filter_by_creator', 'false').lower() == 'true'
-    if filter_by_creator and not current_user: return jsonify(error="Auth required"), 401
+    if filter_by_creator and not current_user_id: return jsonify(error="Auth required"), 401
 
-    query = Vacancy.query.join(Startup, Vacancy.startup_id == Startup.id)
+    query = vacancy_list_query()
     if not is_admin:
-        query = query.filter(Startup.is_held == False)
-        approved_cond = (Vacancy.status == 'approved') & (Startup.status == 'approved')
-        if current_user:
-            own_cond = (Vacancy.creator_user_id == current_user.id) & Vacancy.status.in_(['pending', 'rejected'])
-            if filter_by_creator: query = query.filter(Vacancy.creator_user_id == current_user.id)
-            else: query = query.filter(or_(approved_cond, own_cond))
+        if current_user_id:
+            if filter_by_creator: query = query.filter(Startup.is_held == False, Vacancy.creator_user_id == current_user_id)
+            # Непересекающиеся ветви (см. keyset_list_response): публичные - без JOIN
+            else: query = [vacancy_list_query(public=True), query.filter(own_hidden_vacancies_condition(current_user_id))]
         else: # Аноним
              if filter_by_creator: return jsonify(error="Anon cannot filter"), 400
-             query = query.filter(approved_cond)
+             query = vacancy_list_query(public=True)
     elif filter_by_creator: # Админ с фильтром
-        query = query.filter(Vacancy.creator_user_id == current_user.id)
+        query = query.filter(Vacancy.creator_user_id == current_user_id)
     # Админ без фильтра - базовый query
 
-    vacancies_list = query.order_by(desc(Vacancy.id)).all()
-    return jsonify([serialize_vacancy(v) for v in vacancies_list])
+    applied_ids = get_applied_vacancy_ids(current_user_id)
+    return keyset_list_response(query, [Vacancy.id], lambda row: serialize_vacancy_row(row, applied_ids),
+                                field_columns=VACANCY_LIST_FIELDS)
+
+@api.route("/vacancies/<int:vacancy_id>", methods=["GET"])
+@jwt_required(optional=True)
+def get_vacancy(vacancy_id):
+    """Одна вакансия целиком (полные описание и требования), с той же видимостью, что в ленте."""
+    current_user_id, current_role = get_current_identity()
+    query = vacancy_list_query().filter(Vacancy.id == vacancy_id)
+    if current_role != 'admin': query = query.filter(visible_vacancies_condition(current_user_id))
+    row = query.first()
+    if not row: return jsonify({"error": "Vacancy?"}), 404
+    return jsonify(serialize_vacancy_row(row, get_applied_vacancy_ids(current_user_id)))
 
 
-@app.route("/vacancies", methods=["POST"])
+@api.route("/vacancies", methods=["POST"])
 @jwt_required()
+@rate_limited(('write_user', jwt_user_key), ('write_ip', client_ip_key))
 def add_vacancy():
     current_user = get_current_user()
     if not current_user: return jsonify({"error": "User?"}), 404
 
-    data = request.json; startup_id_req = data.get("startup_id"); title = data.get("title")
-    description = data.get("description"); salary = data.get("salary"); requirements = data.get("requirements")
-    if not all([startup_id_req, title, description, requirements]): return jsonify({"error": "Fields?"}), 400
-    try: startup_id = int(startup_id_req)
-    except: return jsonify({"error": "Startup ID?"}), 400
+    fields, error = vacancy_fields(request.json or {})
+    if error: return jsonify({"error": error}), 400
+    startup_id = fields["startup_id"]
 
     target_startup = Startup.query.get(startup_id)
     if not target_startup: return jsonify({"error": "Startup?"}), 404
@@ -648,15 +2384,15 @@ def add_vacancy():
     if target_startup.is_held: return jsonify({"error": "Startup held"}), 403
     if not (current_user.role == 'admin' or target_startup.creator_user_id == current_user.id): return jsonify({"error": "Rights?"}), 403
 
-    new_vacancy = Vacancy(startup_id=startup_id, title=title.strip(), description=description.strip(),
-                          salary=salary.strip() if salary else None, requirements=requirements.strip(),
-                          applicants=[], status='pending', creator_user_id=current_user.id)
-    try: db.session.add(new_vacancy); db.session.commit(); return jsonify({"message": "Vacancy pending", "vacancy": serialize_vacancy(new_vacancy)}), 201
+    new_vacancy = Vacancy(**fields, status='pending', creator_user_id=current_user.id, publicly_visible=False,
+                          startup_name=target_startup.name, startup_creator_id=target_startup.creator_user_id)
+    try: db.session.add(new_vacancy); bump_feed_versions('vacancies'); db.session.commit(); return jsonify({"message": "Vacancy pending", "vacancy": serialize_vacancy(new_vacancy)}), 201
     except Exception as e: db.session.rollback(); print(f"Error: {e}"); return jsonify({"error": "DB Error"}), 500
 
 
-@app.route("/vacancies/<int:vacancy_id>/apply", methods=["POST"])
+@api.route("/vacancies/<int:vacancy_id>/apply", methods=["POST"])
 @jwt_required()
+@rate_limited(('write_user', jwt_user_key), ('write_ip', client_ip_key))
 def apply_for_vacancy(vacancy_id):
     current_user = get_current_user()
     if not current_user: return jsonify({"error": "User?"}), 404
@@ -669,18 +2405,43 @@ def apply_for_vacancy(vacancy_id):
     if not current_user.telegram or not current_user.resume_link or not is_valid_url(current_user.resume_link):
          return jsonify({"error": "Fill profile."}), 400
 
-    current_applicants = list(vacancy.applicants or []) # Создаем копию списка
-    applicant_ids = [app.get("user_id") for app in current_applicants]
-    if current_user.id in applicant_ids: return jsonify({"message": "Already applied"}), 409
-
-    new_applicant = {"user_id": current_user.id, "telegram": current_user.telegram, "resume_link": current_user.resume_link}
-    current_applicants.append(new_applicant)
-    vacancy.applicants = current_applicants # Присваиваем измененный список
-    try: db.session.commit(); return jsonify({"message": "Applied successfully"})
+    # Дубликат ловит уникальный индекс (vacancy_id, user_id), счетчик растет в SQL -
+    # параллельные отклики не теряют друг друга и не переписывают всю строку вакансии
+    application = VacancyApplication(vacancy_id=vacancy.id, user_id=current_user.id,
+                                     telegram=current_user.telegram, resume_link=current_user.resume_link)
+    try:
+        db.session.add(application); db.session.flush()
+        Vacancy.query.filter(Vacancy.id == vacancy.id)\
+                     .update({Vacancy.applicant_count: Vacancy.applicant_count + 1}, synchronize_session=False)
+        bump_feed_versions('vacancies') # applicant_count
+        db.session.commit(); return jsonify({"message": "Applied successfully"})
+    except IntegrityError: db.session.rollback(); return jsonify({"message": "Already applied"}), 409
     except Exception as e: db.session.rollback(); print(f"Error: {e}"); return jsonify({"error": "DB Error"}), 500
 
 
-@app.route("/vacancies/<int:vacancy_id>/approve", methods=["PUT"])
+@api.route("/vacancies/<int:vacancy_id>/applicants", methods=["GET"])
+@jwt_required()
+def get_vacancy_applicants(vacancy_id):
+    """Отклики на вакансию постранично (?limit=&cursor=) - для создателя вакансии/стартапа и админа."""
+    current_user_id, current_role = get_current_identity()
+    if not current_user_id: return jsonify({"error": "User?"}), 404
+    vacancy = Vacancy.query.get(vacancy_id)
+    if not vacancy: return jsonify({"error": "Vacancy?"}), 404
+    is_owner = current_user_id in (vacancy.creator_user_id, vacancy.startup.creator_user_id if vacancy.startup else None)
+    if not (current_role == 'admin' or is_owner): return jsonify({"error": "Rights?"}), 403
+
+    query = VacancyApplication.query.filter(VacancyApplication.vacancy_id == vacancy.id)
+    return keyset_list_response(query, [VacancyApplication.id], serialize_application, legacy_array=False)
+
+
+@api.route("/vacancies/batch/<action>", methods=["PUT"])
+@admin_required()
+def batch_moderate_vacancies(action):
+    """PUT /vacancies/batch/approve | reject"""
+    return batch_moderation_response(Vacancy, action)
+
+
+@api.route("/vacancies/<int:vacancy_id>/approve", methods=["PUT"])
 @admin_required()
 def approve_vacancy(vacancy_id):
     vacancy = Vacancy.query.get(vacancy_id)
@@ -690,11 +2451,13 @@ def approve_vacancy(vacancy_id):
     if not startup or startup.status != "approved" or startup.is_held:
          return jsonify({"error": "Startup not available"}), 409
     vacancy.status = "approved"; vacancy.rejection_reason = None
-    try: db.session.commit(); return jsonify({"message": "Approved", "vacancy": serialize_vacancy(vacancy)})
+    try:
+        refresh_vacancy_visibility(Vacancy.id == vacancy.id)
+        bump_feed_versions('vacancies'); db.session.commit(); return jsonify({"message": "Approved", "vacancy": serialize_vacancy(vacancy)})
     except Exception as e: db.session.rollback(); print(f"Error: {e}"); return jsonify({"error": "DB Error"}), 500
 
 
-@app.route("/vacancies/<int:vacancy_id>/reject", methods=["PUT"])
+@api.route("/vacancies/<int:vacancy_id>/reject", methods=["PUT"])
 @admin_required()
 def reject_vacancy(vacancy_id):
     vacancy = Vacancy.query.get(vacancy_id)
@@ -703,14 +2466,16 @@ def reject_vacancy(vacancy_id):
     data = request.json; reason = data.get("reason")
     if not reason or not isinstance(reason, str) or not reason.strip(): return jsonify({"error": "Reason?"}), 400
     vacancy.status = "rejected"; vacancy.rejection_reason = reason.strip()
-    try: db.session.commit(); return jsonify({"message": "Rejected", "vacancy": serialize_vacancy(vacancy)})
+    try:
+        refresh_vacancy_visibility(Vacancy.id == vacancy.id)
+        bump_feed_versions('vacancies'); db.session.commit(); return jsonify({"message": "Rejected", "vacancy": serialize_vacancy(vacancy)})
     except Exception as e: db.session.rollback(); print(f"Error: {e}"); return jsonify({"error": "DB Error"}), 500
 
 # Внутри файла main.py
 
 # ... (другие эндпоинты для вакансий) ...
 
-@app.route("/vacancies/<int:vacancy_id>", methods=["DELETE"]) # Новый эндпоинт
+@api.route("/vacancies/<int:vacancy_id>", methods=["DELETE"]) # Новый эндпоинт
 @jwt_required() # Требуем аутентификацию
 def delete_vacancy(vacancy_id):
     current_user = get_current_user()
@@ -735,6 +2500,7 @@ def delete_vacancy(vacancy_id):
     try:
         # Права есть, удаляем вакансию
         db.session.delete(vacancy)
+        bump_feed_versions('vacancies')
         db.session.commit()
         print(f"Vacancy {vacancy_id} deleted by user {current_user.id} (Admin: {is_admin}, Owner: {is_owner}).")
         return jsonify({"message": "Вакансия успешно удалена"}), 200 # Или 204 No Content
@@ -748,35 +2514,946 @@ def delete_vacancy(vacancy_id):
 
 
 
-# --- Инициализация БД и создание админа ---
-def init_database():
-    """Создает файл БД, таблицы и админа, если их нет."""
-    if not os.path.exists(db_path):
-        print(f"Database not found at {db_path}, creating...")
+# 14. Полнотекстовый поиск (SQLite FTS5)
+# На каждую сущность - своя FTS5-таблица, rowid = id исходной строки. Индекс обновляют
+# триггеры SQLite, так что он в синхроне при любых INSERT/UPDATE/DELETE, в т.ч. массовых.
+# unicode61 приводит регистр кириллицы, но не склеивает Ё и Е - поэтому Ё заменяется на Е
+# и в индексе, и в запросе (в сниппетах тоже будет "е").
+SEARCH_INDEXES = {
+    # тип: (модель, FTS-таблица, индексируемые колонки, веса колонок для bm25)
+    'startup': (Startup, 'startups_fts', ('name', 'description'), (10.0, 1.0)),
+    'vacancy': (Vacancy, 'vacancies_fts', ('title', 'description', 'requirements', 'salary'), (10.0, 1.0, 2.0, 1.0)),
+    'meetup': (Meetup, 'meetups_fts', ('title', 'description'), (10.0, 1.0)),
+}
+SEARCH_TOKENIZER = "unicode61 remove_diacritics 2"
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_TERMS = 10
+# snippet() ставит вокруг совпадений управляющие символы, а не теги: текст пользователя
+# экранируется целиком, и только потом они становятся <mark> (см. highlight_snippet)
+SNIPPET_OPEN, SNIPPET_CLOSE = '\x02', '\x03'
+# Частые окончания: "стартапы", "стартапа", "стартапов" -> префикс "стартап*"
+RUSSIAN_ENDINGS = sorted(['иями', 'ями', 'ами', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими', 'ией', 'ах', 'ях', 'ам', 'ям',
+                          'ов', 'ев', 'ом', 'ем', 'ой', 'ей', 'ий', 'ый', 'ая', 'яя', 'ое', 'ее', 'ые', 'ие', 'ых', 'их',
+                          'ую', 'юю', 'ия', 'а', 'я', 'ы', 'и', 'о', 'е', 'у', 'ю', 'ь', 'й'], key=len, reverse=True)
+_search_word_re = re.compile(r'\w+')
+_cyrillic_re = re.compile(r'[а-я]')
+
+def _fold_sql(expr):
+    return f"replace(replace({expr}, 'ё', 'е'), 'Ё', 'Е')"
+
+def create_search_indexes(conn):
+    """Создает FTS5-таблицы и триггеры синхронизации (идемпотентно)."""
+    for model, fts, columns, _ in SEARCH_INDEXES.values():
+        base, cols = model.__tablename__, ', '.join(columns)
+        new_values = ', '.join(_fold_sql(f'new.{c}') for c in columns)
+        set_clause = ', '.join(f"{c} = {_fold_sql(f'new.{c}')}" for c in columns)
+        conn.exec_driver_sql(f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({cols}, tokenize='{SEARCH_TOKENIZER}')")
+        conn.exec_driver_sql(f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {base} BEGIN "
+                             f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values}); END")
+        conn.exec_driver_sql(f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {base} BEGIN "
+                             f"DELETE FROM {fts} WHERE rowid = old.id; END")
+        conn.exec_driver_sql(f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {base} BEGIN "
+                             f"UPDATE {fts} SET {set_clause} WHERE rowid = new.id; END")
+
+def rebuild_search_indexes(conn):
+    """Полностью перестраивает индексы из исходных таблиц (для БД, где строки появились до FTS)."""
+    for model, fts, columns, _ in SEARCH_INDEXES.values():
+        cols = ', '.join(columns)
+        conn.exec_driver_sql(f"DELETE FROM {fts}")
+        conn.exec_driver_sql(f"INSERT INTO {fts}(rowid, {cols}) "
+                             f"SELECT id, {', '.join(_fold_sql(c) for c in columns)} FROM {model.__tablename__}")
+        conn.exec_driver_sql(f"INSERT INTO {fts}({fts}) VALUES ('optimize')")
+
+def build_match_query(text):
+    """Строка пользователя -> выражение FTS5 MATCH: все слова обязательны, каждое ищется как префикс."""
+    terms = []
+    for word in _search_word_re.findall(text.lower().replace('ё', 'е'))[:SEARCH_MAX_TERMS]:
+        if _cyrillic_re.search(word):
+            for ending in RUSSIAN_ENDINGS:
+                if word.endswith(ending) and len(word) - len(ending) >= 4:
+                    word = word[:-len(ending)]; break
+        terms.append(f'"{word}"*') # В кавычках - без операторов FTS5 от пользователя
+    return ' '.join(terms)
+
+def highlight_snippet(text):
+    """Фрагмент snippet() -> HTML: текст экранирован, совпадения - в <mark>."""
+    if text is None: return None
+    return html.escape(text).replace(SNIPPET_OPEN, '<mark>').replace(SNIPPET_CLOSE, '</mark>')
+
+@api.route("/search", methods=["GET"])
+@jwt_required(optional=True)
+def search():
+    """GET /search?q=...&type=startup|vacancy|meetup[&limit=&cursor=]
+
+    Результаты по релевантности (bm25), с подсветкой (экранированный HTML с <mark>) и теми же правилами
+    видимости, что в лентах. Курсор - (оценка, id) последнего результата.
+    """
+    search_type = request.args.get('type', '')
+    if search_type not in SEARCH_INDEXES: return jsonify(error="type: startup | vacancy | meetup"), 400
+    match_query = build_match_query(request.args.get('q', ''))
+    if not match_query: return jsonify(error="Пустой запрос"), 400
+    limit = max(1, min(request.args.get('limit', SEARCH_DEFAULT_LIMIT, type=int), MAX_PAGE_LIMIT))
+
+    current_user_id, current_role = get_current_identity()
+    is_admin = current_role == 'admin'
+    model, fts, _, weights = SEARCH_INDEXES[search_type]
+    fts_table = sql_table(fts, sql_column('rowid'))
+    score = func.bm25(literal_column(fts), *weights)
+    snippet = func.snippet(literal_column(fts), -1, SNIPPET_OPEN, SNIPPET_CLOSE, '…', 12)
+    query = db.session.query(model, score.label('score'), snippet.label('snippet')).select_from(model)\
+                      .join(fts_table, fts_table.c.rowid == model.id)\
+                      .filter(literal_column(fts).op('MATCH')(match_query))
+
+    applied_ids = frozenset()
+    if search_type == 'startup':
+        if not is_admin: query = query.filter(visible_startups_condition(current_user_id))
+        query, serializer = query.options(joinedload(Startup.creator)), serialize_startup
+    elif search_type == 'vacancy':
+        query = query.join(Startup, Vacancy.startup_id == Startup.id)
+        if not is_admin: query = query.filter(visible_vacancies_condition(current_user_id))
+        applied_ids = get_applied_vacancy_ids(current_user_id)
+        query, serializer = query.options(contains_eager(Vacancy.startup)), lambda v: serialize_vacancy(v, applied_ids)
+    else:
+        if not is_admin: query = query.filter(visible_meetups_condition(current_user_id))
+        query, serializer = query.options(joinedload(Meetup.creator)), serialize_meetup
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            last_score, last_id = decode_raw_cursor(cursor, 2)
+            last_score, last_id = float(last_score), int(last_id)
+        except (TypeError, ValueError): return jsonify(error="Некорректный курсор"), 400
+        query = query.filter(or_(score > last_score, and_(score == last_score, model.id > last_id)))
+
+    rows = query.order_by(score, model.id).limit(limit + 1).all() # bm25: чем меньше, тем релевантнее
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1].score, rows[-1][0].id])
+    items = [{"type": search_type, "rank": row.score, "snippet": highlight_snippet(row.snippet), search_type: serializer(row[0])}
+             for row in rows]
+    return jsonify(items=items, next_cursor=next_cursor)
+
+
+# 15. Выгрузка данных (админ)
+# Поток строк по возрастанию id: выборка пачками по EXPORT_BATCH_SIZE (yield_per), каждая
+# пачка сразу уходит клиенту - память не зависит от размера таблицы. JSON-колонки и время
+# выводятся так же, как в списках (RawJSON, ISO с 'Z'); в CSV JSON-колонка - ее JSON-текст.
+EXPORT_BATCH_SIZE = 1000
+EXPORT_FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+EXPORT_ENTITIES = { # сущность -> (модель, колонки); пароль и token_version не выгружаются
+    'users': (User, (User.id, User.username, User.role, User.full_name, User.telegram, User.resume_link, User.created_at)),
+    'startups': (Startup, (Startup.id, Startup.name, Startup.description, Startup.funds_raised, Startup.opensea_link,
+                           Startup.status, Startup.rejection_reason, Startup.creator_user_id, Startup.current_stage,
+                           Startup.stage_timeline, Startup.is_held, Startup.created_at)),
+    'vacancies': (Vacancy, (Vacancy.id, Vacancy.startup_id, Vacancy.title, Vacancy.description, Vacancy.salary,
+                            Vacancy.requirements, Vacancy.applicant_count, Vacancy.status, Vacancy.rejection_reason,
+                            Vacancy.creator_user_id, Vacancy.created_at)),
+    'applications': (VacancyApplication, (VacancyApplication.id, VacancyApplication.vacancy_id, VacancyApplication.user_id,
+                                          VacancyApplication.telegram, VacancyApplication.resume_link,
+                                          VacancyApplication.created_at)),
+}
+
+def parse_export_datetime(value):
+    """ISO-дата или время (с 'Z'/смещением или без - тогда UTC) -> naive UTC, как хранится в БД."""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return parsed.astimezone(timezone.utc).replace(tzinfo=None) if parsed.tzinfo else parsed
+
+def export_query(entity, status=None, date_from=None, date_to=None):
+    """-> (select, виды колонок: 'json' | 'time' | None); ValueError при неизвестной сущности/фильтре."""
+    if entity not in EXPORT_ENTITIES: raise ValueError(f"Сущность: {', '.join(EXPORT_ENTITIES)}")
+    model, columns = EXPORT_ENTITIES[entity]
+    selected, kinds = [], []
+    for column in columns: # JSON и время - текстом из БД, без разбора (см. 8.5)
+        if isinstance(column.type, db.JSON): selected.append(raw_json_column(column)); kinds.append('json')
+        elif isinstance(column.type, db.DateTime): selected.append(raw_datetime_column(column)); kinds.append('time')
+        else: selected.append(column); kinds.append(None)
+    query = db.select(*selected).order_by(model.id)
+    if status:
+        if not hasattr(model, 'status'): raise ValueError(f"У {entity} нет статуса")
+        if status not in ('pending', 'approved', 'rejected'): raise ValueError("status: pending | approved | rejected")
+        query = query.where(model.status == status)
+    try:
+        if date_from: query = query.where(model.created_at >= parse_export_datetime(date_from))
+        if date_to: query = query.where(model.created_at < parse_export_datetime(date_to))
+    except ValueError: raise ValueError("from/to - ISO-дата, например 2024-01-31")
+    return query, kinds
+
+def iter_export(query, kinds, fmt):
+    """Куски NDJSON/CSV, по одному на пачку строк."""
+    result = db.session.execute(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    keys = list(result.keys())
+    def convert(value, kind):
+        if value is None or kind is None: return value
+        if kind == 'time': return format_utc_timestamp(value)
+        if value == 'null': return None
+        return RawJSON(value) if fmt == 'ndjson' else value # В CSV - сам JSON-текст
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(keys)
+        for rows in result.partitions():
+            writer.writerows([convert(v, kind) for v, kind in zip(row, kinds)] for row in rows)
+            yield buffer.getvalue(); buffer.seek(0); buffer.truncate()
+        yield buffer.getvalue() # Заголовок пустой выгрузки
+    else:
+        for rows in result.partitions():
+            yield "".join(current_app.json.dumps({k: convert(v, kind) for k, v, kind in zip(keys, row, kinds)},
+                                          separators=(",", ":")) + "\n" for row in rows)
+
+@api.route("/admin/export/<entity>", methods=["GET"])
+@admin_required()
+def export_entity(entity):
+    """GET /admin/export/<users|startups|vacancies|applications>?format=ndjson|csv&status=&from=&to= (to - не включительно)."""
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in EXPORT_FORMATS: return jsonify(error="format: ndjson | csv"), 400
+    try: query, kinds = export_query(entity, request.args.get('status'), request.args.get('from'), request.args.get('to'))
+    except ValueError as e: return jsonify(error=str(e)), 400
+    filename = f"{entity}-{datetime.utcnow():%Y%m%d-%H%M%S}.{fmt}"
+    print(f"Export {entity} ({fmt}) started")
+    return Response(stream_with_context(iter_export(query, kinds, fmt)), mimetype=EXPORT_FORMATS[fmt],
+                    headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+
+# 15.1 Массовый импорт (админ)
+# Файл читается потоком; каждая строка проверяется теми же правилами, что POST /startups,
+# /vacancies и /meetups (startup_fields, vacancy_fields, meetup_fields). Верные строки копятся
+# по IMPORT_CHUNK_SIZE и вставляются одним executemany в своей транзакции (вместе с проверкой
+# ссылок на стартапы/пользователей и версиями лент) - блокировка записи держится только на
+# время вставки пачки. Ошибка строки попадает в отчет и не мешает остальным.
+IMPORT_CHUNK_SIZE = 2000
+IMPORT_MAX_ERRORS = 1000 # Столько ошибок в отчете; error_count - все
+IMPORT_ENTITIES = { # сущность -> (модель, проверка полей, ленты)
+    'startups': (Startup, startup_fields, ('startups', 'vacancies')),
+    'vacancies': (Vacancy, vacancy_fields, ('vacancies',)),
+    'meetups': (Meetup, meetup_fields, ('meetups',)),
+}
+
+def iter_import_rows(stream, fmt):
+    """(номер строки файла, dict | None, ошибка | None) из текстового потока NDJSON/CSV."""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader: yield reader.line_num, row, None
+        return
+    for number, line in enumerate(stream, start=1):
+        if not line.strip(): continue
+        try: row = json.loads(line)
+        except ValueError: yield number, None, "Некорректный JSON"; continue
+        if not isinstance(row, dict): yield number, None, "Ожидается JSON-объект"; continue
+        yield number, row, None
+
+def check_import_references(entity, chunk, errors):
+    """Проверки пачки, которым нужна БД (в транзакции вставки); -> строки, прошедшие проверку."""
+    creator_ids = {fields["creator_user_id"] for _, fields in chunk}
+    known_users = {r[0] for r in db.session.query(User.id).filter(User.id.in_(creator_ids))}
+    startups = {}
+    if entity == 'vacancies':
+        startup_ids = {fields["startup_id"] for _, fields in chunk}
+        startups = {r.id: r for r in db.session.query(Startup.id, Startup.name, Startup.status, Startup.is_held,
+                                                      Startup.creator_user_id).filter(Startup.id.in_(startup_ids))}
+        admin_ids = {r[0] for r in db.session.query(User.id).filter(User.id.in_(creator_ids), User.role == 'admin')}
+    valid = []
+    for line, fields in chunk:
+        error = None if fields["creator_user_id"] in known_users else "Creator?"
+        if not error and entity == 'vacancies': # Как в add_vacancy
+            startup = startups.get(fields["startup_id"])
+            if not startup: error = "Startup?"
+            elif startup.status != "approved": error = "Only approved"
+            elif startup.is_held: error = "Startup held"
+            elif not (fields["creator_user_id"] in admin_ids or startup.creator_user_id == fields["creator_user_id"]): error = "Rights?"
+            else: # Стартап одобрен и не на паузе - видимость зависит только от статуса вакансии (см. 8.6)
+                fields.update(startup_name=startup.name, startup_creator_id=startup.creator_user_id,
+                              publicly_visible=fields["status"] == 'approved')
+        if error: errors(line, error)
+        else: valid.append(fields)
+    return valid
+
+def run_import(entity, stream, fmt, creator_id, dry_run=False, approve=False):
+    """Импорт строк из текстового потока -> отчет. creator_id - создатель по умолчанию
+    (строка может указать свой creator_user_id); approve - сразу 'approved' вместо 'pending'."""
+    model, validate, feeds = IMPORT_ENTITIES[entity]
+    report = {"entity": entity, "format": fmt, "dry_run": dry_run, "rows": 0, "valid": 0, "inserted": 0,
+              "error_count": 0, "errors": []}
+    def errors(line, error):
+        report["error_count"] += 1
+        if len(report["errors"]) < IMPORT_MAX_ERRORS: report["errors"].append({"line": line, "error": error})
+
+    def flush(chunk):
+        if not chunk: return
         try:
-            with app.app_context():
-                db.create_all()
-                print("Tables created.")
-                admin_username = "admin"
-                # ВАЖНО: Используйте безопасный пароль или переменные окружения!
-                admin_password = os.environ.get("ADMIN_PASSWORD", "verysecretadminpassword")
-                if not User.query.filter_by(username=admin_username).first():
-                    admin_pass_hash = generate_password_hash(admin_password)
-                    admin_user = User(username=admin_username, password_hash=admin_pass_hash, role="admin", full_name="Администратор")
-                    db.session.add(admin_user)
-                    db.session.commit()
-                    print(f"--- Admin user '{admin_username}' created. ---")
-                else:
-                    print(f"--- Admin user '{admin_username}' already exists. ---")
+            with write_transaction(not dry_run): # Проверка ссылок и вставка - в одной транзакции записи
+                rows = check_import_references(entity, chunk, errors)
+                report["valid"] += len(rows)
+                if dry_run or not rows: db.session.rollback(); return
+                db.session.execute(model.__table__.insert(), rows)
+                bump_feed_versions(*feeds); db.session.commit()
+            report["inserted"] += len(rows)
         except Exception as e:
-             db.session.rollback()
-             print(f"--- FATAL: Failed to initialize database or create admin: {e} ---")
-             # В реальном приложении здесь может быть выход или более сложная обработка
+            db.session.rollback(); print(f"Import {entity} chunk error: {e}")
+            for line, _ in chunk: errors(line, "DB Error")
+
+    chunk, line = [], 0
+    try:
+        for line, row, error in iter_import_rows(stream, fmt):
+            report["rows"] += 1
+            if not error: fields, error = validate(row)
+            if not error:
+                creator = row.get("creator_user_id") or creator_id
+                try: fields.update(creator_user_id=int(creator), status='approved' if approve else 'pending')
+                except (TypeError, ValueError): error = "Creator?"
+            if error: errors(line, error); continue
+            chunk.append((line, fields))
+            if len(chunk) >= IMPORT_CHUNK_SIZE: flush(chunk); chunk = []
+    except (UnicodeDecodeError, csv.Error) as e: # Дальше файл не читается; пачки до этого места уже вставлены
+        errors(line + 1, "Файл не в UTF-8" if isinstance(e, UnicodeDecodeError) else f"CSV: {e}")
+    flush(chunk)
+    report["errors"].sort(key=lambda e: e["line"]) # Ошибки ссылок приходят при вставке пачки
+    print(f"Import {entity}: {report['inserted']} inserted, {report['error_count']} errors" + (" (dry run)" if dry_run else ""))
+    return report
+
+@api.route("/admin/import/<entity>", methods=["POST"])
+@admin_required()
+def import_entity(entity):
+    """POST /admin/import/<startups|vacancies|meetups>?format=ndjson|csv&dry_run=1&approve=1
+
+    Тело - сам файл (или multipart с полем file). Создатель - текущий админ, если в строке нет creator_user_id.
+    """
+    if entity not in IMPORT_ENTITIES: return jsonify(error=f"Сущность: {', '.join(IMPORT_ENTITIES)}"), 404
+    upload = request.files.get('file')
+    mimetype = upload.mimetype if upload else request.mimetype
+    fmt = request.args.get('format') or ('csv' if mimetype == 'text/csv' else 'ndjson')
+    if fmt not in EXPORT_FORMATS: return jsonify(error="format: ndjson | csv"), 400
+    flag = lambda name: request.args.get(name, '').lower() in ('1', 'true', 'yes')
+    admin_id, _ = get_current_identity()
+    db.session.rollback() # Не держим транзакцию (и блокировку записи), пока читаем тело запроса
+    stream = io.TextIOWrapper(upload.stream if upload else request.stream, encoding='utf-8-sig', newline='')
+    return jsonify(run_import(entity, stream, fmt, admin_id, dry_run=flag('dry_run'), approve=flag('approve')))
+
+
+# 16. Дельта-синхронизация (GET /sync)
+# Каждая вставка/изменение строки ленты получает следующий номер из sync_sequence
+# (change_seq) и updated_at, удаление оставляет надгробие в sync_tombstones с таким же
+# номером. Номера ставят триггеры SQLite - так они есть при любой записи, в т.ч. массовых
+# UPDATE и executemany. Писатели в SQLite идут по одному, поэтому порядок номеров совпадает
+# с порядком коммитов, и клиент с token = N получает все, что закоммичено после N.
+# Надгробия хранятся SYNC_TOMBSTONE_RETENTION_DAYS (prune_sync_tombstones); token старше
+# удаленных получает 410 - клиент загружает списки заново.
+SYNC_DEFAULT_LIMIT = 200
+SYNC_MAX_LIMIT = 1000
+SYNC_PRUNE_INTERVAL_SECONDS = 3600
+SYNC_ENTITIES = { # сущность -> (модель, колонка получателя: строки видны только ему)
+    'startups': (Startup, None), 'vacancies': (Vacancy, None), 'meetups': (Meetup, None),
+    'notifications': (Notification, 'user_id'),
+}
+SYNC_NOW = "strftime('%Y-%m-%d %H:%M:%f000', 'now')" # Формат DateTime SQLAlchemy (микросекунды)
+
+def create_sync_triggers(conn):
+    """Триггеры change_seq/updated_at и надгробий (IF NOT EXISTS - можно вызывать повторно)."""
+    conn.exec_driver_sql("INSERT OR IGNORE INTO sync_sequence (id, value) VALUES (1, 0)")
+    next_seq = "UPDATE sync_sequence SET value = value + 1 WHERE id = 1; "
+    current_seq = "(SELECT value FROM sync_sequence WHERE id = 1)"
+    for entity, (model, owner_column) in SYNC_ENTITIES.items():
+        table = model.__tablename__
+        stamp = f"UPDATE {table} SET change_seq = {current_seq}, updated_at = {SYNC_NOW} WHERE id = new.id; "
+        owner = f"old.{owner_column}" if owner_column else "NULL"
+        conn.exec_driver_sql(f"CREATE TRIGGER IF NOT EXISTS {table}_sync_ai AFTER INSERT ON {table} BEGIN {next_seq}{stamp}END")
+        # WHEN: собственный UPDATE триггера (меняет change_seq) не порождает новый номер
+        conn.exec_driver_sql(f"CREATE TRIGGER IF NOT EXISTS {table}_sync_au AFTER UPDATE ON {table} "
+                             f"WHEN new.change_seq = old.change_seq BEGIN {next_seq}{stamp}END")
+        conn.exec_driver_sql(f"CREATE TRIGGER IF NOT EXISTS {table}_sync_ad AFTER DELETE ON {table} BEGIN {next_seq}"
+                             f"INSERT INTO sync_tombstones (seq, entity, entity_id, owner_id, deleted_at) "
+                             f"VALUES ({current_seq}, '{entity}', old.id, {owner}, {SYNC_NOW}); END")
+    # В представлении вакансии - поля стартапа, у стартапа и митапа - контакты создателя:
+    # их изменение - тоже изменение этих строк ("SET change_seq = change_seq" запускает _sync_au)
+    conn.exec_driver_sql("CREATE TRIGGER IF NOT EXISTS startups_sync_touch AFTER UPDATE OF name, status, is_held ON startups "
+                         "BEGIN UPDATE vacancies SET change_seq = change_seq WHERE startup_id = new.id; END")
+    conn.exec_driver_sql("CREATE TRIGGER IF NOT EXISTS users_sync_touch AFTER UPDATE OF username, telegram, resume_link ON users "
+                         "BEGIN UPDATE startups SET change_seq = change_seq WHERE creator_user_id = new.id; "
+                         "UPDATE meetups SET change_seq = change_seq WHERE creator_user_id = new.id; END")
+
+def sync_entity_query(entity, user_id, is_admin):
+    """-> (запрос строк списка + change_seq + visible для вызывающего, сериализатор строки)."""
+    if entity == 'startups':
+        visible = true() if is_admin else visible_startups_condition(user_id)
+        query = db.session.query(*STARTUP_LIST_COLUMNS, Startup.change_seq, visible.label('visible'))\
+                          .outerjoin(User, User.id == Startup.creator_user_id)
+        return query, serialize_startup_row
+    if entity == 'vacancies':
+        visible = true() if is_admin else visible_vacancies_condition(user_id)
+        applied_ids = [] # has_applied - одним запросом, и только если вакансии изменились
+        def serializer(row):
+            if not applied_ids: applied_ids.append(get_applied_vacancy_ids(user_id))
+            return serialize_vacancy_row(row, applied_ids[0])
+        return vacancy_list_query().add_columns(Vacancy.change_seq, visible.label('visible')), serializer
+    if entity == 'meetups':
+        visible = true() if is_admin else visible_meetups_condition(user_id)
+        query = db.session.query(*MEETUP_LIST_COLUMNS, Meetup.change_seq, visible.label('visible'))\
+                          .outerjoin(User, User.id == Meetup.creator_user_id)
+        return query, serialize_meetup_row
+    query = db.session.query(*NOTIFICATION_LIST_COLUMNS, Notification.change_seq, true().label('visible'))\
+                      .filter(Notification.user_id == user_id)
+    return query, serialize_notification_row
+
+@api.route("/sync", methods=["GET"])
+@jwt_required(optional=True)
+def sync_changes():
+    """GET /sync?since=<token>[&limit=] - что изменилось в лентах (и уведомлениях) после token.
+
+    Без since - только текущий token: его берут до первой загрузки списков. Ответ:
+    {"token", "more", "<сущность>": {"upserted": [...], "removed": [id, ...]}} - только сущности
+    с изменениями; removed - удаленные и ставшие невидимыми вызывающему. Применять сначала
+    removed, потом upserted; при more=true сразу запросить снова с новым token.
+    token старше SYNC_TOMBSTONE_RETENTION_DAYS - 410 {"resync": true, "token"}: загрузить списки
+    заново и продолжать с этого token.
+    """
+    current_user_id, current_role = get_current_identity()
+    latest, pruned_through = db.session.query(SyncSequence.value, SyncSequence.pruned_through)\
+                                       .filter(SyncSequence.id == 1).first() or (0, 0)
+    since = request.args.get('since')
+    if not since: return jsonify(token=encode_cursor([latest]), more=False)
+    try: since = int(decode_raw_cursor(since, 1)[0])
+    except (TypeError, ValueError): return jsonify(error="Некорректный token"), 400
+    if since < pruned_through: # Удаления после since уже забыты - дельту не собрать
+        return jsonify(error="Token устарел: загрузите списки заново", resync=True, token=encode_cursor([latest])), 410
+    limit = max(1, min(request.args.get('limit', SYNC_DEFAULT_LIMIT, type=int), SYNC_MAX_LIMIT))
+
+    changes = [] # (номер, сущность, id, строка | None - удалить у клиента)
+    for entity, (model, owner_column) in SYNC_ENTITIES.items():
+        if owner_column and not current_user_id: continue
+        query, serializer = sync_entity_query(entity, current_user_id, current_role == 'admin')
+        for row in query.filter(model.change_seq > since).order_by(model.change_seq).limit(limit + 1):
+            changes.append((row.change_seq, entity, row.id, serializer(row) if row.visible else None))
+    tombstones = db.session.query(SyncTombstone.seq, SyncTombstone.entity, SyncTombstone.entity_id)\
+                           .filter(SyncTombstone.seq > since,
+                                   or_(SyncTombstone.owner_id.is_(None), SyncTombstone.owner_id == current_user_id))
+    changes += [(t.seq, t.entity, t.entity_id, None) for t in tombstones.order_by(SyncTombstone.seq).limit(limit + 1)]
+
+    # Первые limit номеров по всем сущностям: все, что <= нового token, отдано
+    changes.sort(key=lambda change: change[0])
+    more = len(changes) > limit
+    changes = changes[:limit]
+    response = {"token": encode_cursor([changes[-1][0] if more else latest]), "more": more}
+    for _, entity, item_id, item in changes:
+        group = response.setdefault(entity, {"upserted": [], "removed": []})
+        if item is None: group["removed"].append(item_id)
+        else: group["upserted"].append(item)
+    return jsonify(response)
+
+@write_transaction()
+def prune_sync_tombstones():
+    """Удаляет надгробия старше SYNC_TOMBSTONE_RETENTION_DAYS и поднимает pruned_through до последнего
+    удаленного номера. Надгробия идут по seq в порядке удаления, поэтому старые - в начале. -> сколько удалено."""
+    cutoff = datetime.utcnow() - timedelta(days=current_app.config["SYNC_TOMBSTONE_RETENTION_DAYS"])
+    first_kept = db.session.query(SyncTombstone.seq).filter(SyncTombstone.deleted_at >= cutoff)\
+                           .order_by(SyncTombstone.seq).limit(1).scalar()
+    expired = SyncTombstone.query.filter(SyncTombstone.seq < first_kept) if first_kept else SyncTombstone.query
+    horizon = expired.with_entities(func.max(SyncTombstone.seq)).scalar()
+    if horizon is None: db.session.rollback(); return 0
+    deleted = expired.delete(synchronize_session=False)
+    SyncSequence.query.filter(SyncSequence.id == 1, SyncSequence.pruned_through < horizon)\
+                      .update({SyncSequence.pruned_through: horizon}, synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+_sync_pruner = {} # 'thread' -> поток чистки; см. start_sync_pruner
+
+def _prune_sync_tombstones_periodically(app):
+    with app.app_context():
+        while True:
+            try: prune_sync_tombstones()
+            except Exception as e: db.session.rollback(); print(f"Sync tombstone pruning error: {e}")
+            db.session.remove()
+            time.sleep(SYNC_PRUNE_INTERVAL_SECONDS)
+
+def start_sync_pruner():
+    """Фоновая чистка надгробий /sync раз в SYNC_PRUNE_INTERVAL_SECONDS (вызывает post_worker_init)."""
+    thread = threading.Thread(target=_prune_sync_tombstones_periodically, args=(current_app._get_current_object(),),
+                              name='sync-pruner', daemon=True)
+    if _sync_pruner.setdefault('thread', thread) is thread: thread.start()
+
+
+# 17. Статистика (GET /stats)
+# Сводные таблицы (startup_stats, startup_activity, meetup_day_stats) ведут триггеры SQLite -
+# в той же транзакции, что и запись, которая меняет данные (средства, модерация, пауза, отклик,
+# импорт, массовые UPDATE). /stats читает десятки строк сводки, а не таблицы целиком;
+# flask --app main check-stats пересчитывает сводку с нуля и сверяет (--repair - чинит).
+STATS_TOP_STARTUPS = 10
+
+def _funds_sql(ref, currency):
+    return f"coalesce(json_extract({ref}.funds_raised, '$.{currency}'), 0)"
+
+def _startup_bucket_sql(ref, sign):
+    """Строка стартапа ref (new/old) со своими средствами и счетчиками активности - в корзину
+    startup_stats (sign '+') или из нее ('-')."""
+    activity = ", ".join(f"{c} = {c} {sign} coalesce((SELECT {c} FROM startup_activity WHERE startup_id = {ref}.id), 0)"
+                         for c in ('vacancies', 'approved_vacancies', 'applications'))
+    funds = ", ".join(f"funds_{c.lower()} = funds_{c.lower()} {sign} {_funds_sql(ref, c)}" for c in FUNDS_CURRENCIES)
+    return (f"INSERT OR IGNORE INTO startup_stats (status, current_stage, is_held) VALUES ({ref}.status, {ref}.current_stage, {ref}.is_held); "
+            f"UPDATE startup_stats SET startups = startups {sign} 1, {funds}, {activity} "
+            f"WHERE status = {ref}.status AND current_stage = {ref}.current_stage AND is_held = {ref}.is_held; ")
+
+def _activity_sql(startup_id, vacancies, approved, applications):
+    """Приращения счетчиков стартапа startup_id (SQL-выражение) - в startup_activity и в его корзину."""
+    delta = (f"vacancies = vacancies + {vacancies}, approved_vacancies = approved_vacancies + {approved}, "
+             f"applications = applications + {applications}")
+    return (f"UPDATE startup_activity SET {delta} WHERE startup_id = {startup_id}; "
+            f"UPDATE startup_stats SET {delta} WHERE (status, current_stage, is_held) = "
+            f"(SELECT status, current_stage, is_held FROM startups WHERE id = {startup_id}); ")
+
+def _vacancy_activity_sql(ref, sign):
+    applications = f"(SELECT count(*) FROM vacancy_applications WHERE vacancy_id = {ref}.id)" # При удалении ORM - уже 0
+    return _activity_sql(f"{ref}.startup_id", f"{sign}1", f"{sign}({ref}.status = 'approved')", f"{sign}{applications}")
+
+def _meetup_day_sql(ref, sign):
+    return (f"INSERT OR IGNORE INTO meetup_day_stats (status, day) VALUES ({ref}.status, date({ref}.date)); "
+            f"UPDATE meetup_day_stats SET meetups = meetups {sign} 1 WHERE status = {ref}.status AND day = date({ref}.date); ")
+
+def create_stats_triggers(conn):
+    """Триггеры сводных таблиц (IF NOT EXISTS - можно вызывать повторно)."""
+    vacancy_startup = lambda ref: f"(SELECT startup_id FROM vacancies WHERE id = {ref}.vacancy_id)"
+    triggers = {
+        "startups_stats_ai": f"AFTER INSERT ON startups BEGIN INSERT OR IGNORE INTO startup_activity (startup_id) VALUES (new.id); "
+                             f"{_startup_bucket_sql('new', '+')}END",
+        "startups_stats_au": f"AFTER UPDATE OF status, current_stage, is_held, funds_raised ON startups BEGIN "
+                             f"{_startup_bucket_sql('old', '-')}{_startup_bucket_sql('new', '+')}END",
+        "startups_stats_ad": f"AFTER DELETE ON startups BEGIN {_startup_bucket_sql('old', '-')}"
+                             f"DELETE FROM startup_activity WHERE startup_id = old.id; END",
+        "vacancies_stats_ai": f"AFTER INSERT ON vacancies BEGIN {_vacancy_activity_sql('new', '+')}END",
+        "vacancies_stats_au": f"AFTER UPDATE OF status, startup_id ON vacancies BEGIN "
+                              f"{_vacancy_activity_sql('old', '-')}{_vacancy_activity_sql('new', '+')}END",
+        "vacancies_stats_ad": f"AFTER DELETE ON vacancies BEGIN {_vacancy_activity_sql('old', '-')}END",
+        "vacancy_applications_stats_ai": f"AFTER INSERT ON vacancy_applications BEGIN {_activity_sql(vacancy_startup('new'), 0, 0, 1)}END",
+        "vacancy_applications_stats_ad": f"AFTER DELETE ON vacancy_applications BEGIN {_activity_sql(vacancy_startup('old'), 0, 0, -1)}END",
+        "meetups_stats_ai": f"AFTER INSERT ON meetups BEGIN {_meetup_day_sql('new', '+')}END",
+        "meetups_stats_au": f"AFTER UPDATE OF status, date ON meetups BEGIN {_meetup_day_sql('old', '-')}{_meetup_day_sql('new', '+')}END",
+        "meetups_stats_ad": f"AFTER DELETE ON meetups BEGIN {_meetup_day_sql('old', '-')}END",
+    }
+    for name, body in triggers.items(): conn.exec_driver_sql(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+
+# Сводка, посчитанная с нуля по исходным таблицам; колонки - в порядке колонок моделей
+STATS_ACTIVITY_SELECT = (
+    "SELECT s.id AS startup_id, "
+    "(SELECT count(*) FROM vacancies v WHERE v.startup_id = s.id) AS vacancies, "
+    "(SELECT count(*) FROM vacancies v WHERE v.startup_id = s.id AND v.status = 'approved') AS approved_vacancies, "
+    "(SELECT count(*) FROM vacancy_applications a JOIN vacancies v ON v.id = a.vacancy_id WHERE v.startup_id = s.id) AS applications "
+    "FROM startups s")
+STATS_RECOMPUTE = { # модель -> (SELECT с нуля, число ключевых колонок)
+    StartupStats: (f"WITH activity AS ({STATS_ACTIVITY_SELECT}) "
+                   "SELECT s.status, s.current_stage, s.is_held, count(*), "
+                   + "".join(f"total(json_extract(s.funds_raised, '$.{c}')), " for c in FUNDS_CURRENCIES) +
+                   "sum(a.vacancies), sum(a.approved_vacancies), sum(a.applications) "
+                   "FROM startups s JOIN activity a ON a.startup_id = s.id GROUP BY s.status, s.current_stage, s.is_held", 3),
+    StartupActivity: (STATS_ACTIVITY_SELECT, 1),
+    MeetupDayStats: ("SELECT status, date(date), count(*) FROM meetups GROUP BY status, date(date)", 2),
+}
+
+def check_stats(conn, repair=False):
+    """Сверяет сводные таблицы с пересчетом с нуля -> {таблица: [ключи разошедшихся строк]}.
+    repair - таблицы с расхождениями пересобираются в отдельной транзакции (с блокировкой записи)."""
+    drifted = {}
+    for model, (select, key_count) in STATS_RECOMPUTE.items():
+        columns = ", ".join(c.name for c in model.__table__.columns)
+        split = lambda rows: {tuple(row[:key_count]): tuple(row[key_count:]) for row in rows}
+        expected = split(conn.exec_driver_sql(select))
+        stored = split(conn.exec_driver_sql(f"SELECT {columns} FROM {model.__tablename__}"))
+        zero = (0,) * (len(model.__table__.columns) - key_count) # Обнулившиеся корзины - не расхождение
+        keys = [k for k in expected.keys() | stored.keys()
+                if not all(math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-6)
+                           for a, b in zip(stored.get(k, zero), expected.get(k, zero)))]
+        if keys: drifted[model.__tablename__] = sorted(keys, key=str)
+    if repair and drifted:
+        conn.commit() # Проверка шла в транзакции чтения; пересборка - в своей
+        with write_transaction(), conn.begin():
+            for model, (select, _) in STATS_RECOMPUTE.items():
+                if model.__tablename__ not in drifted: continue
+                columns = ", ".join(c.name for c in model.__table__.columns)
+                conn.exec_driver_sql(f"DELETE FROM {model.__tablename__}")
+                conn.exec_driver_sql(f"INSERT INTO {model.__tablename__} ({columns}) {select}")
+    return drifted
+
+def stats_funds(buckets):
+    """Сумма средств по валютам; округление - до 8 знаков (сатоши), без хвостов сложения float."""
+    return {c: round(sum((getattr(b, f"funds_{c.lower()}") for b in buckets), 0.0), 8) for c in FUNDS_CURRENCIES}
+
+@api.route("/stats", methods=["GET"])
+@jwt_required(optional=True)
+def get_stats():
+    """GET /stats[?startup_id=] - средства по валютам и этапам, стартапы по этапам, вакансии,
+    отклики, ближайшие митапы и топ стартапов по откликам (все - по публичным: одобрен и не
+    на паузе). Админу - еще разбивка стартапов по статусам. startup_id - счетчики одного стартапа."""
+    current_user_id, current_role = get_current_identity()
+    is_admin = current_role == 'admin'
+    startup_id = request.args.get('startup_id', type=int)
+    if startup_id is not None:
+        query = db.session.query(Startup.id, StartupActivity.vacancies, StartupActivity.approved_vacancies,
+                                 StartupActivity.applications)\
+                          .join(StartupActivity, StartupActivity.startup_id == Startup.id).filter(Startup.id == startup_id)
+        if not is_admin: query = query.filter(visible_startups_condition(current_user_id))
+        row = query.first()
+        if not row: return jsonify({"error": "Startup?"}), 404
+        return jsonify({"startup_id": row.id, "vacancies": row.vacancies, "approved_vacancies": row.approved_vacancies,
+                        "applications": row.applications})
+
+    buckets = StartupStats.query.all() # Десятки строк: статусы x этапы x пауза
+    public = [b for b in buckets if b.status == 'approved' and not b.is_held]
+    # Следующие дни - из сводки, сегодняшний - по времени: прошедшие сегодня митапы уже не ближайшие
+    # (диапазон в пределах суток по индексу ix_meetups_status_date)
+    now = datetime.utcnow(); tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    upcoming = db.session.query(func.coalesce(func.sum(MeetupDayStats.meetups), 0))\
+                         .filter(MeetupDayStats.status == 'approved', MeetupDayStats.day >= tomorrow.strftime('%Y-%m-%d')).scalar() + \
+               db.session.query(func.count(Meetup.id))\
+                         .filter(Meetup.status == 'approved', Meetup.date >= now, Meetup.date < tomorrow).scalar()
+    # Идем по индексу откликов по убыванию и проверяем видимость стартапа по первичному ключу (EXISTS):
+    # с JOIN планировщик начал бы с индекса статусов стартапов и сортировал бы всех одобренных
+    public_startup = exists().where(Startup.id == StartupActivity.startup_id, Startup.status == 'approved',
+                                    Startup.is_held == false())
+    startup_name = db.session.query(Startup.name).filter(Startup.id == StartupActivity.startup_id).scalar_subquery()
+    top = db.session.query(StartupActivity.startup_id, startup_name.label('name'), StartupActivity.approved_vacancies,
+                           StartupActivity.applications)\
+                    .filter(StartupActivity.applications > 0, public_startup)\
+                    .order_by(desc(StartupActivity.applications), desc(StartupActivity.startup_id)).limit(STATS_TOP_STARTUPS)
+    response = {
+        "funds": stats_funds(public),
+        "funds_by_stage": {stage: stats_funds([b for b in public if b.current_stage == stage]) for stage in ALLOWED_STAGES},
+        "startups": {"total": sum(b.startups for b in public),
+                     "by_stage": {stage: sum(b.startups for b in public if b.current_stage == stage) for stage in ALLOWED_STAGES}},
+        "vacancies": sum(b.approved_vacancies for b in public), # = publicly_visible вакансии
+        "applications": sum(b.applications for b in public),
+        "upcoming_meetups": upcoming, # Одобренные, еще не начавшиеся (UTC)
+        "top_startups": [{"id": r.startup_id, "name": r.name, "vacancies": r.approved_vacancies, "applications": r.applications}
+                         for r in top],
+    }
+    if is_admin:
+        by_status = {}
+        for b in buckets: by_status[b.status] = by_status.get(b.status, 0) + b.startups
+        response["startups"]["by_status"] = by_status
+        response["startups"]["held"] = sum(b.startups for b in buckets if b.status == 'approved' and b.is_held)
+        response["vacancies_total"] = sum(b.vacancies for b in buckets)
+    return jsonify(response)
+
+
+# --- Миграции схемы для уже существующих БД ---
+# Версия схемы хранится в PRAGMA user_version; миграция N переводит БД из версии N-1 в N.
+# Новая БД создается через create_all() сразу в последней версии.
+def _migration_add_user_token_version(conn):
+    conn.exec_driver_sql("ALTER TABLE users ADD COLUMN token_version INTEGER NOT NULL DEFAULT 0")
+
+def _migration_vacancy_applications_table(conn):
+    """Переносит отклики из JSON-колонки vacancies.applicants в таблицу vacancy_applications."""
+    VacancyApplication.__table__.create(conn, checkfirst=True)
+    conn.exec_driver_sql("ALTER TABLE vacancies ADD COLUMN applicant_count INTEGER NOT NULL DEFAULT 0")
+    rows = conn.exec_driver_sql("SELECT id, applicants, created_at FROM vacancies WHERE applicants IS NOT NULL").fetchall()
+    for vacancy_id, applicants_json, created_at in rows:
+        try: applicants = json.loads(applicants_json) if applicants_json else []
+        except ValueError: print(f"Vacancy {vacancy_id}: broken applicants JSON, skipped"); continue
+        for applicant in applicants if isinstance(applicants, list) else []:
+            if not isinstance(applicant, dict) or applicant.get("user_id") is None: continue
+            conn.exec_driver_sql(
+                "INSERT OR IGNORE INTO vacancy_applications (vacancy_id, user_id, telegram, resume_link, created_at) "
+                "VALUES (?, ?, ?, ?, ?)", # Точное время отклика не хранилось - берем время вакансии
+                (vacancy_id, applicant["user_id"], applicant.get("telegram"), applicant.get("resume_link"), created_at))
+    conn.exec_driver_sql("UPDATE vacancies SET applicant_count = "
+                         "(SELECT COUNT(*) FROM vacancy_applications a WHERE a.vacancy_id = vacancies.id)")
+    # Старую колонку не удаляем (ALTER DROP COLUMN есть не во всех SQLite), но освобождаем место
+    conn.exec_driver_sql("UPDATE vacancies SET applicants = NULL")
+
+def _migration_feed_versions_table(conn):
+    FeedVersion.__table__.create(conn, checkfirst=True)
+
+def _migration_search_indexes(conn):
+    create_search_indexes(conn)
+    rebuild_search_indexes(conn)
+
+def _migration_broadcast_jobs_table(conn):
+    BroadcastJob.__table__.create(conn, checkfirst=True)
+
+# Одиночные индексы, которые заменили составные (префикс нового индекса или бесполезны в одиночку)
+SUPERSEDED_INDEXES = ('ix_startups_status', 'ix_startups_is_held', 'ix_meetups_status', 'ix_meetups_creator_user_id',
+                      'ix_notifications_user_id', 'ix_notifications_is_read', 'ix_vacancy_applications_user_id')
+
+def create_model_indexes(conn, *names):
+    """Индексы моделей с данными именами. Поименно: у старой БД еще нет колонок более поздних миграций."""
+    for table in db.metadata.tables.values():
+        for index in table.indexes:
+            if index.name in names: index.create(conn, checkfirst=True)
+
+def _migration_composite_indexes(conn):
+    """Составные индексы под фильтры и сортировки списков (см. __table_args__ моделей)."""
+    create_model_indexes(conn, 'ix_startups_status_is_held', 'ix_meetups_status_date', 'ix_meetups_creator_user_id_date',
+                         'ix_vacancy_applications_vacancy_id', 'ix_vacancy_applications_user_id_vacancy_id',
+                         'ix_notifications_user_id_timestamp', 'ix_notifications_user_id_is_read')
+    for name in SUPERSEDED_INDEXES: conn.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+
+def _migration_vacancy_visibility_columns(conn):
+    """Денормализованные колонки вакансий (см. 8.6), заполняются из startups."""
+    conn.exec_driver_sql("ALTER TABLE vacancies ADD COLUMN publicly_visible BOOLEAN NOT NULL DEFAULT 0")
+    conn.exec_driver_sql("ALTER TABLE vacancies ADD COLUMN startup_name VARCHAR(120)")
+    conn.exec_driver_sql("ALTER TABLE vacancies ADD COLUMN startup_creator_id INTEGER")
+    conn.execute(update(Vacancy).values(vacancy_visibility_values()))
+    create_model_indexes(conn, 'ix_vacancies_publicly_visible')
+
+def _migration_sync_tracking(conn):
+    """change_seq/updated_at, sync_sequence, надгробия и триггеры для /sync. Существующие строки
+    нумеруются по порядку id (до создания триггеров), updated_at - время их создания."""
+    SyncSequence.__table__.create(conn, checkfirst=True)
+    SyncTombstone.__table__.create(conn, checkfirst=True)
+    seq = 0
+    for model, _ in SYNC_ENTITIES.values():
+        table = model.__tablename__
+        created = 'timestamp' if model is Notification else 'created_at'
+        conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN change_seq INTEGER NOT NULL DEFAULT 0")
+        conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN updated_at DATETIME")
+        conn.exec_driver_sql(f"UPDATE {table} SET change_seq = numbered.seq, updated_at = {table}.{created} FROM "
+                             f"(SELECT id, row_number() OVER (ORDER BY id) + {seq} AS seq FROM {table}) AS numbered "
+                             f"WHERE numbered.id = {table}.id")
+        seq += conn.exec_driver_sql(f"SELECT COUNT(*) FROM {table}").scalar()
+    conn.exec_driver_sql(f"INSERT OR REPLACE INTO sync_sequence (id, value) VALUES (1, {seq})")
+    create_model_indexes(conn, 'ix_startups_change_seq', 'ix_vacancies_change_seq', 'ix_meetups_change_seq',
+                         'ix_notifications_user_id_change_seq')
+    create_sync_triggers(conn)
+
+def _migration_stats_tables(conn):
+    """Сводные таблицы /stats: создаются, заполняются пересчетом с нуля, дальше их ведут триггеры."""
+    for model in STATS_RECOMPUTE: model.__table__.create(conn, checkfirst=True)
+    for model, (select, _) in STATS_RECOMPUTE.items():
+        columns = ", ".join(c.name for c in model.__table__.columns)
+        conn.exec_driver_sql(f"INSERT INTO {model.__tablename__} ({columns}) {select}")
+    create_stats_triggers(conn)
+
+def _migration_startup_milestones(conn):
+    """startup_milestones из stage_timeline: даты приводятся к YYYY-MM-DD (как их пишет PUT /timeline),
+    затем копируются в таблицу; дальше ее ведут триггеры."""
+    StartupMilestone.__table__.create(conn, checkfirst=True)
+    for startup_id, text in conn.exec_driver_sql("SELECT id, stage_timeline FROM startups WHERE stage_timeline IS NOT NULL").fetchall():
+        timeline = json.loads(text)
+        if not isinstance(timeline, dict): continue
+        normalized = {stage: normalize_iso_date(value) for stage, value in timeline.items()}
+        if normalized != timeline:
+            conn.exec_driver_sql("UPDATE startups SET stage_timeline = ? WHERE id = ?", (canonical_json_dumps(normalized), startup_id))
+    conn.exec_driver_sql(_insert_milestones_sql('s', source="startups AS s, "))
+    create_milestone_triggers(conn)
+
+def _migration_broadcast_heartbeat(conn):
+    """heartbeat_at рассылок: по нему воркеры находят задачи, прерванные перезапуском.
+    Миграция 5 создает broadcast_jobs по текущей модели - там колонка уже есть."""
+    columns = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(broadcast_jobs)")}
+    if 'heartbeat_at' not in columns:
+        conn.exec_driver_sql("ALTER TABLE broadcast_jobs ADD COLUMN heartbeat_at DATETIME")
+
+def _migration_sync_pruned_through(conn):
+    """sync_sequence.pruned_through - граница надгробий, удаленных по сроку (см. prune_sync_tombstones).
+    Миграция 9 создает sync_sequence по текущей модели - там колонка уже есть."""
+    columns = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(sync_sequence)")}
+    if 'pruned_through' not in columns:
+        conn.exec_driver_sql("ALTER TABLE sync_sequence ADD COLUMN pruned_through INTEGER NOT NULL DEFAULT 0")
+
+def _migration_canonical_json_columns(conn):
+    """Переписывает JSON-колонки стартапов в канонический вид (canonical_json_dumps) - списки отдают их текст как есть."""
+    rows = conn.exec_driver_sql("SELECT id, funds_raised, stage_timeline FROM startups").fetchall()
+    for startup_id, *values in rows:
+        canonical = [canonical_json_dumps(json.loads(v)) if v else v for v in values]
+        if canonical != values:
+            conn.exec_driver_sql("UPDATE startups SET funds_raised = ?, stage_timeline = ? WHERE id = ?", (*canonical, startup_id))
+
+SCHEMA_MIGRATIONS = [
+    _migration_add_user_token_version, # 1
+    _migration_vacancy_applications_table, # 2
+    _migration_feed_versions_table, # 3
+    _migration_search_indexes, # 4
+    _migration_broadcast_jobs_table, # 5
+    _migration_canonical_json_columns, # 6
+    _migration_composite_indexes, # 7
+    _migration_vacancy_visibility_columns, # 8
+    _migration_sync_tracking, # 9
+    _migration_stats_tables, # 10
+    _migration_startup_milestones, # 11
+    _migration_broadcast_heartbeat, # 12
+    _migration_sync_pruned_through, # 13
+]
+
+@write_transaction() # Читает user_version, затем мигрирует
+def upgrade_database():
+    """Применяет недостающие миграции (вызывать внутри app_context)."""
+    with db.engine.begin() as conn:
+        version = conn.exec_driver_sql("PRAGMA user_version").scalar()
+        for number, migration in enumerate(SCHEMA_MIGRATIONS[version:], start=version + 1):
+            migration(conn)
+            conn.exec_driver_sql(f"PRAGMA user_version = {number}")
+            print(f"Schema migrated to version {number} ({migration.__name__}).")
+
+
+# --- Инициализация БД и создание админа ---
+@write_transaction() # Проверка "админов нет" и создание админа - в одной транзакции записи
+def bootstrap_database():
+    """Создает таблицы новой БД или доводит старую миграциями, затем админа, если админов нет.
+
+    Идемпотентна: повторный запуск ничего не меняет. Вызывать внутри app_context
+    (flask --app main init-db - отдельный шаг деплоя до запуска gunicorn)."""
+    with db.engine.connect() as conn: is_new = not sql_inspect(conn).has_table(User.__tablename__)
+    if is_new:
+        print(f"Database is empty ({db.engine.url.database}), creating...")
+        db.create_all()
+        with db.engine.begin() as conn:
+            create_search_indexes(conn) # FTS5-таблицы и триггеры create_all() не создает
+            create_sync_triggers(conn)
+            create_stats_triggers(conn)
+            create_milestone_triggers(conn)
+            conn.exec_driver_sql(f"PRAGMA user_version = {len(SCHEMA_MIGRATIONS)}")
+        print("Tables created.")
+    else:
+        upgrade_database()
+    admin_username = current_app.config["ADMIN_USERNAME"]
+    if db.session.query(User.id).filter(User.role == 'admin').first():
+        print("--- Admin user already exists. ---")
+    elif User.query.filter_by(username=admin_username).first(): # Чужой аккаунт админом не делаем
+        print(f"--- User '{admin_username}' exists but is not an admin: flask --app main set-role {admin_username} admin ---")
     else:
-        print(f"Database found at {db_path}.")
+        admin_pass_hash = generate_password_hash(current_app.config["ADMIN_PASSWORD"], current_app.config["PASSWORD_HASH_METHOD"])
+        db.session.add(User(username=admin_username, password_hash=admin_pass_hash, role="admin", full_name="Администратор"))
+        db.session.commit()
+        print(f"--- Admin user '{admin_username}' created. ---")
+
+def schema_is_current():
+    """Схема доведена init-db до последней миграции (проверяет мастер gunicorn перед запуском воркеров)."""
+    with db.engine.connect() as conn:
+        return sql_inspect(conn).has_table(User.__tablename__) and \
+               conn.exec_driver_sql("PRAGMA user_version").scalar() == len(SCHEMA_MIGRATIONS)
+
+def init_database(target_app=None):
+    """bootstrap_database в контексте приложения (по умолчанию - app модуля): dev-сервер, бенчмарки."""
+    with (target_app or app).app_context(): bootstrap_database()
+
+
+@api.cli.command("init-db")
+def init_db_command():
+    """Создает или мигрирует схему и админа; безопасно запускать при каждом деплое: flask --app main init-db."""
+    bootstrap_database()
+
+
+@api.cli.command("set-role")
+@click.argument("username")
+@click.argument("role", type=click.Choice(["user", "admin"]))
+@write_transaction()
+def set_role_command(username, role):
+    """Меняет роль пользователя и отзывает его токены: flask --app main set-role <username> <role>."""
+    user = User.query.filter_by(username=username).first()
+    if not user: raise click.ClickException(f"Пользователь {username} не найден")
+    set_user_role(user, role)
+    db.session.commit()
+    print(f"User {username} is now {role} (token_version={user.token_version}).")
+
+
+@api.cli.command("prune-sync-tombstones")
+def prune_sync_tombstones_command():
+    """Удаляет надгробия /sync старше SYNC_TOMBSTONE_RETENTION_DAYS (воркеры делают это сами раз в час): flask --app main prune-sync-tombstones."""
+    print(f"Pruned {prune_sync_tombstones()} sync tombstones.")
+
+
+@api.cli.command("resume-broadcasts")
+def resume_broadcasts_command():
+    """Доводит рассылки, прерванные перезапуском (heartbeat старше BROADCAST_STALE_SECONDS): flask --app main resume-broadcasts."""
+    resumed = resume_stale_broadcasts()
+    print(f"Resumed broadcast jobs: {', '.join(map(str, resumed))}." if resumed else "No stale broadcast jobs.")
+
+
+@api.cli.command("rebuild-search-index")
+def rebuild_search_index_command():
+    """Перестраивает FTS5-индексы поиска: flask --app main rebuild-search-index."""
+    with db.engine.begin() as conn:
+        create_search_indexes(conn)
+        rebuild_search_indexes(conn)
+    print("Search indexes rebuilt.")
+
+
+@api.cli.command("export")
+@click.argument("entity", type=click.Choice(list(EXPORT_ENTITIES)))
+@click.option("--format", "fmt", type=click.Choice(list(EXPORT_FORMATS)), default="ndjson")
+@click.option("--status")
+@click.option("--from", "date_from", help="created_at >= (ISO)")
+@click.option("--to", "date_to", help="created_at < (ISO)")
+@click.option("-o", "--output", type=click.File("w", encoding="utf-8"), default="-")
+def export_command(entity, fmt, status, date_from, date_to, output):
+    """Тот же поток, что GET /admin/export/<entity>, в файл: flask --app main export startups --format csv -o startups.csv."""
+    try: query, kinds = export_query(entity, status, date_from, date_to)
+    except ValueError as e: raise click.ClickException(str(e))
+    for chunk in iter_export(query, kinds, fmt): output.write(chunk)
+
+
+@api.cli.command("import")
+@click.argument("entity", type=click.Choice(list(IMPORT_ENTITIES)))
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(list(EXPORT_FORMATS)), help="по умолчанию - по расширению файла")
+@click.option("--creator", default="admin", show_default=True, help="username создателя по умолчанию")
+@click.option("--dry-run", is_flag=True, help="только проверить, ничего не записывать")
+@click.option("--approve", is_flag=True, help="сразу 'approved' вместо 'pending'")
+def import_command(entity, path, fmt, creator, dry_run, approve):
+    """Тот же импорт, что POST /admin/import/<entity>: flask --app main import startups startups.csv --dry-run."""
+    user = User.query.filter_by(username=creator).first()
+    if not user: raise click.ClickException(f"Пользователь {creator} не найден")
+    fmt = fmt or ('csv' if path.lower().endswith('.csv') else 'ndjson')
+    with open(path, encoding='utf-8-sig', newline='') as stream:
+        report = run_import(entity, stream, fmt, user.id, dry_run=dry_run, approve=approve)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if report["error_count"]: raise SystemExit(1)
+
+
+@api.cli.command("check-vacancy-visibility")
+@click.option("--repair", is_flag=True, help="пересчитать разошедшиеся строки")
+def check_vacancy_visibility_command(repair):
+    """Сверяет publicly_visible/startup_name/startup_creator_id вакансий с startups: flask --app main check-vacancy-visibility [--repair]."""
+    with write_transaction(repair): # С --repair проверка и починка - одна транзакция записи
+        drifted = [r[0] for r in db.session.query(Vacancy.id).filter(vacancy_visibility_drift_condition()).order_by(Vacancy.id)]
+        if not drifted: print("Vacancy visibility is consistent."); return
+        print(f"{len(drifted)} vacancies drifted: {', '.join(map(str, drifted[:20]))}{' ...' if len(drifted) > 20 else ''}")
+        if not repair: raise SystemExit(1)
+        repaired = refresh_vacancy_visibility()
+        bump_feed_versions('vacancies'); db.session.commit()
+    print(f"Repaired {repaired} vacancies.")
+
+
+@api.cli.command("check-stats")
+@click.option("--repair", is_flag=True, help="пересобрать разошедшиеся таблицы")
+def check_stats_command(repair):
+    """Пересчитывает сводку /stats с нуля и сверяет с таблицами: flask --app main check-stats [--repair]."""
+    with db.engine.connect() as conn: drifted = check_stats(conn, repair=repair)
+    if not drifted: print("Stats are consistent."); return
+    for table, keys in drifted.items():
+        print(f"{table}: {len(keys)} rows drifted: {', '.join(map(str, keys[:10]))}{' ...' if len(keys) > 10 else ''}")
+    if not repair: raise SystemExit(1)
+    print("Stats rebuilt.")
+
+
+# 18. Прогрев перед fork (gunicorn preload_app, см. gunicorn.conf.py)
+# Мастер импортирует модуль и прогревает приложение один раз; воркеры получают все это
+# после fork копией при записи, а не повторяют импорт и первые "холодные" запросы сами.
+WARM_UP_PATHS = ("/startups?limit=1", "/vacancies?limit=1", "/meetups?limit=1",
+                 "/startups?limit=1&view=summary", "/sync", "/stats", "/search?type=startup&q=warmup")
+
+def warm_up(app):
+    """Настраивает мапперы ORM, собирает карту маршрутов и прогоняет анонимные запросы лент:
+    их SQL попадает в кеш компиляции движка (он переживает dispose), JSON-провайдер и
+    сериализаторы - уже загружены. Соединения мастера закрываются. -> секунды."""
+    started = time.perf_counter()
+    configure_mappers()
+    app.url_map.update() # Сортировка правил и сборка матчера werkzeug - иначе на первом запросе воркера
+    metrics_enabled, app.config["METRICS_ENABLED"] = app.config["METRICS_ENABLED"], False # Прогрев - не трафик
+    try:
+        client = app.test_client()
+        for path in WARM_UP_PATHS: client.get(path)
+    finally: app.config["METRICS_ENABLED"] = metrics_enabled
+    with app.app_context(): db.engine.dispose() # Соединения мастера не должны достаться воркерам после fork
+    return time.perf_counter() - started
+
+def dispose_after_fork(app):
+    """В воркере сразу после fork: пул движка - новый, унаследованные соединения не трогаем (close=False)."""
+    with app.app_context(): db.engine.dispose(close=False)
+
 
+# Приложение по умолчанию: gunicorn main:app, flask --app main, bench
+app = create_app()
 
 # --- Запуск приложения ---
 if __name__ == "__main__":
     init_database()
+    with app.app_context(): reset_metrics_dir()
     app.run(debug=True, host='127.0.0.1', port=5000)
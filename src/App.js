@@ -11,6 +11,7 @@ import AddStartupForm from './AddStartupForm'; // Форма добавлени
 import AgreementModal from './AgreementModal'; // Модальное окно соглашения
 import './App.css'; // Стили
 import { STARTUP_STAGES, getStageOrder } from './constants'; // Константы этапов
+import { fetchAllPages } from './pagination'; // Загрузка списков страницами
 
 // --- Основное содержимое приложения (AppContent) ---
 function AppContent({ token, username, userId, userRole, onLogout }) {
@@ -92,7 +93,7 @@ function AppContent({ token, username, userId, userRole, onLogout }) {
         setLoadingStartups(true);
         setFetchError('');
         const url = `/startups${showOnlyMyStartups ? '?filter_by_creator=true' : ''}`;
-        authFetch(url)
+        fetchAllPages(authFetch, url)
             .then(data => {
                 if (data) { setStartups(data); }
             })
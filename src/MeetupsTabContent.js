@@ -1,6 +1,7 @@
 // src/MeetupsTabContent.js (ПОЛНЫЙ КОД - с Модерацией Митапов)
 import React, { useState, useEffect, useCallback } from 'react';
 import MeetupCard from './MeetupCard'; // <-- Используем новый компонент
+import { fetchAllPages } from './pagination';
 // import AddMeetupForm from './AddMeetupForm'; // Форма добавления определена ниже
 
 // Принимаем userId и showMessage
@@ -14,8 +15,9 @@ function MeetupsTabContent({ token, userId, isAdmin, authFetch, showMessage }) {
     const fetchMeetups = useCallback(() => {
         console.log("[MeetupsTabContent] Загрузка митапов...");
         setLoading(true); setError('');
-        authFetch('/meetups') // Используем authFetch, т.к. видимость зависит от пользователя
+        fetchAllPages(authFetch, '/meetups') // Используем authFetch, т.к. видимость зависит от пользователя
             .then(data => {
+                if (!data) return;
                 setMeetups(data);
                 console.log("[MeetupsTabContent] Митапы загружены:", data.length);
             })
@@ -2,6 +2,7 @@
 
 import React, { useState, useEffect, useCallback } from 'react';
 import './App.css'; // Импортируем общие стили
+import { fetchAllPages } from './pagination';
 
 // Вспомогательная функция для форматирования даты уведомления
 const formatNotificationTimestamp = (isoString) => {
@@ -98,7 +99,7 @@ function ProfileTabContent({
         console.log("ProfileTab: Fetching user notifications...");
         setLoadingNotifications(true);
         setNotificationError('');
-        authFetch('/profile/notifications')
+        fetchAllPages(authFetch, '/profile/notifications')
             .then(data => {
                 if (data && Array.isArray(data)) {
                     console.log("ProfileTab: Notifications received:", data);
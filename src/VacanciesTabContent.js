@@ -3,6 +3,7 @@ import React, { useState, useEffect, useCallback } from 'react';
 // --- ИМПОРТЫ ---
 import AddVacancyForm from './AddVacancyForm';
 import VacancyCard from './VacancyCard';
+import { fetchAllPages } from './pagination';
 import './App.css';
 
 function VacanciesTabContent({
@@ -34,7 +35,7 @@ function VacanciesTabContent({
         setLoadingVacancies(true);
         setFetchError('');
         const url = `/vacancies${showOnlyMyVacancies ? '?filter_by_creator=true' : ''}`;
-        authFetch(url)
+        fetchAllPages(authFetch, url)
             .then(data => {
                 if (data && Array.isArray(data)) {
                     setVacancies(data);
@@ -80,6 +81,12 @@ function VacanciesTabContent({
         }
     };
 
+    // Загрузка откликов на вакансию (только создатель/админ), страница за страницей
+    const handleLoadApplicants = useCallback(async (vacancyId, cursor = null) => {
+        const url = `/vacancies/${vacancyId}/applicants?limit=50${cursor ? `&cursor=${encodeURIComponent(cursor)}` : ''}`;
+        return authFetch(url);
+    }, [authFetch]);
+
     // Обработчик добавления вакансии
     const handleAddVacancy = async (vacancyData) => {
         console.log("Adding new vacancy:", vacancyData);
@@ -238,6 +245,7 @@ function VacanciesTabContent({
                             isAdmin={isAdmin}
                             userProfile={userProfileData}
                             onApply={handleApply}
+                            onLoadApplicants={handleLoadApplicants}
                             isCreator={vacancy.creator_user_id === userId}
                             onApprove={handleApproveVacancy}
                             onReject={handleRejectVacancy}
@@ -1,4 +1,4 @@
-import React from 'react';
+import React, { useState } from 'react';
 import './App.css'; // Убедись, что стили подключены
 import InlineExpandableText from './InlineExpandableText'; // Импортируем компонент
 
@@ -28,6 +28,7 @@ function VacancyCard({
   isAdmin,
   userProfile,
   onApply,
+  onLoadApplicants, // <-- Загрузка откликов с сервера (GET /vacancies/:id/applicants)
   onApprove,
   onReject,
   onToggleHold,
@@ -39,7 +40,11 @@ function VacancyCard({
 
   // --- Вычисляем флаги ---
   const isOwner = isCreator; // Создатель ИМЕННО ЭТОЙ ВАКАНСИИ
-  const hasApplied = vacancy.status === 'approved' && vacancy.applicants?.some(app => app.user_id === currentUserId);
+  const hasApplied = vacancy.status === 'approved' && vacancy.has_applied;
+  // Отклики больше не приходят в списке вакансий - подгружаем по кнопке
+  const [applicants, setApplicants] = useState(null);
+  const [applicantsCursor, setApplicantsCursor] = useState(null);
+  const [loadingApplicants, setLoadingApplicants] = useState(false);
   const isHeld = vacancy.status === 'held';
   const canManageVacancy = isAdmin; // Только админ может одобрять/отклонять/приостанавливать/удалять? Или создатель тоже? Пока Админ.
 
@@ -55,6 +60,23 @@ function VacancyCard({
     if (onApply && !isProcessing && !hasApplied && vacancy.status === 'approved') { onApply(vacancy.id); }
   };
 
+  // Загрузка (следующей страницы) откликов
+  const handleLoadApplicantsClick = async () => {
+    if (!onLoadApplicants || loadingApplicants) return;
+    setLoadingApplicants(true);
+    try {
+      const data = await onLoadApplicants(vacancy.id, applicantsCursor);
+      if (data) {
+        setApplicants(prev => [...(prev || []), ...(data.items || [])]);
+        setApplicantsCursor(data.next_cursor || null);
+      }
+    } catch (err) {
+      console.error("VacancyCard: Ошибка загрузки откликов:", err);
+    } finally {
+      setLoadingApplicants(false);
+    }
+  };
+
   // Обработчик отклонения
   const handleRejectClick = () => {
     if (isProcessing) return;
@@ -176,9 +198,15 @@ function VacancyCard({
         {(isAdmin || isOwner) && (
           <div className="vacancy-section vacancy-applicants">
             <h4>Отклики</h4>
-            {vacancy.applicants && vacancy.applicants.length > 0 ? (
+            {applicants === null && vacancy.applicant_count > 0 && (
+              <button onClick={handleLoadApplicantsClick} className="cancel-button small" disabled={loadingApplicants}>
+                {loadingApplicants ? 'Загрузка...' : 'Показать отклики'}
+              </button>
+            )}
+            {applicants === null && !(vacancy.applicant_count > 0) && (<p>Пока никто не откликнулся.</p>)}
+            {applicants !== null && (applicants.length > 0 ? (
               <ul className="applicant-details-list">
-                {vacancy.applicants.map((applicant, index) => (
+                {applicants.map((applicant, index) => (
                   <li key={applicant.user_id || index} className="applicant-detail-item">
                     <span className="applicant-tg">
                       {isOwner ? `@${applicant.telegram || 'нет TG'}` : '[TG скрыт]'}
@@ -187,7 +215,12 @@ function VacancyCard({
                   </li>
                 ))}
               </ul>
-            ) : (<p>Пока никто не откликнулся.</p>)}
+            ) : (<p>Пока никто не откликнулся.</p>))}
+            {applicants !== null && applicantsCursor && (
+              <button onClick={handleLoadApplicantsClick} className="cancel-button small" disabled={loadingApplicants}>
+                {loadingApplicants ? 'Загрузка...' : 'Показать еще'}
+              </button>
+            )}
           </div>
         )}
       </div>
@@ -229,8 +262,8 @@ function VacancyCard({
         )}
         {/* Счетчик/информация об откликах (условие видимости как у раздела) */}
         {(isAdmin || isOwner) && vacancy.applicant_count !== undefined && (
-            <span className="applicant-count" title={vacancy.applicant_count > 0 ? "Просмотр откликов пока не реализован" : ""}>
-                Откликов: {vacancy.applicant_count} {vacancy.applicant_count > 0 && ' (просмотр WIP)'}
+            <span className="applicant-count">
+                Откликов: {vacancy.applicant_count}
             </span>
         )}
         {!(isAdmin || isOwner) && vacancy.applicant_count > 0 && (
@@ -0,0 +1,20 @@
+// src/pagination.js
+
+// Размер страницы списков (MAX_PAGE_LIMIT на бэкенде)
+export const LIST_PAGE_LIMIT = 200;
+
+// Загружает список целиком страницами ?limit=&cursor= (массив без ?limit= бэкенд обрезает).
+// Возвращает массив элементов или null, если authFetch вернул null (разлогинил).
+export const fetchAllPages = async (authFetch, url) => {
+    const separator = url.includes('?') ? '&' : '?';
+    const items = [];
+    let cursor = null;
+    do {
+        const cursorParam = cursor ? `&cursor=${encodeURIComponent(cursor)}` : '';
+        const page = await authFetch(`${url}${separator}limit=${LIST_PAGE_LIMIT}${cursorParam}`);
+        if (!page) return null;
+        items.push(...page.items);
+        cursor = page.next_cursor;
+    } while (cursor);
+    return items;
+};
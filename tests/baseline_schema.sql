@@ -0,0 +1,91 @@
+-- Схема исходной версии main.py (до миграций, PRAGMA user_version = 0) и по строке в каждой таблице.
+-- Пароль admin - verysecretadminpassword, user1 - pass1234 (pbkdf2 исходной версии).
+CREATE TABLE users (
+	id INTEGER NOT NULL, 
+	username VARCHAR(80) NOT NULL, 
+	password_hash VARCHAR(128) NOT NULL, 
+	role VARCHAR(10) NOT NULL, 
+	full_name VARCHAR(120), 
+	telegram VARCHAR(80), 
+	resume_link VARCHAR(255), 
+	created_at DATETIME, 
+	PRIMARY KEY (id)
+);
+CREATE INDEX ix_users_role ON users (role);
+CREATE UNIQUE INDEX ix_users_username ON users (username);
+CREATE UNIQUE INDEX ix_users_telegram ON users (telegram);
+CREATE TABLE startups (
+	id INTEGER NOT NULL, 
+	name VARCHAR(120) NOT NULL, 
+	description TEXT NOT NULL, 
+	funds_raised JSON, 
+	opensea_link VARCHAR(255), 
+	status VARCHAR(10) NOT NULL, 
+	rejection_reason TEXT, 
+	creator_user_id INTEGER NOT NULL, 
+	current_stage VARCHAR(20) NOT NULL, 
+	stage_timeline JSON, 
+	is_held BOOLEAN NOT NULL, 
+	created_at DATETIME, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(creator_user_id) REFERENCES users (id)
+);
+CREATE INDEX ix_startups_created_at ON startups (created_at);
+CREATE INDEX ix_startups_is_held ON startups (is_held);
+CREATE INDEX ix_startups_status ON startups (status);
+CREATE INDEX ix_startups_creator_user_id ON startups (creator_user_id);
+CREATE TABLE meetups (
+	id INTEGER NOT NULL, 
+	title VARCHAR(150) NOT NULL, 
+	date DATETIME NOT NULL, 
+	description TEXT NOT NULL, 
+	link VARCHAR(255) NOT NULL, 
+	status VARCHAR(10) NOT NULL, 
+	rejection_reason TEXT, 
+	creator_user_id INTEGER NOT NULL, 
+	created_at DATETIME, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(creator_user_id) REFERENCES users (id)
+);
+CREATE INDEX ix_meetups_status ON meetups (status);
+CREATE INDEX ix_meetups_creator_user_id ON meetups (creator_user_id);
+CREATE INDEX ix_meetups_date ON meetups (date);
+CREATE TABLE notifications (
+	id INTEGER NOT NULL, 
+	user_id INTEGER NOT NULL, 
+	admin_id INTEGER NOT NULL, 
+	message TEXT NOT NULL, 
+	timestamp DATETIME NOT NULL, 
+	is_read BOOLEAN NOT NULL, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(user_id) REFERENCES users (id), 
+	FOREIGN KEY(admin_id) REFERENCES users (id)
+);
+CREATE INDEX ix_notifications_user_id ON notifications (user_id);
+CREATE INDEX ix_notifications_timestamp ON notifications (timestamp);
+CREATE INDEX ix_notifications_is_read ON notifications (is_read);
+CREATE TABLE vacancies (
+	id INTEGER NOT NULL, 
+	startup_id INTEGER NOT NULL, 
+	title VARCHAR(150) NOT NULL, 
+	description TEXT NOT NULL, 
+	salary VARCHAR(100), 
+	requirements TEXT NOT NULL, 
+	applicants JSON, 
+	status VARCHAR(10) NOT NULL, 
+	rejection_reason TEXT, 
+	creator_user_id INTEGER NOT NULL, 
+	created_at DATETIME, 
+	PRIMARY KEY (id), 
+	FOREIGN KEY(startup_id) REFERENCES startups (id), 
+	FOREIGN KEY(creator_user_id) REFERENCES users (id)
+);
+CREATE INDEX ix_vacancies_startup_id ON vacancies (startup_id);
+CREATE INDEX ix_vacancies_creator_user_id ON vacancies (creator_user_id);
+CREATE INDEX ix_vacancies_status ON vacancies (status);
+INSERT INTO users VALUES (1, 'admin', 'pbkdf2:sha256:260000$kesTpHjqk5dxLoqB$a269ba1a36969d79a5882b3a9c88334911d1ea5553ef7f20a50b9bc3125366d7', 'admin', 'Администратор', NULL, NULL, '2024-01-01 10:00:00.000000');
+INSERT INTO users VALUES (2, 'user1', 'pbkdf2:sha256:260000$h1pSQAAKMlQZ0DsR$5ec827d515e8930e222a5293a6f4087832dfc30e9c9a1a59e9b246280e3ec39b', 'user', 'User One', '@user1', 'https://cv.example/user1', '2024-01-02 10:00:00.000000');
+INSERT INTO startups VALUES (1, 'Стартап', 'Описание стартапа', '{"USD": 100.0, "ETH": 1.5}', NULL, 'approved', NULL, 2, 'mvp', '{"pmf": "20250301", "scaling": null}', 0, '2024-01-03 10:00:00.000000');
+INSERT INTO vacancies VALUES (1, 1, 'Вакансия', 'Описание вакансии', '100k', 'Python', '[{"user_id": 2, "telegram": "@user1", "resume_link": "https://cv.example/user1"}]', 'approved', NULL, 2, '2024-01-04 10:00:00.000000');
+INSERT INTO meetups VALUES (1, 'Митап', '2099-06-01 18:00:00.000000', 'Описание митапа', 'https://meetup.example/1', 'approved', NULL, 2, '2024-01-05 10:00:00.000000');
+INSERT INTO notifications VALUES (1, 2, 1, 'Стартап одобрен', '2024-01-06 10:00:00.000000', 0);
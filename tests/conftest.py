@@ -0,0 +1,46 @@
+"""Общие фикстуры: приложение create_app на временной БД SQLite.
+
+    python -m pytest -q
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false") # Модульный app тоже не должен заводить .ratelimit.db
+os.environ.setdefault("METRICS_ENABLED", "false")
+
+import main # noqa: E402
+
+
+def make_app(db_file, **config):
+    """create_app на файле db_file; схему не создает (см. init_database / bootstrap_database)."""
+    return main.create_app({"SQLALCHEMY_DATABASE_URI": "sqlite:///" + str(db_file), "RATE_LIMIT_ENABLED": False,
+                            "METRICS_ENABLED": False, "PASSWORD_HASH_METHOD": "pbkdf2:sha256:1000", **config})
+
+
+@pytest.fixture(autouse=True)
+def clear_feed_cache():
+    """Кеш анонимных лент - на процесс, а тесты работают с разными БД (версии лент совпадают)."""
+    main._feed_cache.clear()
+    yield
+    main._feed_cache.clear()
+
+
+@pytest.fixture
+def app(tmp_path):
+    """Новая БД в последней версии схемы, только админ."""
+    app = make_app(tmp_path / "test.db")
+    main.init_database(app)
+    return app
+
+
+@pytest.fixture(scope="session")
+def seeded_app(tmp_path_factory):
+    """БД, засеянная bench.seed (300 пользователей) - общая для тестов, которые ее только читают."""
+    from bench.seed import seed
+    app = make_app(tmp_path_factory.mktemp("seeded") / "seeded.db")
+    main.init_database(app)
+    with app.app_context(): seed(main, 300)
+    return app
@@ -0,0 +1,83 @@
+"""Миграции схемы: БД исходной версии доводится init-db до последней user_version
+и совпадает по схеме с новой БД, созданной create_all()."""
+import os
+import sqlite3
+
+import pytest
+
+import main
+from conftest import make_app
+
+BASELINE_SCHEMA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline_schema.sql")
+
+
+def schema_of(db_file):
+    """{таблица: колонки}, имена индексов и триггеров - без внутренних таблиц FTS5 и sqlite_*."""
+    with sqlite3.connect(db_file) as conn:
+        objects = conn.execute("SELECT type, name, tbl_name FROM sqlite_master WHERE name NOT LIKE 'sqlite_%'").fetchall()
+        tables = {name: {row[1] for row in conn.execute(f"PRAGMA table_info({name})")}
+                  for kind, name, _ in objects if kind == "table" and not name.startswith("search_")}
+    return {"tables": tables, "indexes": {name for kind, name, _ in objects if kind == "index"},
+            "triggers": {name for kind, name, _ in objects if kind == "trigger"},
+            "search": {name for kind, name, _ in objects if kind == "table" and name.startswith("search_")}}
+
+
+@pytest.fixture
+def baseline_db(tmp_path):
+    db_file = tmp_path / "baseline.db"
+    with sqlite3.connect(db_file) as conn, open(BASELINE_SCHEMA, encoding="utf-8") as schema:
+        conn.executescript(schema.read())
+    return db_file
+
+
+def test_baseline_db_migrates_to_current_version(baseline_db, tmp_path):
+    app = make_app(baseline_db)
+    main.init_database(app)
+    with app.app_context(): assert main.schema_is_current()
+
+    fresh_db = tmp_path / "fresh.db"
+    main.init_database(make_app(fresh_db))
+    migrated, fresh = schema_of(baseline_db), schema_of(fresh_db)
+    migrated["tables"]["vacancies"].discard("applicants") # Старую колонку миграция 2 только обнуляет
+    assert migrated == fresh
+
+
+def test_migrated_db_keeps_data(baseline_db):
+    app = make_app(baseline_db)
+    main.init_database(app)
+    client = app.test_client()
+
+    startups = client.get("/startups").json
+    assert [s["name"] for s in startups] == ["Стартап"]
+    assert startups[0]["funds_raised"] == {"ETH": 1.5, "USD": 100.0}
+    assert startups[0]["stage_timeline"] == {"pmf": "2025-03-01", "scaling": None}
+    vacancies = client.get("/vacancies").json
+    assert [(v["title"], v["startup_name"], v["applicant_count"]) for v in vacancies] == [("Вакансия", "Стартап", 1)]
+    assert [m["title"] for m in client.get("/meetups").json] == ["Митап"]
+    assert client.get("/stats").json["upcoming_meetups"] == 1
+    assert [item["vacancy"]["id"] for item in client.get("/search?type=vacancy&q=Вакансия").json["items"]] == [1]
+
+    token = client.post("/login", json={"username": "user1", "password": "pass1234"}).json["access_token"]
+    headers = {"Authorization": "Bearer " + token}
+    assert [n["message"] for n in client.get("/profile/notifications", headers=headers).json] == ["Стартап одобрен"]
+    assert client.post("/vacancies/1/apply", headers=headers).status_code == 409 # Отклик перенесен из JSON
+
+
+def test_upgrade_is_idempotent(baseline_db):
+    app = make_app(baseline_db)
+    main.init_database(app)
+    before = schema_of(baseline_db)
+    main.init_database(app)
+    assert schema_of(baseline_db) == before
+
+
+@pytest.mark.parametrize("version", range(1, len(main.SCHEMA_MIGRATIONS)))
+def test_partially_migrated_db_upgrades(baseline_db, version):
+    """БД, остановленная на промежуточной версии (деплой одной из прошлых версий), доходит до последней."""
+    app = make_app(baseline_db)
+    with app.app_context(), main.db.engine.begin() as conn:
+        for number, migration in enumerate(main.SCHEMA_MIGRATIONS[:version], start=1):
+            migration(conn)
+            conn.exec_driver_sql(f"PRAGMA user_version = {number}")
+    main.init_database(app)
+    with app.app_context(): assert main.schema_is_current()
@@ -0,0 +1,68 @@
+"""Число SQL-запросов на запрос к списку не зависит от числа строк в ответе (пакетная загрузка связей)."""
+import pytest
+
+import main
+
+ROWS = 12
+PATHS = ["/startups", "/startups?limit=50", "/vacancies", "/vacancies?limit=50", "/meetups", "/meetups?limit=50"]
+
+
+def count_statements(app, client, path, headers):
+    """-> (статус, число SQL-запросов) для одного GET; кеш анонимной ленты сбрасывается перед запросом."""
+    statements = []
+    def capture(conn, cursor, statement, parameters, context, executemany): statements.append(statement)
+    main._feed_cache.clear()
+    with app.app_context(): engine = main.db.engine
+    main.event.listen(engine, "before_cursor_execute", capture)
+    try: response = client.get(path, headers=headers)
+    finally: main.event.remove(engine, "before_cursor_execute", capture)
+    return response.status_code, len(response.json if isinstance(response.json, list) else response.json["items"]), len(statements)
+
+
+class Feed:
+    """Наполняет ленты через API: у каждой строки свой автор, к вакансиям - отклики."""
+    def __init__(self, client):
+        self.client, self.users = client, 0
+        self.admin = self.login("admin", "verysecretadminpassword")
+
+    def login(self, username, password):
+        return {"Authorization": "Bearer " + self.client.post("/login", json={"username": username, "password": password}).json["access_token"]}
+
+    def new_user(self):
+        self.users += 1
+        username = f"user{self.users}"
+        assert self.client.post("/register", json={"username": username, "password": "pass1234"}).status_code == 201
+        headers = self.login(username, "pass1234")
+        assert self.client.put("/profile", headers=headers, json={"telegram": f"@{username}",
+                                                                  "resume_link": f"https://cv.example/{username}"}).status_code == 200
+        return headers
+
+    def add_rows(self, count):
+        for _ in range(count):
+            author = self.new_user()
+            startup = self.client.post("/startups", headers=author, json={"name": f"Стартап {self.users}", "description": "Описание",
+                                                                          "current_stage": "mvp"}).json["startup"]
+            assert self.client.put(f"/startups/{startup['id']}/approve", headers=self.admin).status_code == 200
+            vacancy = self.client.post("/vacancies", headers=author, json={"startup_id": startup["id"], "title": "Вакансия",
+                                                                           "description": "Описание", "requirements": "Python"}).json["vacancy"]
+            assert self.client.put(f"/vacancies/{vacancy['id']}/approve", headers=self.admin).status_code == 200
+            assert self.client.post(f"/vacancies/{vacancy['id']}/apply", headers=self.new_user()).status_code == 200
+            meetup = self.client.post("/meetups", headers=author, json={"title": "Митап", "date": "2099-01-01T18:00:00Z",
+                                                                        "description": "Описание", "link": "https://meetup.example"}).json["meetup"]
+            assert self.client.put(f"/meetups/{meetup['id']}/approve", headers=self.admin).status_code == 200
+
+
+@pytest.mark.parametrize("who", ["anon", "user", "admin"])
+def test_list_query_count_does_not_depend_on_rows(app, who):
+    client = app.test_client()
+    feed = Feed(client)
+    feed.add_rows(1)
+    viewer = {"anon": {}, "user": feed.new_user(), "admin": feed.admin}[who]
+    one = {path: count_statements(app, client, path, viewer) for path in PATHS}
+    feed.add_rows(ROWS - 1)
+    many = {path: count_statements(app, client, path, viewer) for path in PATHS}
+
+    for path in PATHS:
+        (status_one, rows_one, queries_one), (status_many, rows_many, queries_many) = one[path], many[path]
+        assert (status_one, status_many, rows_one, rows_many) == (200, 200, 1, ROWS), path
+        assert queries_many == queries_one, path
@@ -0,0 +1,28 @@
+"""Планы запросов списков (EXPLAIN QUERY PLAN): без полного прохода таблицы и без TEMP B-TREE.
+
+Эндпоинты и допустимые SCAN - bench.plans.CASES; там же их проверяет python -m bench.plans.
+"""
+import pytest
+
+import main
+from bench import plans
+
+
+@pytest.fixture(scope="module")
+def endpoint_plans(seeded_app):
+    """{название: (проблемы, планы)} для всех эндпоинтов - один проход по засеянной БД."""
+    db_file = main.make_url(seeded_app.config["SQLALCHEMY_DATABASE_URI"]).database
+    return {name: (problems, plan) for name, problems, plan in plans.endpoint_plans(main, seeded_app, db_file)}
+
+
+@pytest.mark.parametrize("name", [name for name, *_ in plans.expand_cases(main)])
+def test_endpoint_plan(endpoint_plans, name):
+    problems, endpoint_plan = endpoint_plans[name]
+    assert not problems, "\n".join(problems + [" | ".join(plan) for plan in endpoint_plan])
+
+
+def test_plan_problems_flags_scan_and_temp_btree():
+    assert plans.plan_problems(["SCAN startups"], allow_scan=False) == ["SCAN startups"]
+    assert plans.plan_problems(["SCAN startups"], allow_scan=True) == []
+    assert plans.plan_problems(["SEARCH startups USING INDEX ix_startups_status_is_held (status=?)",
+                                "USE TEMP B-TREE FOR ORDER BY"], allow_scan=True) == ["USE TEMP B-TREE FOR ORDER BY"]
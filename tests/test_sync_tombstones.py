@@ -0,0 +1,54 @@
+"""Надгробия /sync хранятся SYNC_TOMBSTONE_RETENTION_DAYS; token старше удаленных - 410 и полная перезагрузка."""
+from datetime import datetime, timedelta
+
+import pytest
+
+import main
+
+
+@pytest.fixture
+def deleted_vacancies(app):
+    """Три удаленные вакансии: первые две - 40 дней назад, третья - сейчас. -> token до удалений."""
+    client = app.test_client()
+    with app.app_context():
+        user = main.User(username="user1", password_hash="-")
+        main.db.session.add(user); main.db.session.flush()
+        startup = main.Startup(name="Стартап", description="Описание", status="approved", creator_user_id=user.id,
+                               current_stage="mvp", is_held=False)
+        main.db.session.add(startup); main.db.session.flush()
+        vacancies = [main.Vacancy(startup_id=startup.id, title=f"Вакансия {i}", description="Описание", requirements="Python",
+                                  status="approved", creator_user_id=user.id) for i in range(3)]
+        main.db.session.add_all(vacancies); main.db.session.commit()
+        token = client.get("/sync").json["token"]
+        for vacancy in vacancies: main.db.session.delete(vacancy); main.db.session.commit()
+        old = main.SyncTombstone.query.order_by(main.SyncTombstone.seq).limit(2).all()
+        for tombstone in old: tombstone.deleted_at = datetime.utcnow() - timedelta(days=40)
+        main.db.session.commit()
+    return token
+
+
+def test_prune_keeps_recent_tombstones(app, deleted_vacancies):
+    with app.app_context():
+        assert main.prune_sync_tombstones() == 2
+        assert main.prune_sync_tombstones() == 0
+        assert [t.entity_id for t in main.SyncTombstone.query] == [3]
+        assert main.db.session.get(main.SyncSequence, 1).pruned_through > 0
+
+
+def test_token_older_than_pruned_requires_resync(app, deleted_vacancies):
+    client = app.test_client()
+    assert client.get(f"/sync?since={deleted_vacancies}").json["vacancies"]["removed"] == [1, 2, 3]
+    with app.app_context(): main.prune_sync_tombstones()
+
+    response = client.get(f"/sync?since={deleted_vacancies}")
+    assert response.status_code == 410 and response.json["resync"] is True
+    assert client.get("/sync?since=" + response.json["token"]).json == {"token": response.json["token"], "more": False}
+
+
+def test_token_after_pruned_tombstones_still_syncs(app, deleted_vacancies):
+    client = app.test_client()
+    with app.app_context():
+        main.prune_sync_tombstones()
+        token = main.encode_cursor([main.db.session.get(main.SyncSequence, 1).pruned_through])
+    response = client.get(f"/sync?since={token}")
+    assert response.status_code == 200 and response.json["vacancies"]["removed"] == [3]
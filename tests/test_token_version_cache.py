@@ -0,0 +1,49 @@
+"""Кеш token_version режима JWT_ROLE_CLAIMS: ограничен по размеру и не держит истекшие записи."""
+import pytest
+
+import main
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    main._token_version_cache.clear()
+    yield
+    main._token_version_cache.clear()
+
+
+def add_users(app, count):
+    with app.app_context():
+        users = [main.User(username=f"user{i}", password_hash="-") for i in range(count)]
+        main.db.session.add_all(users); main.db.session.commit()
+        return [user.id for user in users]
+
+
+def test_cache_is_capped(app, monkeypatch):
+    monkeypatch.setattr(main, "TOKEN_VERSION_CACHE_MAX_ENTRIES", 3)
+    user_ids = add_users(app, 5)
+    with app.app_context():
+        for user_id in user_ids: assert main.get_token_version(user_id) == 0
+    assert list(main._token_version_cache) == user_ids[-3:]
+
+
+def test_expired_entries_are_swept(app):
+    app.config["JWT_TOKEN_VERSION_TTL"] = 0
+    user_ids = add_users(app, 4)
+    with app.app_context():
+        for user_id in user_ids: main.get_token_version(user_id)
+    assert list(main._token_version_cache) == user_ids[-1:]
+
+
+def test_role_change_drops_entry_in_this_worker(app):
+    app.config["JWT_ROLE_CLAIMS"] = True
+    client = app.test_client()
+    client.post("/register", json={"username": "user1", "password": "pass1234"})
+    token = client.post("/login", json={"username": "user1", "password": "pass1234"}).json["access_token"]
+    headers = {"Authorization": "Bearer " + token}
+    assert client.get("/profile/notifications/unread_count", headers=headers).status_code == 200
+    with app.app_context():
+        user = main.User.query.filter_by(username="user1").one()
+        assert user.id in main._token_version_cache
+        main.set_user_role(user, "admin"); main.db.session.commit()
+        assert user.id not in main._token_version_cache
+    assert client.get("/profile/notifications/unread_count", headers=headers).status_code == 404 # Токен отозван
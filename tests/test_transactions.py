@@ -0,0 +1,50 @@
+"""Какой BEGIN выдает запрос: IMMEDIATE - только изменяющим обработчикам, которые пишут."""
+import pytest
+
+import main
+
+
+def begins(app, client, method, path, **kwargs):
+    """-> статус и список BEGIN-ов, выданных за запрос."""
+    statements = []
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("BEGIN"): statements.append(statement)
+    with app.app_context(): engine = main.db.engine
+    main.event.listen(engine, "before_cursor_execute", capture)
+    try: response = getattr(client, method)(path, **kwargs)
+    finally: main.event.remove(engine, "before_cursor_execute", capture)
+    return response.status_code, statements
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def test_login_and_register_use_deferred_begin(app, client):
+    status, statements = begins(app, client, "post", "/register", json={"username": "user1", "password": "pass1234"})
+    assert status == 201 and statements and set(statements) == {"BEGIN"}
+    status, statements = begins(app, client, "post", "/login", json={"username": "user1", "password": "pass1234"})
+    assert status == 200 and set(statements) == {"BEGIN"}
+    status, statements = begins(app, client, "post", "/login", json={"username": "user1", "password": "wrong"})
+    assert status == 401 and set(statements) == {"BEGIN"}
+
+
+def test_login_rehash_writes_in_its_own_transaction(app, client):
+    with app.app_context():
+        main.db.session.add(main.User(username="old", password_hash=main.generate_password_hash("pass1234", "pbkdf2:sha256:500")))
+        main.db.session.commit()
+    status, statements = begins(app, client, "post", "/login", json={"username": "old", "password": "pass1234"})
+    assert status == 200 and statements == ["BEGIN", "BEGIN"] # Чтение, затем UPDATE хеша
+    with app.app_context():
+        assert main.User.query.filter_by(username="old").one().password_hash.startswith("pbkdf2:sha256:1000$")
+
+
+def test_writes_use_begin_immediate(app, client):
+    client.post("/register", json={"username": "user1", "password": "pass1234"})
+    token = client.post("/login", json={"username": "user1", "password": "pass1234"}).json["access_token"]
+    headers = {"Authorization": "Bearer " + token}
+    status, statements = begins(app, client, "put", "/profile", headers=headers, json={"full_name": "User One"})
+    assert status == 200 and set(statements) == {"BEGIN IMMEDIATE"}
+    status, statements = begins(app, client, "get", "/profile", headers=headers)
+    assert status == 200 and set(statements) == {"BEGIN"}